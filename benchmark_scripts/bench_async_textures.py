@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Benchmark script; longest frame while loading textures synchronously compared to the async loader
+@File      : bench_async_textures.py
+@Project   : pygletPlayground
+@Time      : 19.10.26 02:10
+@Author    : flowmeadow
+"""
+import argparse
+import glob
+import time
+
+import pyglet
+from pyglet.gl import *
+
+from glpg.texturing.async_loader import TextureLoader
+from glpg.texturing.texture import Texture
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=str, nargs="+", default=sorted(glob.glob("demo_textures/*.jpg")))
+    parser.add_argument("--budget", type=float, default=4.0, help="upload time budget per frame in milliseconds")
+    parser.add_argument("--pbo", action="store_true", help="upload through a pixel buffer object")
+    args = parser.parse_args()
+
+    # an invisible window provides the OpenGL context
+    window = pyglet.window.Window(visible=False)
+
+    # synchronous: all textures are created within one frame
+    start = time.perf_counter()
+    textures = [Texture(path, async_load=False) for path in args.images]
+    glFinish()
+    t_sync = time.perf_counter() - start
+
+    # asynchronous: frames continue while the textures are decoded and uploaded
+    TextureLoader.time_budget = args.budget / 1000
+    TextureLoader.use_pbo = args.pbo
+    start = time.perf_counter()
+    textures += [Texture(path, async_load=True) for path in args.images]
+    frame_times = []
+    while TextureLoader.pending():
+        frame_start = time.perf_counter()
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        TextureLoader.process()
+        glFinish()
+        frame_times.append(time.perf_counter() - frame_start)
+    t_async = time.perf_counter() - start
+
+    print(f"{len(args.images)} textures")
+    print(f"synchronous:  {t_sync:.2f} s blocked in one frame")
+    print(
+        f"asynchronous: {t_async:.2f} s over {len(frame_times)} frames, "
+        f"longest frame {1000 * max(frame_times):.1f} ms, mean frame {1000 * t_async / len(frame_times):.1f} ms"
+    )
+    window.close()
+
+
+if __name__ == "__main__":
+    main()
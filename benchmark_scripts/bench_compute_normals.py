@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Benchmark script; vectorized vertex normal computation compared to the former per-face loop
+@File      : bench_compute_normals.py
+@Project   : pygletPlayground
+@Time      : 18.10.26 10:12
+@Author    : flowmeadow
+"""
+import argparse
+import time
+
+import numpy as np
+
+from glpg.transformations.methods import compute_normals
+
+
+def compute_normals_loop(indices: np.ndarray, vertices: np.ndarray) -> np.ndarray:
+    """
+    Former implementation of 'compute_normals' that adds up the face normals in a Python loop
+    :param indices: indices array [m, 3]
+    :param vertices: vertex array [n, 3]
+    :return: normal array [n, 3]
+    """
+    triangle_vertices = vertices[indices]
+    edge_1 = triangle_vertices[:, 0, :] - triangle_vertices[:, 1, :]
+    edge_2 = triangle_vertices[:, 0, :] - triangle_vertices[:, 2, :]
+    cross_products = np.cross(edge_1, edge_2)
+    triangle_normals = cross_products / np.linalg.norm(cross_products, axis=1)[:, np.newaxis]
+    vertex_normals = np.zeros(vertices.shape)
+    for idx in range(len(indices)):
+        vertex_normals[indices[idx, :]] += triangle_normals[idx]
+    return vertex_normals / np.linalg.norm(vertex_normals, axis=1)[:, np.newaxis]
+
+
+def wavy_grid(num_triangles: int):
+    """
+    Creates a curved grid mesh with approximately the given number of triangles
+    :param num_triangles: requested number of triangles
+    :return: vertices [n, 3], indices [m, 3]
+    """
+    n = max(2, int(np.sqrt(num_triangles / 2)))
+    x, y = np.meshgrid(np.linspace(0.0, 1.0, n + 1), np.linspace(0.0, 1.0, n + 1))
+    z = 0.1 * np.sin(8.0 * x) * np.cos(8.0 * y)
+    vertices = np.stack([x.ravel(), y.ravel(), z.ravel()], axis=1)
+
+    corners = (np.arange(n)[:, np.newaxis] * (n + 1) + np.arange(n)).ravel()
+    indices = np.concatenate(
+        [
+            np.stack([corners, corners + 1, corners + n + 2], axis=1),
+            np.stack([corners, corners + n + 2, corners + n + 1], axis=1),
+        ]
+    )
+    return vertices, indices
+
+
+def timeit(fun, *args, repeat: int = 3, **kwargs) -> float:
+    """
+    :return: best wall time of several runs in seconds
+    """
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fun(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--loop-limit", type=int, default=1_000_000, help="skip the loop above this triangle count")
+    args = parser.parse_args()
+
+    print(f"{'triangles':>10} {'loop [s]':>10} {'uniform [s]':>12} {'area [s]':>10} {'angle [s]':>10} {'speedup':>8}")
+    for size in args.sizes:
+        vertices, indices = wavy_grid(size)
+        repeat = 1 if len(indices) > 1_000_000 else 3
+
+        t_uniform = timeit(compute_normals, indices, vertices, repeat=repeat)
+        t_area = timeit(compute_normals, indices, vertices, weighting="area", repeat=repeat)
+        t_angle = timeit(compute_normals, indices, vertices, weighting="angle", repeat=repeat)
+        if len(indices) <= args.loop_limit:
+            t_loop = timeit(compute_normals_loop, indices, vertices, repeat=1)
+            assert np.allclose(compute_normals_loop(indices, vertices), compute_normals(indices, vertices))
+            loop_txt, speedup_txt = f"{t_loop:10.4f}", f"{t_loop / t_uniform:7.1f}x"
+        else:
+            loop_txt, speedup_txt = f"{'-':>10}", f"{'-':>8}"
+        print(f"{len(indices):>10} {loop_txt} {t_uniform:12.4f} {t_area:10.4f} {t_angle:10.4f} {speedup_txt}")
+
+
+if __name__ == "__main__":
+    main()
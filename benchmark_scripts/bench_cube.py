@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Benchmark and regression script; batched cube refinement compared to the former per-face loop
+@File      : bench_cube.py
+@Project   : pygletPlayground
+@Time      : 18.10.26 19:55
+@Author    : flowmeadow
+"""
+import argparse
+import sys
+import time
+from typing import Tuple
+
+import numpy as np
+
+from glpg.rendering.models.model_generation.geometry import cube
+
+
+def cube_loop(size: float = 1.0, refinement_steps: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Former implementation of 'cube' that bisects face by face and looks up new vertices in a list
+    :param size: edge length of the cube
+    :param refinement_steps: number of triangle refinements
+    :return: vertices [n, 3], indices [m, 3]
+    """
+    vertices, indices = cube(size=1.0, refinement_steps=0)
+    vertices, indices = vertices.tolist(), indices.tolist()
+    vertices_per_face = 3
+    for step in range(refinement_steps):
+        new_vertices, new_indices = vertices, []
+        vertices = np.array(vertices)
+        for triangle in indices:
+            edges = []
+            for i in range(vertices_per_face):
+                edges.append(vertices[triangle[(i + 1) % vertices_per_face]] - vertices[triangle[i]])
+            edges = np.array(edges)
+            largest_edge = np.argmax(np.linalg.norm(edges, axis=1))
+            new_vertex = vertices[triangle[largest_edge]] + edges[largest_edge] * 0.5
+
+            if new_vertex.tolist() not in new_vertices:
+                vertex_idx = len(new_vertices)
+                new_vertices.append(new_vertex.tolist())
+            else:
+                vertex_idx = new_vertices.index(new_vertex.tolist())
+
+            triangle_1 = [triangle[0], triangle[1], triangle[2]]
+            triangle_2 = [triangle[0], triangle[1], triangle[2]]
+            triangle_1[largest_edge] = vertex_idx
+            triangle_2[(largest_edge + 1) % vertices_per_face] = vertex_idx
+            new_indices.append(triangle_1)
+            new_indices.append(triangle_2)
+        vertices, indices = new_vertices, new_indices
+    return np.array(vertices) * size, np.array(indices)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-step", type=int, default=16)
+    parser.add_argument("--loop-limit", type=int, default=9, help="compare with the former loop up to this step")
+    args = parser.parse_args()
+
+    failed = []
+    print(f"{'step':>4} {'vertices':>9} {'faces':>9} {'loop [s]':>9} {'batched [s]':>12} {'identical':>10}")
+    for step in range(args.max_step + 1):
+        start = time.perf_counter()
+        vertices, indices = cube(size=2.0, refinement_steps=step)
+        t_batched = time.perf_counter() - start
+
+        t_loop, identical = f"{'-':>9}", "-"
+        if step <= args.loop_limit:
+            start = time.perf_counter()
+            vertices_loop, indices_loop = cube_loop(size=2.0, refinement_steps=step)
+            t_loop = f"{time.perf_counter() - start:9.3f}"
+            identical = np.array_equal(vertices, vertices_loop) and np.array_equal(indices, indices_loop)
+            if not identical:
+                failed.append(step)
+        print(f"{step:>4} {vertices.shape[0]:>9} {indices.shape[0]:>9} {t_loop} {t_batched:12.4f} {str(identical):>10}")
+
+    if failed:
+        print(f"Output differs from the former implementation for steps {failed}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Benchmark script; quadric error decimation of million-triangle meshes
+@File      : bench_decimation.py
+@Project   : pygletPlayground
+@Time      : 18.10.26 22:30
+@Author    : flowmeadow
+"""
+import argparse
+import sys
+import time
+from typing import Callable, Tuple
+
+import numpy as np
+
+from glpg.rendering.models.adjacency import Adjacency
+from glpg.rendering.models.model_generation.decimation import decimate
+from glpg.rendering.models.model_generation.geometry import grid, icosphere
+
+
+def sphere_mesh(refinement_steps: int) -> Tuple[np.ndarray, np.ndarray, Callable]:
+    """
+    :return: vertices, indices and the distance of points to the unit sphere
+    """
+    vertices, indices = icosphere(radius=1.0, refinement_steps=refinement_steps)
+    return vertices, indices, lambda points: np.abs(np.linalg.norm(points, axis=1) - 1.0)
+
+
+def terrain_mesh(size: int) -> Tuple[np.ndarray, np.ndarray, Callable]:
+    """
+    :return: vertices, indices and the height difference of points to the terrain function
+    """
+
+    def height(points: np.ndarray) -> np.ndarray:
+        return 0.05 * np.sin(6 * points[:, 0]) * np.cos(4 * points[:, 1])
+
+    vertices, indices = grid(size, size, size=1.0 / size)
+    vertices[:, 2] = height(vertices)
+    return vertices, indices, lambda points: np.abs(points[:, 2] - height(points))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--refinement-steps", type=int, default=9, help="icosphere refinement (9: 2.1M faces)")
+    parser.add_argument("--grid-size", type=int, default=512, help="terrain grid size (512: 1M faces)")
+    parser.add_argument("--ratios", type=float, nargs="+", default=[0.5, 0.1, 0.01])
+    args = parser.parse_args()
+
+    failed = False
+    header = f"{'mesh':>8} {'faces':>9} {'target':>9} {'result':>9} {'time [s]':>9} {'mean dev':>10} {'max dev':>10}"
+    print(f"{header} {'manifold':>9}")
+    for name, (vertices, indices, distance) in [
+        ("sphere", sphere_mesh(args.refinement_steps)),
+        ("terrain", terrain_mesh(args.grid_size)),
+    ]:
+        texture_coords = vertices[:, :2].copy()
+        colors = np.abs(vertices)
+        for ratio in args.ratios:
+            target = int(indices.shape[0] * ratio)
+            start = time.perf_counter()
+            result = decimate(vertices, indices, target_faces=target, colors=colors, texture_coords=texture_coords)
+            duration = time.perf_counter() - start
+            new_vertices, new_indices, new_colors, new_texture_coords = result
+
+            # deviation of the face centers from the surface, relative to the mesh size
+            deviation = distance(new_vertices[new_indices].mean(axis=1))
+            manifold = bool(np.bincount(Adjacency(new_indices).edge_ids).max() <= 2)
+            attributes = new_colors.shape[0] == new_texture_coords.shape[0] == new_vertices.shape[0]
+            failed |= not (manifold and attributes) or new_indices.shape[0] > target
+            print(
+                f"{name:>8} {indices.shape[0]:>9} {target:>9} {new_indices.shape[0]:>9} {duration:9.2f} "
+                f"{deviation.mean():10.2e} {deviation.max():10.2e} {str(manifold):>9}"
+            )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Benchmark script; vectorized grid and cylinder generation compared to the former loops
+@File      : bench_grid.py
+@Project   : pygletPlayground
+@Time      : 18.10.26 21:15
+@Author    : flowmeadow
+"""
+import argparse
+import time
+from typing import Tuple
+
+import numpy as np
+
+from glpg.rendering.models.model_generation.geometry import cylinder, grid
+
+
+def grid_loop(width: int = 2, length: int = 3, size: float = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Former implementation of 'grid' that appends one quad center per iteration
+    :return: vertices [n, 3], indices [m, 3]
+    """
+    if not size:
+        size = 1 / max(width, length)
+    x = np.arange((width + 1) * (length + 1)) % (width + 1)
+    y = np.arange((width + 1) * (length + 1)) // (width + 1)
+    z = np.zeros((width + 1) * (length + 1))
+    vertices = np.concatenate([[x], [y], [z]], axis=0).T
+    x_steps = np.arange(width)
+    y_steps = np.arange(0, (width + 1) * length, (width + 1))
+    steps = np.array(np.meshgrid(x_steps, y_steps)).T.reshape(-1, 2)
+    steps = np.sort(np.sum(steps, axis=1))
+    start_idcs = np.array([0, 1, width + 1, width + 2])
+    quad_idcs = np.full((len(steps), 4), start_idcs)
+    quad_idcs += np.full((len(steps), 4), np.array([steps]).T)
+    triangles = []
+    vert_offs = len(vertices)
+    for idx, quad in enumerate(quad_idcs):
+        new_vertex = np.mean(vertices[quad, :], axis=0)
+        vertices = np.concatenate([vertices, np.array([new_vertex])])
+        triangles.append([quad[0], quad[1], idx + vert_offs])
+        triangles.append([quad[1], quad[3], idx + vert_offs])
+        triangles.append([quad[3], quad[2], idx + vert_offs])
+        triangles.append([quad[2], quad[0], idx + vert_offs])
+    return vertices * size, np.array(triangles)
+
+
+def cylinder_loop(radius=0.1, height=0.2, angle_steps=32, height_steps=8) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Former implementation of 'cylinder' with nested loops
+    :return: vertices [n, 3], indices [m, 3]
+    """
+    angles = np.linspace(0, 2 * np.pi, angle_steps, endpoint=False)
+    vertices, indices = [], []
+    for h in np.linspace(0, height, height_steps):
+        vertices.append([0, 0, h])
+        for a in angles:
+            vertices.append([np.sin(a) * radius, np.cos(a) * radius, h])
+    for i in range(1, angle_steps + 1):
+        indices.append([0, i, i % angle_steps + 1])
+        offset = (angle_steps + 1) * (height_steps - 1)
+        indices.append([offset, offset + i, offset + i % angle_steps + 1])
+        for h in range(height_steps - 1):
+            offset_1 = (angle_steps + 1) * h
+            offset_2 = (angle_steps + 1) * (h + 1)
+            indices.append([offset_1 + i, offset_2 + i % angle_steps + 1, offset_1 + i % angle_steps + 1])
+            indices.append([offset_1 + i, offset_2 + i, offset_2 + i % angle_steps + 1])
+    return np.array(vertices), np.array(indices)
+
+
+def timeit(fun, *args, **kwargs):
+    """
+    :return: wall time in seconds and the result
+    """
+    start = time.perf_counter()
+    result = fun(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 64, 256, 1024, 2048, 4096])
+    parser.add_argument("--loop-limit", type=int, default=128, help="skip the former loops above this size")
+    args = parser.parse_args()
+
+    print(f"{'grid':>6} {'faces':>10} {'loop [s]':>9} {'f64/i64 [s]':>12} {'f32/u32 [s]':>12} {'MB':>8} {'equal':>6}")
+    for size in args.sizes:
+        t_64, (vertices, indices) = timeit(grid, size, size)
+        del vertices, indices
+        t_32, (vertices, indices) = timeit(grid, size, size, dtype=np.float32, index_dtype=np.uint32)
+        loop_col, equal = f"{'-':>9}", "-"
+        if size <= args.loop_limit:
+            t_loop, (vertices_loop, indices_loop) = timeit(grid_loop, size, size)
+            loop_col = f"{t_loop:9.3f}"
+            reference = grid(size, size)
+            equal = str(np.array_equal(reference[0], vertices_loop) and np.array_equal(reference[1], indices_loop))
+        mb = (vertices.nbytes + indices.nbytes) / 1e6
+        print(f"{size:>6} {indices.shape[0]:>10} {loop_col} {t_64:12.3f} {t_32:12.3f} {mb:8.1f} {equal:>6}")
+        del vertices, indices
+
+    print()
+    print(f"{'cylinder':>10} {'faces':>10} {'loop [s]':>9} {'vectorized [s]':>15} {'equal':>6}")
+    for steps in [32, 128, 512, 2048]:
+        t_loop, (vertices_loop, indices_loop) = timeit(cylinder_loop, angle_steps=steps, height_steps=steps)
+        t_vec, (vertices, indices) = timeit(cylinder, angle_steps=steps, height_steps=steps)
+        equal = np.array_equal(vertices, vertices_loop) and np.array_equal(indices, indices_loop)
+        print(f"{steps:>10} {indices.shape[0]:>10} {t_loop:9.3f} {t_vec:15.4f} {str(equal):>6}")
+
+
+if __name__ == "__main__":
+    main()
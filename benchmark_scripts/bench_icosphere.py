@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Benchmark script; vectorized icosphere subdivision compared to the former per-face loop
+@File      : bench_icosphere.py
+@Project   : pygletPlayground
+@Time      : 18.10.26 18:25
+@Author    : flowmeadow
+"""
+import argparse
+import time
+import tracemalloc
+from typing import Tuple
+
+import numpy as np
+
+from glpg.rendering.models.model_generation.geometry import icosphere
+
+
+def icosphere_loop(radius: float = 0.1, refinement_steps: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Former implementation of 'icosphere' that refines face by face and appends every new vertex
+    :param radius: radius of the icosphere
+    :param refinement_steps: number of triangle refinements
+    :return: vertices [n, 3], indices [m, 3]
+    """
+    vertices = np.array(
+        [[0.0, 0.0, -1.0], [0.0, 1.0, 0.0], [1.0, 0.0, 0.0], [0.0, -1.0, 0.0], [-1.0, 0.0, 0.0], [0.0, 0.0, 1.0]]
+    )
+    faces = np.array([[0, 1, 2], [0, 2, 3], [0, 3, 4], [0, 4, 1], [5, 4, 3], [5, 3, 2], [5, 2, 1], [5, 1, 4]])
+    for r_idx in range(refinement_steps):
+        edges = {}
+        new_faces = np.zeros((faces.shape[0] * 4, 3)).astype(np.uint)
+        for f_idx, face in enumerate(faces):
+            new_v_idcs = np.zeros((3,))
+            for e_idx, edge in enumerate([[face[0], face[1]], [face[1], face[2]], [face[2], face[0]]]):
+                sorted_edge = tuple(np.sort(edge))
+                if sorted_edge not in edges.keys():
+                    new_vert = np.array([np.mean(vertices[edge], axis=0)])
+                    v_idx = vertices.shape[0]
+                    vertices = np.concatenate([vertices, new_vert])
+                    edges[sorted_edge] = v_idx
+                else:
+                    v_idx = edges[sorted_edge]
+                new_v_idcs[e_idx] = v_idx
+            new_faces[f_idx * 4 + 0] = np.array([face[0], new_v_idcs[0], new_v_idcs[2]])
+            new_faces[f_idx * 4 + 1] = np.array([face[1], new_v_idcs[1], new_v_idcs[0]])
+            new_faces[f_idx * 4 + 2] = np.array([face[2], new_v_idcs[2], new_v_idcs[1]])
+            new_faces[f_idx * 4 + 3] = np.array([new_v_idcs[0], new_v_idcs[1], new_v_idcs[2]])
+        faces = new_faces
+    lengths = np.linalg.norm(vertices, axis=1)
+    for idx in range(3):
+        vertices[:, idx] /= lengths
+    return vertices * radius, faces
+
+
+def measure(fun, steps: int) -> Tuple[float, float, Tuple[np.ndarray, np.ndarray]]:
+    """
+    :return: wall time in seconds, peak traced memory in MB and the result
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fun(radius=1.0, refinement_steps=steps)
+    duration = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return duration, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-step", type=int, default=10)
+    parser.add_argument("--loop-limit", type=int, default=6, help="skip the former loop above this step")
+    args = parser.parse_args()
+
+    print(f"{'step':>4} {'faces':>10} {'loop [s]':>9} {'loop [MB]':>10} {'vec [s]':>8} {'vec [MB]':>9} {'equal':>6}")
+    for step in range(args.max_step + 1):
+        t_vec, m_vec, (vertices, faces) = measure(icosphere, step)
+        loop_cols, equal = f"{'-':>9} {'-':>10}", "-"
+        if step <= args.loop_limit:
+            t_loop, m_loop, (vertices_loop, faces_loop) = measure(icosphere_loop, step)
+            loop_cols = f"{t_loop:9.3f} {m_loop:10.1f}"
+            equal = str(np.array_equal(vertices, vertices_loop) and np.array_equal(faces, faces_loop))
+        print(f"{step:>4} {faces.shape[0]:>10} {loop_cols} {t_vec:8.3f} {m_vec:9.1f} {equal:>6}")
+
+
+if __name__ == "__main__":
+    main()
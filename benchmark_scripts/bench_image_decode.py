@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Benchmark script; load time and peak memory of the image decode path compared to per-pixel conversion
+@File      : bench_image_decode.py
+@Project   : pygletPlayground
+@Time      : 19.10.26 00:20
+@Author    : flowmeadow
+"""
+import argparse
+import ctypes as ct
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import PIL.Image
+
+from glpg.texturing.methods import img_file_to_byte_array
+
+
+def decode_legacy(path: str) -> ct.Array:
+    """
+    Former decode path, that builds a tuple for every pixel and copies the result into a ctypes array
+    :param path: path to the image file
+    :return: ctypes byte array
+    """
+    img = PIL.Image.open(path)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        img_data = np.array(list(img.getdata()), np.uint8)
+    data = np.array(img_data, dtype=np.ubyte).flatten()
+    c_data = (ct.c_ubyte * data.shape[0])()
+    c_data[:] = data
+    return c_data
+
+
+def decode_buffer(path: str) -> np.ndarray:
+    """
+    :param path: path to the image file
+    :return: flat uint8 array
+    """
+    return img_file_to_byte_array(path).c_data
+
+
+def run(method: str, path: str, queue: multiprocessing.Queue):
+    """
+    Decode an image in a fresh process, so the peak resident set size only covers this image
+    :param method: 'legacy' or 'buffer'
+    :param path: path to the image file
+    :param queue: receives load time [s] and additional peak RSS [MB]
+    """
+    fun = decode_legacy if method == "legacy" else decode_buffer
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    fun(path)
+    duration = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((duration, (rss_after - rss_before) / 1024))  # ru_maxrss is given in KB on Linux
+
+
+def measure(method: str, path: str):
+    """
+    :return: load time [s] and additional peak RSS [MB]
+    """
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=run, args=(method, path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 4096, 8192], help="image widths in pixels")
+    parser.add_argument("--image", type=str, default=None, help="additional image file, e.g. a demo texture")
+    parser.add_argument("--skip-legacy", action="store_true", help="the legacy path takes minutes for 8k images")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for size in args.sizes:
+            # smooth noise compresses like a photo, unlike white noise
+            rng = np.random.default_rng(size)
+            coarse = rng.integers(0, 256, (size // 64 + 1, size // 32 + 1, 3), dtype=np.uint8)
+            img = PIL.Image.fromarray(coarse).resize((size, size // 2), PIL.Image.BICUBIC)
+            path = os.path.join(directory, f"noise_{size}.jpg")
+            img.save(path, quality=90)
+            paths.append(path)
+        if args.image is not None:
+            paths.append(args.image)
+
+        print(f"{'image':>28} {'legacy [s]':>11} {'legacy [MB]':>12} {'buffer [s]':>11} {'buffer [MB]':>12}")
+        for path in paths:
+            with PIL.Image.open(path) as img:
+                name = f"{img.size[0]}x{img.size[1]} {img.mode} {os.path.basename(path)[:12]}"
+            legacy = (np.nan, np.nan) if args.skip_legacy else measure("legacy", path)
+            buffer = measure("buffer", path)
+            print(f"{name:>28} {legacy[0]:11.3f} {legacy[1]:12.1f} {buffer[0]:11.3f} {buffer[1]:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
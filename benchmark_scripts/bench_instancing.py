@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Benchmark script; drawing many copies of a model in a Python loop compared to one instanced draw call
+@File      : bench_instancing.py
+@Project   : pygletPlayground
+@Time      : 18.10.26 23:30
+@Author    : flowmeadow
+"""
+import argparse
+import time
+
+import numpy as np
+import pyglet
+from pyglet.gl import *
+
+from glpg.rendering.models.instanced_model import InstancedModel
+from glpg.rendering.models.model import Model
+from glpg.rendering.models.model_generation.geometry import icosphere
+
+
+def frame_time(draw, frames: int) -> float:
+    """
+    :return: mean time per frame in milliseconds
+    """
+    draw()  # warm-up (uniform and state caches)
+    glFinish()
+    start = time.perf_counter()
+    for _ in range(frames):
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        draw()
+        glFinish()
+    return 1000 * (time.perf_counter() - start) / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 1_000, 10_000])
+    parser.add_argument("--refinement-steps", type=int, default=2, help="icosphere refinement of each copy")
+    parser.add_argument("--frames", type=int, default=20)
+    args = parser.parse_args()
+
+    # an invisible window provides the OpenGL context
+    window = pyglet.window.Window(visible=False)
+    glEnable(GL_DEPTH_TEST)
+    glMatrixMode(GL_PROJECTION)
+    gluPerspective(60.0, 1.0, 0.1, 100.0)
+    glMatrixMode(GL_MODELVIEW)
+    gluLookAt(0.0, -30.0, 10.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+
+    vertices, indices = icosphere(refinement_steps=args.refinement_steps)
+    print(f"{'copies':>8} {'loop [ms]':>10} {'instanced [ms]':>15} {'speedup':>8}")
+    for count in args.counts:
+        positions = np.random.default_rng(0).uniform(-10.0, 10.0, (count, 3))
+        transforms = np.tile(np.identity(4, dtype=np.float32), (count, 1, 1))
+        transforms[:, :3, 3] = positions
+        colors = np.random.default_rng(1).random((count, 3))
+
+        model = Model(vertices, indices, color=[1.0, 1.0, 1.0])
+        instanced = InstancedModel(vertices, indices, transforms, instance_colors=colors)
+
+        def draw_loop():
+            for position in positions:
+                model.translate(*position)
+                model.draw()
+
+        t_loop = frame_time(draw_loop, args.frames)
+        t_instanced = frame_time(instanced.draw, args.frames)
+        print(f"{count:>8} {t_loop:10.2f} {t_instanced:15.2f} {t_loop / t_instanced:8.1f}")
+        model.delete()
+        instanced.delete()
+
+    window.close()
+
+
+if __name__ == "__main__":
+    main()
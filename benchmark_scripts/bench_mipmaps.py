@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Benchmark script; texture upload with glGenerateMipmap compared to uploading a precomputed mipmap chain
+@File      : bench_mipmaps.py
+@Project   : pygletPlayground
+@Time      : 19.10.26 01:20
+@Author    : flowmeadow
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import pyglet
+from pyglet.gl import *
+
+from glpg.texturing.methods import img_file_to_byte_array
+from glpg.texturing.texture import Texture
+
+
+def upload_time(path: str, repeat: int) -> float:
+    """
+    :return: best time of creating a texture from an IBA file in milliseconds
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        texture = Texture(path)
+        glFinish()
+        best = min(best, time.perf_counter() - start)
+        glDeleteTextures(1, texture.location)
+        glDeleteSamplers(1, texture.sampler_id)
+    return 1000 * best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=str, nargs="+", default=["demo_textures/8081_earthmap4k.jpg"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # an invisible window provides the OpenGL context
+    window = pyglet.window.Window(visible=False)
+
+    print(f"{'image':>24} {'offline [s]':>12} {'generate [ms]':>14} {'precomputed [ms]':>17} {'size':>6}")
+    with tempfile.TemporaryDirectory() as directory:
+        for image in args.images:
+            name = os.path.basename(image)
+            plain_path = os.path.join(directory, "plain", name)
+            mip_path = os.path.join(directory, "mip", name)
+            for path in (plain_path, mip_path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                shutil.copy(image, path)
+
+            img_file_to_byte_array(plain_path, save=True)
+            start = time.perf_counter()
+            img_file_to_byte_array(mip_path, save=True, mipmaps=True)
+            t_offline = time.perf_counter() - start
+
+            plain_iba, mip_iba = [os.path.splitext(path)[0] + ".iba" for path in (plain_path, mip_path)]
+            t_generate = upload_time(plain_iba, args.repeat)
+            t_precomputed = upload_time(mip_iba, args.repeat)
+            size = os.path.getsize(mip_iba) / os.path.getsize(plain_iba)
+            print(f"{name[:24]:>24} {t_offline:12.2f} {t_generate:14.1f} {t_precomputed:17.1f} {size:6.2f}")
+
+    window.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Benchmark script; shader startup time without, with a cold and with a warm program binary cache
+@File      : bench_shader_startup.py
+@Project   : pygletPlayground
+@Time      : 18.10.26 17:40
+@Author    : flowmeadow
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+
+import pyglet
+
+from glpg.definitions import *
+from glpg.rendering.gpu.shader import Shader, ShaderProgram
+
+
+def run(cache_dir: str, max_lights: int) -> dict:
+    """
+    Create all built-in shaders for 1 to 'max_lights' light sources in a fresh OpenGL context
+    :param cache_dir: program binary cache directory ('': disabled)
+    :param max_lights: maximum number of light sources
+    :return: startup time in seconds and cache statistics
+    """
+    # an invisible window provides the OpenGL context
+    window = pyglet.window.Window(visible=False)
+    ShaderProgram.binary_cache_dir = cache_dir if cache_dir else None
+
+    shader_ids = [GLPG_SHADER_FLAT, GLPG_SHADER_GOURAUD, GLPG_SHADER_BLINNPHONG, GLPG_SHADER_TOON]
+    start = time.perf_counter()
+    shaders = [Shader(s, num_lights=n) for s in shader_ids for n in range(1, max_lights + 1)]
+    duration = time.perf_counter() - start
+
+    for shader in shaders:
+        shader.delete()
+    window.close()
+    return dict(time=duration, programs=len(shaders), **ShaderProgram.binary_cache_stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-lights", type=int, default=4, help="programs per shader (one per light count)")
+    parser.add_argument("--warm-runs", type=int, default=3)
+    parser.add_argument("--run", type=str, default=None, help=argparse.SUPPRESS)  # internal: single launch
+    args = parser.parse_args()
+
+    if args.run is not None:
+        print(json.dumps(run(args.run, args.max_lights)))
+        return
+
+    def launch(cache_dir: str) -> dict:
+        # every launch is a new process, as drivers cache compiled shaders in memory as well
+        cmd = [sys.executable, __file__, "--max-lights", str(args.max_lights), "--run", cache_dir]
+        return json.loads(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.splitlines()[-1])
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        results = [("no cache", launch("")), ("cold cache", launch(cache_dir))]
+        results += [(f"warm cache {i + 1}", launch(cache_dir)) for i in range(args.warm_runs)]
+
+    print(f"{'launch':>14} {'programs':>9} {'time [ms]':>10} {'hits':>5} {'misses':>7} {'rejected':>9}")
+    for name, res in results:
+        print(
+            f"{name:>14} {res['programs']:>9} {1000 * res['time']:10.1f} "
+            f"{res['hits']:>5} {res['misses']:>7} {res['rejected']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
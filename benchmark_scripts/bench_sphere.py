@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Benchmark and regression script; vectorized sphere edge flipping compared to the former nested search
+@File      : bench_sphere.py
+@Project   : pygletPlayground
+@Time      : 18.10.26 20:40
+@Author    : flowmeadow
+"""
+import argparse
+import sys
+import time
+from typing import Tuple
+
+import numpy as np
+
+from glpg.rendering.models.model_generation.geometry import sphere
+
+
+def sphere_loop(radius: float = 0.1, refinement_steps: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Former implementation of 'sphere' that searches the neighbor of each face in all faces
+    :param radius: radius of the sphere
+    :param refinement_steps: number of triangle refinements
+    :return: vertices [n, 3], indices [m, 3]
+    """
+    vertices, indices = sphere(radius=radius, refinement_steps=0)
+    for r_idx in range(refinement_steps):
+        new_indices, edges = [], []
+        for triangle in indices:
+            vert_index = len(vertices)
+            new_vert = np.mean(vertices[triangle], axis=0)
+            new_vert = (new_vert / np.linalg.norm(new_vert)) * radius
+            vertices = np.append(vertices, [new_vert], axis=0)
+            new_indices.append([vert_index, triangle[0], triangle[1]])
+            new_indices.append([vert_index, triangle[1], triangle[2]])
+            new_indices.append([vert_index, triangle[2], triangle[0]])
+        indices = np.array(new_indices)
+        for idx in range(len(indices)):
+            triangle = indices[idx]
+            c_triangle, c_idx = 0, 0
+            for c_idx in range(len(indices)):
+                c_triangle = indices[c_idx]
+                if triangle[1] in c_triangle and triangle[2] in c_triangle and triangle[0] not in c_triangle:
+                    break
+            c_vert = c_triangle[np.where((c_triangle != triangle[1]) & (c_triangle != triangle[2]))[0]]
+            edge_1 = [triangle[1], triangle[2]]
+            edge_2 = [triangle[0], c_vert[0]]
+            dist_1 = np.linalg.norm(vertices[edge_1[0]] - vertices[edge_1[1]])
+            dist_2 = np.linalg.norm(vertices[edge_2[0]] - vertices[edge_2[1]])
+            if dist_1 > dist_2:
+                indices[idx] = [edge_1[0], edge_2[1], edge_2[0]]
+                indices[c_idx] = [edge_1[1], edge_2[0], edge_2[1]]
+    return vertices, indices
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-step", type=int, default=10)
+    parser.add_argument("--loop-limit", type=int, default=4, help="compare with the former loop up to this step")
+    args = parser.parse_args()
+
+    failed = []
+    print(f"{'step':>4} {'vertices':>9} {'faces':>9} {'loop [s]':>9} {'vectorized [s]':>15} {'identical':>10}")
+    for step in range(args.max_step + 1):
+        start = time.perf_counter()
+        vertices, indices = sphere(radius=1.0, refinement_steps=step)
+        t_vec = time.perf_counter() - start
+
+        t_loop, identical = f"{'-':>9}", "-"
+        if step <= args.loop_limit:
+            start = time.perf_counter()
+            vertices_loop, indices_loop = sphere_loop(radius=1.0, refinement_steps=step)
+            t_loop = f"{time.perf_counter() - start:9.3f}"
+            identical = np.array_equal(indices, indices_loop) and np.allclose(vertices, vertices_loop, rtol=0, atol=1e-12)
+            if not identical:
+                failed.append(step)
+        print(f"{step:>4} {vertices.shape[0]:>9} {indices.shape[0]:>9} {t_loop} {t_vec:15.4f} {str(identical):>10}")
+
+    if failed:
+        print(f"Output differs from the former implementation for steps {failed}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Benchmark script; drawing many small static models one by one compared to a merged static batch
+@File      : bench_static_batch.py
+@Project   : pygletPlayground
+@Time      : 18.10.26 23:55
+@Author    : flowmeadow
+"""
+import argparse
+import time
+
+import numpy as np
+import pyglet
+from pyglet.gl import *
+
+from glpg.rendering.models.model import Model
+from glpg.rendering.models.model_generation.geometry import cube
+from glpg.rendering.models.static_batch import StaticBatch
+
+
+def frame_time(draw, frames: int) -> float:
+    """
+    :return: mean time per frame in milliseconds
+    """
+    draw()  # warm-up (uniform and state caches)
+    glFinish()
+    start = time.perf_counter()
+    for _ in range(frames):
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        draw()
+        glFinish()
+    return 1000 * (time.perf_counter() - start) / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 500, 2_000])
+    parser.add_argument("--hidden", type=float, default=0.3, help="fraction of hidden members in the last column")
+    parser.add_argument("--frames", type=int, default=20)
+    args = parser.parse_args()
+
+    # an invisible window provides the OpenGL context
+    window = pyglet.window.Window(visible=False)
+    glEnable(GL_DEPTH_TEST)
+    glMatrixMode(GL_PROJECTION)
+    gluPerspective(60.0, 1.0, 0.1, 100.0)
+    glMatrixMode(GL_MODELVIEW)
+    gluLookAt(0.0, -30.0, 10.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+
+    vertices, indices = cube(refinement_steps=1)
+    print(f"{'models':>8} {'separate [ms]':>14} {'batch [ms]':>11} {'batch, hidden [ms]':>19} {'build [s]':>10}")
+    for count in args.counts:
+        rng = np.random.default_rng(0)
+        positions = rng.uniform(-10.0, 10.0, (count, 3))
+        models = [Model(vertices, indices, translation=position) for position in positions]
+
+        start = time.perf_counter()
+        batch = StaticBatch(models)
+        t_build = time.perf_counter() - start
+
+        def draw_separate():
+            for model in models:
+                model.draw()
+
+        t_separate = frame_time(draw_separate, args.frames)
+        t_batch = frame_time(batch.draw, args.frames)
+        batch.set_visible(rng.random(count) < args.hidden, False)
+        t_hidden = frame_time(batch.draw, args.frames)
+        print(f"{count:>8} {t_separate:14.2f} {t_batch:11.2f} {t_hidden:19.2f} {t_build:10.3f}")
+        for model in models:
+            model.delete()
+        batch.delete()
+
+    window.close()
+
+
+if __name__ == "__main__":
+    main()
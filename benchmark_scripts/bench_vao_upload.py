@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Benchmark script; upload throughput of the VAO buffer path compared to ctypes array unpacking
+@File      : bench_vao_upload.py
+@Project   : pygletPlayground
+@Time      : 18.10.26 11:03
+@Author    : flowmeadow
+"""
+import argparse
+import ctypes as ct
+import time
+
+import numpy as np
+import pyglet
+from pyglet.gl import *
+
+from glpg.rendering.gpu.vao import VAO
+
+
+def upload_ctypes(data: np.ndarray) -> None:
+    """
+    Former upload path, that unpacks every float into a ctypes array
+    :param data: vertex attribute array [n, k]
+    """
+    data = np.array(data, dtype=np.float32).flatten()
+    c_data = (ct.c_float * data.shape[0])(*data)
+    glBufferData(GL_ARRAY_BUFFER, data.nbytes, c_data, GL_STATIC_DRAW)
+
+
+def measure(fun, data: np.ndarray, repeat: int) -> float:
+    """
+    :return: upload throughput in MB/s (best of several runs)
+    """
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fun(data)
+        glFinish()
+        best = min(best, time.perf_counter() - start)
+    return data.astype(np.float32).nbytes / best / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000, 4_000_000])
+    parser.add_argument("--ctypes-limit", type=int, default=1_000_000, help="skip the ctypes path above this size")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # an invisible window provides the OpenGL context
+    window = pyglet.window.Window(visible=False)
+    buffer_id = GLuint()
+    glGenBuffers(1, buffer_id)
+    glBindBuffer(GL_ARRAY_BUFFER, buffer_id)
+
+    print(f"{'vertices':>10} {'MB':>8} {'ctypes [MB/s]':>14} {'buffer [MB/s]':>14}")
+    for size in args.sizes:
+        data = np.random.random((size, 3)).astype(np.float32)
+        rate_buffer = measure(VAO.assign_vbo_data, data, args.repeat)
+        if size <= args.ctypes_limit:
+            rate_ctypes = f"{measure(upload_ctypes, data, 1):14.1f}"
+        else:
+            rate_ctypes = f"{'-':>14}"
+        print(f"{size:>10} {data.nbytes / 1e6:8.1f} {rate_ctypes} {rate_buffer:14.1f}")
+
+    glDeleteBuffers(1, buffer_id)
+    window.close()
+
+
+if __name__ == "__main__":
+    main()
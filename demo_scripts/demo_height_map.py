@@ -175,10 +175,6 @@ class DemoApp(GLScreen):
         handle pygame events and do other stuff before drawing
         :return: None
         """
-        self.grid.update_camera(
-            self.cam.camera_pos, self.cam.camera_view
-        )  # update camera based on user inputs
-
         # generate new heightmap
         height_array = generate_height_map(
             grid_size=self.grid_size,
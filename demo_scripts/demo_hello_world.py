@@ -96,10 +96,8 @@ class HelloWorld(GLScreen):
         handle pygame events and do other stuff before drawing
         :return: None
         """
-        # update camera position for all objects that use it in their shader
-        self.earth.update_camera(self.cam.camera_pos, self.cam.camera_view)
-        self.clouds.update_camera(self.cam.camera_pos, self.cam.camera_view)
-        self.sun.update_camera(self.cam.camera_pos, self.cam.camera_view)
+        # the camera is shared with all shaders by GLScreen.draw_frame (see FrameUniforms)
+        pass
 
     def draw_world(self) -> None:
         """
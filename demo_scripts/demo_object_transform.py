@@ -103,10 +103,6 @@ class DemoApp(GLScreen):
         handle pygame events and do other stuff before drawing
         :return: None
         """
-        self.sphere.update_camera(self.cam.camera_pos, self.cam.camera_view)  # update camera based on user inputs
-        self.cube.update_camera(self.cam.camera_pos, self.cam.camera_view)  # update camera based on user inputs
-        self.cylinder.update_camera(self.cam.camera_pos, self.cam.camera_view)  # update camera based on user inputs
-
         pass
 
     def draw_world(self) -> None:
@@ -68,8 +68,8 @@ class HelloWorldWidget(GLWidget):
         handle pygame events and do other stuff before drawing
         :return: None
         """
-        # update camera position for all objects that use it in their shader
-        self.earth.update_camera(self.cam.camera_pos, self.cam.camera_view)
+        # the camera is shared with all shaders by GLScreen.draw_frame (see FrameUniforms)
+        pass
 
     def draw_world(self) -> None:
         """
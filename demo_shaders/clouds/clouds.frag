@@ -1,9 +1,9 @@
 #version 130
 
 
-uniform vec3 cameraPos;  // camera position
+#include "glpg_frame.glsl"  // camera, runtime and light sources shared by all programs
+
 uniform int iLights;  // number of light sources
-uniform int iTime;  // number of textures
 uniform sampler2D objTexture0;  // texture
 
 in vec2 uVec1;  // derivate vector for texturing without vertex seam
@@ -1,7 +1,8 @@
 #version 130
 
 
-uniform vec3 cameraPos;  // camera position
+#include "glpg_frame.glsl"  // camera, runtime and light sources shared by all programs
+
 
 in vec3 fNormal;  // face normal
 in vec3 fPosition;  // fragment position
@@ -13,6 +13,10 @@ from pyglet.gl import *
 
 from glpg.camera.camera import Camera
 from glpg.display.base import Base
+from glpg.rendering.gpu.state import GLState
+from glpg.rendering.gpu.uniform_buffer import FrameUniforms
+from glpg.texturing.async_loader import TextureLoader
+from glpg.transformations.methods import get_M, get_P
 
 
 class GLScreen(Base):
@@ -34,8 +38,9 @@ class GLScreen(Base):
 
         super().__init__(**kwargs)
 
-        # initialize camera
+        # initialize camera and light sources (Lights object; shared with all shaders via FrameUniforms)
         self.cam = Camera()
+        self.lights = None
 
     def init_gl(self):
         """
@@ -51,6 +56,11 @@ class GLScreen(Base):
         """
         Run drawing pipeline
         """
+        # store the GL call statistics of the last frame (see GLState.frame_stats)
+        GLState.new_frame()
+        # continue uploading asynchronously loaded textures (see Texture.async_load)
+        TextureLoader.process()
+
         # initialize perspective
         glLoadIdentity()
         gluPerspective(45, (self.width / self.height), 0.1, 50.0)
@@ -76,6 +86,14 @@ class GLScreen(Base):
             *(self.cam.camera_pos + self.cam.camera_view),
             *self.cam.camera_up,
         )
+        # update camera, projection, runtime and light sources for all shader programs at once
+        FrameUniforms.update(
+            self.cam.camera_pos,
+            self.cam.camera_view,
+            projection=get_P(),
+            view=get_M(),
+            lights=self.lights,
+        )
         # draw world objects (empty by default)
         self.draw_world()
         glFlush()
@@ -88,6 +106,7 @@ class GLScreen(Base):
         glMatrixMode(GL_PROJECTION)
         glLoadIdentity()
         glOrtho(0, self.width, 0.0, self.height, -1.0, 1.0)
+        GLState.use_fixed_function()
         self.draw_screen()
         glEnable(GL_DEPTH_TEST)
 
@@ -43,8 +43,9 @@ class GLWidget(QOpenGLWidget):
         self.timer.setInterval(0)
         self.timer.start()
 
-        # initialize camera
+        # initialize camera and light sources
         self.cam = Camera()
+        self.lights = None
 
     def my_draw(self):
         """
@@ -7,31 +7,268 @@
 @Author    : flowmeadow
 """
 import ctypes as ct
+import hashlib
 import importlib
 import os
 import time
-from typing import Union
+from typing import Dict, Optional, Sequence, Tuple, Union
 
 import numpy as np
 from pyglet.gl import *
+from pyglet.gl.lib import GLException
+
+from glpg.rendering.gpu.state import GLState
+from glpg.rendering.gpu.uniform_buffer import FrameUniforms
+from glpg.rendering.gpu.vao import VAO
+
+
+class ShaderProgram:
+    """
+    Linked program shared by all Shader objects with the same source code and configuration. Holds the uniform
+    locations and the uniform cache, as uniform values are part of the program state. Programs are stored in a
+    process-wide cache and deleted when their last Shader is deleted.
+
+    If 'binary_cache_dir' is set, linked program binaries are stored on disk and loaded on the next start instead of
+    compiling the sources again. Binaries are specific to the driver; rejected binaries are compiled again.
+    """
+
+    _cache: Dict[Tuple[str, int, int], "ShaderProgram"] = {}
+
+    # directory of the on-disk program binary cache (None: disabled), e.g. '~/.cache/glpg/shaders'
+    binary_cache_dir: Optional[str] = None
+    # number of programs loaded from the binary cache, compiled, and binaries rejected by the driver
+    binary_cache_stats = dict(hits=0, misses=0, rejected=0)
+
+    def __init__(self, key: Tuple[str, int, int], vs_src: str, fs_src: str, file_name: str = None):
+        """
+        Load the program from the binary cache or compile and link it
+        :param key: cache key (source hash, number of light sources, number of textures)
+        :param vs_src: vertex shader source code
+        :param fs_src: fragment shader source code
+        :param file_name: file_name of the shader. Used for debugging only
+        """
+        self.start_time = time.time()  # define time constant
+        self.key = key
+        self.ref_count = 0  # number of Shader objects using this program
+
+        self.program = glCreateProgram()
+        binary_file = self._binary_file()
+        if binary_file is None or not self._load_binary(binary_file):
+            self._compile(vs_src, fs_src, file_name, retrievable=binary_file is not None)
+            if binary_file is not None:
+                self._save_binary(binary_file)
+
+        # connect the per-frame uniform block, if the program uses it
+        block_index = glGetUniformBlockIndex(self.program, FrameUniforms.block_name.encode("ascii"))
+        if block_index != GL_INVALID_INDEX:
+            glUniformBlockBinding(self.program, block_index, FrameUniforms.binding)
+
+        # last uploaded and pending (dirty) value of each uniform location
+        self.uniform_values = {}
+        self.dirty_uniforms = {}
+
+        # get locations
+        self.model_matrix_loc = glGetUniformLocation(self.program, "modelMatrix".encode("ascii"))
+        self.camera_pos_loc = glGetUniformLocation(self.program, "cameraPos".encode("ascii"))
+        self.camera_view_loc = glGetUniformLocation(self.program, "cameraView".encode("ascii"))
+        self.time_loc = glGetUniformLocation(self.program, "iTime".encode("ascii"))
+
+    def _compile(self, vs_src: str, fs_src: str, file_name: str = None, retrievable: bool = False) -> None:
+        """
+        Compile the shaders and link the program
+        :param vs_src: vertex shader source code
+        :param fs_src: fragment shader source code
+        :param file_name: file_name of the shader. Used for debugging only
+        :param retrievable: if True, the driver is asked to keep the program binary retrievable
+        """
+        # compile shader
+        vs = Shader.load_shader(vs_src, GL_VERTEX_SHADER, file_name)
+        if not vs:
+            raise ValueError("Vertex shader could not be loaded")
+        fs = Shader.load_shader(fs_src, GL_FRAGMENT_SHADER, file_name)
+        if not fs:
+            raise ValueError("Fragment shader could not be loaded")
+
+        # compile program
+        glAttachShader(self.program, vs)
+        glAttachShader(self.program, fs)
+        if retrievable:
+            glProgramParameteri(self.program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+
+        # reserved locations of the per-instance attributes (see 'VAO.instance_attributes')
+        for glsl_name, location, _ in VAO.instance_attributes.values():
+            glBindAttribLocation(self.program, location, glsl_name.encode("ascii"))
+
+        # link program
+        glLinkProgram(self.program)
+
+        # not needed anymore
+        glDetachShader(self.program, vs)
+        glDetachShader(self.program, fs)
+        glDeleteShader(vs)
+        glDeleteShader(fs)
+
+        if not self._link_status():
+            # retrieve the log text
+            length = ct.c_int(0)
+            glGetProgramiv(self.program, GL_INFO_LOG_LENGTH, ct.byref(length))
+            log = ct.create_string_buffer(max(length.value, 1))
+            glGetProgramInfoLog(self.program, length, None, log)
+            raise ImportError(f"{file_name if file_name else 'unknown'}:\n\n{log.value.decode('utf-8')}")
+
+    def _link_status(self) -> bool:
+        """
+        :return: True, if the program is linked successfully
+        """
+        status = ct.c_int(0)
+        glGetProgramiv(self.program, GL_LINK_STATUS, ct.byref(status))
+        return bool(status.value)
+
+    def _binary_file(self) -> Optional[str]:
+        """
+        :return: path of the program binary in the cache directory; None, if the cache is disabled or not supported
+        """
+        if self.binary_cache_dir is None:
+            return None
+        try:
+            num_formats = ct.c_int(0)
+            glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS, ct.byref(num_formats))
+        except GLException:
+            return None  # GL_ARB_get_program_binary is not available
+        if num_formats.value == 0:
+            return None
+
+        # binaries are only valid for the driver that created them
+        driver = [ct.cast(glGetString(name), ct.c_char_p).value for name in (GL_VENDOR, GL_RENDERER, GL_VERSION)]
+        file_hash = hashlib.sha1(repr((self.key, driver)).encode("utf-8")).hexdigest()
+        return os.path.join(os.path.expanduser(self.binary_cache_dir), f"{file_hash}.bin")
+
+    def _load_binary(self, binary_file: str) -> bool:
+        """
+        Load the program from a binary file. The file is removed, if the driver rejects the binary
+        :param binary_file: path of the binary file; the first 4 bytes store the binary format
+        :return: True, if the program was loaded and linked successfully
+        """
+        try:
+            with open(binary_file, "rb") as f:
+                data = f.read()
+        except OSError:
+            self.binary_cache_stats["misses"] += 1
+            return False
+
+        if len(data) > 4:
+            binary_format = int.from_bytes(data[:4], "little")
+            try:
+                glProgramBinary(self.program, binary_format, data[4:], len(data) - 4)
+                if self._link_status():
+                    self.binary_cache_stats["hits"] += 1
+                    return True
+            except GLException:
+                pass  # e.g. the binary format is not supported anymore after a driver update
+
+        # rejected; start again with a new program object
+        self.binary_cache_stats["rejected"] += 1
+        glDeleteProgram(self.program)
+        self.program = glCreateProgram()
+        try:
+            os.remove(binary_file)
+        except OSError:
+            pass
+        return False
+
+    def _save_binary(self, binary_file: str) -> None:
+        """
+        Store the linked program in a binary file. The cache is optional, so write errors are ignored
+        :param binary_file: path of the binary file
+        """
+        length = ct.c_int(0)
+        glGetProgramiv(self.program, GL_PROGRAM_BINARY_LENGTH, ct.byref(length))
+        if length.value == 0:
+            return
+        binary = ct.create_string_buffer(length.value)
+        binary_format = GLenum(0)
+        glGetProgramBinary(self.program, length, None, ct.byref(binary_format), binary)
+
+        # write to a temporary file first, so other processes never read incomplete binaries
+        tmp_file = f"{binary_file}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(binary_file), exist_ok=True)
+            with open(tmp_file, "wb") as f:
+                f.write(binary_format.value.to_bytes(4, "little"))
+                f.write(binary.raw)
+            os.replace(tmp_file, binary_file)
+        except OSError:
+            pass
+
+    @classmethod
+    def acquire(
+        cls, vs_src: str, fs_src: str, num_lights: int, num_textures: int, file_name: str = None
+    ) -> "ShaderProgram":
+        """
+        Return the cached program for the given source code and configuration, or create it
+        :param vs_src: vertex shader source code (includes resolved)
+        :param fs_src: fragment shader source code (includes resolved)
+        :param num_lights: number of light sources
+        :param num_textures: number of textures
+        :param file_name: file_name of the shader. Used for debugging only
+        :return: ShaderProgram object
+        """
+        source_hash = hashlib.sha1(f"{vs_src}\0{fs_src}".encode("utf-8")).hexdigest()
+        key = (source_hash, num_lights, num_textures)
+        program = cls._cache.get(key)
+        if program is None:
+            program = cls(key, vs_src, fs_src, file_name)
+            cls._cache[key] = program
+        program.ref_count += 1
+        return program
+
+    def release(self) -> None:
+        """
+        Decrease the reference count and delete the program, if it is not used anymore
+        """
+        self.ref_count -= 1
+        if self.ref_count > 0:
+            return
+        if GLState.current_program() == self.program:
+            GLState.use_program(0)
+        glDeleteProgram(self.program)
+        self._cache.pop(self.key, None)
+
+    @classmethod
+    def cache_info(cls) -> Dict[Tuple[str, int, int], int]:
+        """
+        :return: reference count of each cached program
+        """
+        return {key: program.ref_count for key, program in cls._cache.items()}
 
 
 class Shader:
     """
-    Handles loading, linking and use of GLSL shaders
+    Handles loading, linking and use of GLSL shaders. Shader objects with the same source code and configuration
+    share one linked program (see ShaderProgram).
     """
 
-    def __init__(self, shader: Union[int, str], model_base: str = "base", num_lights: int = 1, num_textures: int = 0):
+    # directory of GLSL files that can be included by every shader (e.g. '#include "glpg_frame.glsl"')
+    include_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "shader", "include")
+
+    def __init__(
+        self,
+        shader: Union[int, str],
+        model_base: str = "base",
+        num_lights: int = 1,
+        num_textures: int = 0,
+        defines: Sequence[str] = (),
+    ):
         """
-        Create program and compile shader
+        Load shader and get the linked program from the program cache
         :param shader: filename of the shader without extension. A '*.vert' and '*.frag' file must be available.
         :param model_base: parent directory of the shader. Other models might require different shaders (e.g. material)
         :param num_lights: number of light sources
+        :param num_textures: number of textures
+        :param defines: preprocessor macros defined in both shaders (e.g. 'GLPG_INSTANCED'); each combination is
+        linked to its own program
         """
-        self.start_time = time.time()  # define time constant
-
         self.model_base = model_base
-        self.program = glCreateProgram()
 
         # load shader text
         if isinstance(shader, str):
@@ -55,59 +292,65 @@ class Shader:
             shader_name = name_list[shader]
             shader_txt = importlib.import_module(f"glpg.shader.{model_base}.{shader_name}.{shader_name}")
 
-            vs_src = shader_txt.vert_txt
-            fs_src = shader_txt.frag_txt
-            # TODO: load imports as well
+            vs_src = self._handle_imports(shader_txt.vert_txt, self.include_dir)
+            fs_src = self._handle_imports(shader_txt.frag_txt, self.include_dir)
         else:
             raise NotImplementedError()
+        vs_src, fs_src = self._add_defines(vs_src, defines), self._add_defines(fs_src, defines)
 
-        # compile shader
-        vs = self.load_shader(vs_src, GL_VERTEX_SHADER, shader)
-        if not vs:
-            raise ValueError("Vertex shader could not be loaded")
-        fs = self.load_shader(fs_src, GL_FRAGMENT_SHADER, shader)
-        if not fs:
-            raise ValueError("Fragment shader could not be loaded")
-
-        # compile program
-        self.program = glCreateProgram()
-        glAttachShader(self.program, vs)
-        glAttachShader(self.program, fs)
+        # get shared program; configuration uniforms are only set for new programs
+        self._program = ShaderProgram.acquire(vs_src, fs_src, num_lights, num_textures, shader)
+        self.model_matrix_loc = self._program.model_matrix_loc
+        self.camera_pos_loc = self._program.camera_pos_loc
+        self.camera_view_loc = self._program.camera_view_loc
+        self.time_loc = self._program.time_loc
+        if self._program.ref_count == 1:
+            num_lights_loc = glGetUniformLocation(self.program, "iLights".encode("ascii"))
+            num_textures_loc = glGetUniformLocation(self.program, "iTextures".encode("ascii"))
+            self.set_uniform(num_lights_loc, "int", num_lights)  # set number of light sources
+            self.set_uniform(num_textures_loc, "int", num_textures)  # set number of textures
+            for t_idx in range(num_textures):
+                tex_loc = glGetUniformLocation(self.program, f"objTexture{t_idx}".encode("ascii"))
+                self.set_uniform(tex_loc, "int", t_idx)
+            self.use()
+            self.un_use()
 
-        # link program
-        glLinkProgram(self.program)
-
-        # not needed anymore
-        glDeleteShader(vs)
-        glDeleteShader(fs)
+    @property
+    def program(self) -> int:
+        """
+        :return: program id
+        """
+        return self._program.program
 
-        # get locations and set uniforms
-        self.use()
-        self.model_matrix_loc = glGetUniformLocation(self.program, "modelMatrix".encode("ascii"))
-        self.camera_pos_loc = glGetUniformLocation(self.program, "cameraPos".encode("ascii"))
-        self.camera_view_loc = glGetUniformLocation(self.program, "cameraView".encode("ascii"))
-        self.time_loc = glGetUniformLocation(self.program, "iTime".encode("ascii"))
-        num_lights_loc = glGetUniformLocation(self.program, "iLights".encode("ascii"))
-        num_textures_loc = glGetUniformLocation(self.program, "iTextures".encode("ascii"))
-        glUniform1i(num_lights_loc, ct.c_int32(num_lights))  # set number of light sources
-        glUniform1i(num_textures_loc, ct.c_int32(num_textures))  # set number of textures
-        for t_idx in range(num_textures):
-            tex_loc = glGetUniformLocation(self.program, f"objTexture{t_idx}".encode("ascii"))
-            glUniform1i(tex_loc, t_idx)
-        self.un_use()
+    @property
+    def start_time(self) -> float:
+        """
+        :return: creation time of the program
+        """
+        return self._program.start_time
 
     def use(self) -> None:
         """
-        Select the current program
+        Select the current program and upload all pending uniform values
         """
-        glUseProgram(self.program)
+        GLState.use_program(self.program)
+        if self._program.dirty_uniforms:
+            self.flush_uniforms()
 
     @staticmethod
     def un_use() -> None:
         """
         Unselect the current program
         """
-        glUseProgram(0)
+        GLState.use_program(0)
+
+    def delete(self) -> None:
+        """
+        Release the shared program. It is deleted, if no other Shader object uses it
+        """
+        if self._program is not None:
+            self._program.release()
+            self._program = None
 
     @staticmethod
     def load_shader(src: str, shader_type: int, file_name: str = None) -> int:
@@ -152,10 +395,7 @@ class Shader:
         Updates the uniform modelMatrix attribute
         :param matrix: transformation matrix [4, 4]
         """
-        self.use()
-        mat = matrix.flatten("F")
-        glUniformMatrix4fv(self.model_matrix_loc, 1, False, (ct.c_float * 16)(*mat))
-        self.un_use()
+        self.set_uniform(self.model_matrix_loc, "mat4", np.asarray(matrix).flatten("F"))
 
     def update_camera(self, camera_pos: np.ndarray, camera_view: np.ndarray):
         """
@@ -163,19 +403,67 @@ class Shader:
         :param camera_pos: camera position array (3,)
         :param camera_view: camera view direction array (3,)
         """
-        self.use()
-        glUniform3f(self.camera_pos_loc, *np.array(camera_pos, dtype=np.float32).flatten("F"))
-        glUniform3f(self.camera_view_loc, *np.array(camera_view, dtype=np.float32).flatten("F"))
-        self.un_use()
+        self.set_uniform(self.camera_pos_loc, "vec3", camera_pos)
+        self.set_uniform(self.camera_view_loc, "vec3", camera_view)
 
     def update_time(self):
         """
         update runtime in milliseconds
         """
-        self.use()
         t = int(1000 * (time.time() - self.start_time))
-        glUniform1i(self.time_loc, t)
-        self.un_use()
+        self.set_uniform(self.time_loc, "int", t)
+
+    def set_uniform(self, location: int, uniform_type: str, value: Union[int, float, np.ndarray]) -> None:
+        """
+        Set a uniform value. The upload is skipped if the value did not change since the last upload. Otherwise,
+        it is uploaded immediately if the program is in use, or with all other pending values on the next 'use'.
+        :param location: uniform location (-1: not used by the program)
+        :param uniform_type: 'int', 'float', 'vec3' or 'mat4' (column-major)
+        :param value: uniform value
+        """
+        if location == -1:
+            return
+        value = np.array(value, dtype=np.int32 if uniform_type == "int" else np.float32).reshape(-1)
+        last_value = self._program.uniform_values.get(location)
+        if last_value is not None and np.array_equal(last_value, value):
+            self._program.dirty_uniforms.pop(location, None)  # an earlier pending change was reverted
+            return
+        self._program.dirty_uniforms[location] = (uniform_type, value)
+        if GLState.current_program() == self.program:
+            self.flush_uniforms()
+
+    def flush_uniforms(self) -> None:
+        """
+        Upload all pending uniform values. The program has to be in use.
+        """
+        for location, (uniform_type, value) in self._program.dirty_uniforms.items():
+            if uniform_type == "int":
+                glUniform1i(location, int(value[0]))
+            elif uniform_type == "float":
+                glUniform1f(location, float(value[0]))
+            elif uniform_type == "vec3":
+                glUniform3fv(location, 1, value.ctypes.data_as(ct.POINTER(ct.c_float)))
+            elif uniform_type == "mat4":
+                glUniformMatrix4fv(location, 1, False, value.ctypes.data_as(ct.POINTER(ct.c_float)))
+            else:
+                raise NotImplementedError(f"Unknown uniform type '{uniform_type}'")
+            self._program.uniform_values[location] = value
+        self._program.dirty_uniforms.clear()
+
+    @staticmethod
+    def _add_defines(shader_code: str, defines: Sequence[str]) -> str:
+        """
+        Insert preprocessor macros right after the version directive
+        :param shader_code: shader source code
+        :param defines: macro names, optionally with a value (e.g. 'GLPG_INSTANCED' or 'MAX_STEPS 8')
+        :return: shader source code
+        """
+        if not defines:
+            return shader_code
+        lines = shader_code.split("\n")
+        position = next((idx + 1 for idx, line in enumerate(lines) if line.strip().startswith("#version")), 0)
+        lines[position:position] = [f"#define {define}" for define in defines]
+        return "\n".join(lines)
 
     def _handle_imports(self, shader_code, directory, _recursion=False):
         lines = shader_code.splitlines()
@@ -189,7 +477,10 @@ class Shader:
                 if include_file not in included_files:
                     include_file_path = os.path.join(directory, include_file)
                     if not os.path.exists(include_file_path):
-                        raise FileNotFoundError()
+                        # fall back to the shared include directory
+                        include_file_path = os.path.join(self.include_dir, include_file)
+                    if not os.path.exists(include_file_path):
+                        raise FileNotFoundError(f"Shader include '{include_file}' not found")
                     with open(include_file_path, 'r') as file:
                         include_code = file.read()
                     processed_shader += self._handle_imports(include_code, directory, _recursion=True)
@@ -197,7 +488,6 @@ class Shader:
                     included_files.add(include_file)
             else:
                 processed_shader += line
-                if not _recursion:
-                    processed_shader += "\n"
+                processed_shader += "\n"  # keep line breaks, as preprocessor directives and comments rely on them
 
         return processed_shader
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Tracks the currently bound OpenGL objects to skip redundant state changes
+@File      : state.py
+@Project   : pygletPlayground
+@Time      : 18.10.26 14:20
+@Author    : flowmeadow
+"""
+from typing import Dict, Optional
+
+from pyglet.gl import *
+
+
+class GLState:
+    """
+    Tracks the currently bound program, vertex array, texture unit, textures and samplers of the OpenGL context.
+    Bind calls are only forwarded to OpenGL if they change the state. Code that changes this state without GLState
+    has to call 'invalidate' afterwards.
+    """
+
+    _program = None
+    _vertex_array = None
+    _active_texture = None
+    _textures: Dict[int, int] = {}
+    _samplers: Dict[int, int] = {}
+
+    # number of issued and skipped calls in the current and the last frame
+    issued = 0
+    skipped = 0
+    frame_stats = dict(issued=0, skipped=0)
+
+    @classmethod
+    def use_program(cls, program: int) -> None:
+        """
+        Select a program (0: fixed function pipeline)
+        :param program: program id
+        """
+        program = cls._value(program)
+        if cls._changed(cls._program, program):
+            glUseProgram(program)
+            cls._program = program
+
+    @classmethod
+    def current_program(cls) -> Optional[int]:
+        """
+        :return: id of the program in use (None: unknown)
+        """
+        return cls._program
+
+    @classmethod
+    def bind_vertex_array(cls, vertex_array: int) -> None:
+        """
+        Bind a vertex array object (0: none)
+        :param vertex_array: vertex array object id
+        """
+        vertex_array = cls._value(vertex_array)
+        if cls._changed(cls._vertex_array, vertex_array):
+            glBindVertexArray(vertex_array)
+            cls._vertex_array = vertex_array
+
+    @classmethod
+    def active_texture(cls, unit: int) -> None:
+        """
+        Select the active texture unit
+        :param unit: texture unit index (0: GL_TEXTURE0)
+        """
+        if cls._changed(cls._active_texture, unit):
+            glActiveTexture(GL_TEXTURE0 + unit)
+            cls._active_texture = unit
+
+    @classmethod
+    def bind_texture(cls, unit: int, texture: int) -> None:
+        """
+        Bind a 2D texture to a texture unit
+        :param unit: texture unit index
+        :param texture: texture id (0: none)
+        """
+        texture = cls._value(texture)
+        cls.active_texture(unit)
+        if cls._changed(cls._textures.get(unit), texture):
+            glBindTexture(GL_TEXTURE_2D, texture)
+            cls._textures[unit] = texture
+
+    @classmethod
+    def bind_sampler(cls, unit: int, sampler: int) -> None:
+        """
+        Bind a sampler object to a texture unit
+        :param unit: texture unit index
+        :param sampler: sampler id (0: none)
+        """
+        sampler = cls._value(sampler)
+        if cls._changed(cls._samplers.get(unit), sampler):
+            glBindSampler(unit, sampler)
+            cls._samplers[unit] = sampler
+
+    @classmethod
+    def use_fixed_function(cls) -> None:
+        """
+        Prepare drawing with the fixed function pipeline (no program and vertex array, first texture unit active)
+        """
+        cls.use_program(0)
+        cls.bind_vertex_array(0)
+        cls.active_texture(0)
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """
+        Forget the tracked state, e.g. after other code (pyglet, Qt) changed bindings directly
+        """
+        cls._program = None
+        cls._vertex_array = None
+        cls._active_texture = None
+        cls._textures = {}
+        cls._samplers = {}
+
+    @classmethod
+    def new_frame(cls) -> None:
+        """
+        Store the call statistics of the finished frame and reset the counters
+        """
+        cls.frame_stats = dict(issued=cls.issued, skipped=cls.skipped)
+        cls.issued, cls.skipped = 0, 0
+        cls.invalidate()
+
+    @classmethod
+    def _changed(cls, current, new) -> bool:
+        """
+        Compare the tracked with the requested state and count the call
+        :return: True, if the call has to be issued
+        """
+        if current == new:
+            cls.skipped += 1
+            return False
+        cls.issued += 1
+        return True
+
+    @staticmethod
+    def _value(gl_id) -> int:
+        """
+        :param gl_id: OpenGL object id as integer or ctypes value (e.g. GLuint)
+        :return: integer id
+        """
+        return getattr(gl_id, "value", gl_id)
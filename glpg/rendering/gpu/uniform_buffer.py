@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Uniform buffer object holding per-frame data that is shared by all shader programs
+@File      : uniform_buffer.py
+@Project   : pygletPlayground
+@Time      : 18.10.26 16:05
+@Author    : flowmeadow
+"""
+import ctypes
+import time
+from typing import Optional
+
+import numpy as np
+from pyglet.gl import *
+
+
+class FrameUniforms:
+    """
+    Uniform buffer object holding camera, projection, runtime and light sources. It is updated and bound once per
+    frame, and every program that includes 'glpg_frame.glsl' reads from it (see glpg/shader/include), so the per-frame
+    cost does not depend on the number of models.
+    """
+
+    block_name = "GLPGFrame"  # name of the uniform block in GLSL
+    binding = 0  # uniform buffer binding point
+    max_lights = 8
+
+    # std140 layout of the uniform block; every member is a multiple of 16 bytes
+    dtype = np.dtype(
+        [
+            ("projection", np.float32, (16,)),
+            ("view", np.float32, (16,)),
+            ("camera_pos", np.float32, (4,)),
+            ("camera_view", np.float32, (4,)),
+            ("frame", np.int32, (4,)),
+            ("light_position", np.float32, (max_lights, 4)),
+            ("light_ambient", np.float32, (max_lights, 4)),
+            ("light_diffuse", np.float32, (max_lights, 4)),
+            ("light_specular", np.float32, (max_lights, 4)),
+            ("light_spot_direction", np.float32, (max_lights, 4)),
+            ("light_params", np.float32, (max_lights, 4)),
+        ]
+    )
+
+    _buffer = None
+    _data = np.zeros(1, dtype=dtype)
+    _start_time = None
+
+    @classmethod
+    def update(
+        cls,
+        camera_pos: np.ndarray,
+        camera_view: np.ndarray,
+        projection: Optional[np.ndarray] = None,
+        view: Optional[np.ndarray] = None,
+        lights=None,
+    ) -> None:
+        """
+        Upload the data of the current frame and bind the buffer to its binding point
+        :param camera_pos: camera position array (3,)
+        :param camera_view: camera view direction array (3,)
+        :param projection: projection matrix (4, 4)
+        :param view: view matrix (4, 4)
+        :param lights: Lights object with the scene's light sources
+        """
+        if cls._buffer is None:
+            cls._buffer = GLuint()
+            glGenBuffers(1, cls._buffer)
+            glBindBuffer(GL_UNIFORM_BUFFER, cls._buffer)
+            glBufferData(GL_UNIFORM_BUFFER, cls.dtype.itemsize, None, GL_DYNAMIC_DRAW)
+            cls._start_time = time.time()
+
+        data = cls._data[0]
+        if projection is not None:
+            data["projection"] = np.asarray(projection).flatten("F")  # column-major
+        if view is not None:
+            data["view"] = np.asarray(view).flatten("F")
+        data["camera_pos"][:3] = camera_pos
+        data["camera_view"][:3] = camera_view
+        data["frame"][0] = int(1000 * (time.time() - cls._start_time))  # runtime in milliseconds
+        if lights is not None:
+            cls._set_lights(data, lights.lights[: cls.max_lights])
+
+        glBindBuffer(GL_UNIFORM_BUFFER, cls._buffer)
+        glBufferSubData(GL_UNIFORM_BUFFER, 0, cls.dtype.itemsize, cls._data.ctypes.data_as(ctypes.c_void_p))
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        glBindBufferBase(GL_UNIFORM_BUFFER, cls.binding, cls._buffer)
+
+    @classmethod
+    def camera_position(cls) -> np.ndarray:
+        """
+        :return: camera position of the current frame (3,)
+        """
+        return cls._data[0]["camera_pos"][:3].astype(float)
+
+    @classmethod
+    def projection_scale(cls) -> float:
+        """
+        :return: vertical scale of the current projection matrix (cot(fov / 2)); 1.0, if not set yet
+        """
+        scale = float(cls._data[0]["projection"][5])
+        return scale if scale > 0.0 else 1.0
+
+    @staticmethod
+    def _set_lights(data: np.void, lights: list) -> None:
+        """
+        Copy light source parameters into the uniform block
+        :param data: uniform block record
+        :param lights: list of Light objects
+        """
+        data["frame"][1] = len(lights)
+        for idx, light in enumerate(lights):
+            data["light_position"][idx] = [*light.position[:3], 1.0]
+            data["light_ambient"][idx, :3] = light.ambient[:3]
+            data["light_diffuse"][idx, :3] = light.diffuse[:3]
+            data["light_specular"][idx, :3] = light.specular[:3]
+            data["light_spot_direction"][idx, :3] = light.spot_direction[:3]
+            data["light_params"][idx] = [
+                light.a_const.value,
+                light.a_lin.value,
+                light.a_quad.value,
+                light.spot_cutoff.value,
+            ]
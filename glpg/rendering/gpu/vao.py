@@ -9,38 +9,75 @@
 import numpy as np
 
 import ctypes as ct
-from typing import Optional
+from typing import Dict, Optional
 
 from pyglet.gl import *
 
+from glpg.rendering.gpu.state import GLState
+
 
 class VAO:
     """
     Vertex array object that handles several buffer objects.
     """
 
+    # number of components, OpenGL client state and supported formats of each vertex attribute
+    attributes = {
+        "position": (3, GL_VERTEX_ARRAY, ("float32", "float16")),
+        "color": (3, GL_COLOR_ARRAY, ("float32", "float16", "unorm8")),
+        "normal": (3, GL_NORMAL_ARRAY, ("float32", "float16", "snorm16", "int_2_10_10_10_rev")),
+        "texture_coords": (2, GL_TEXTURE_COORD_ARRAY, ("float32", "float16")),
+    }
+
+    # numpy and OpenGL data type of each vertex attribute format
+    attribute_formats = {
+        "float32": (np.float32, GL_FLOAT),
+        "float16": (np.float16, GL_HALF_FLOAT),
+        "unorm8": (np.uint8, GL_UNSIGNED_BYTE),
+        "snorm16": (np.int16, GL_SHORT),
+        "int_2_10_10_10_rev": (np.uint32, GL_INT_2_10_10_10_REV),
+    }
+
+    # packed formats used for compact models (positions stay at full precision)
+    compact_formats = {"color": "unorm8", "normal": "int_2_10_10_10_rev", "texture_coords": "float16"}
+
+    # GLSL name, first generic attribute location and number of vec4 columns of each per-instance attribute. The
+    # locations are bound to every program before linking (see 'ShaderProgram') and do not alias the built-in
+    # attributes used by the shaders (gl_Vertex: 0, gl_Normal: 2, gl_Color: 3, gl_MultiTexCoord0: 8)
+    instance_attributes = {
+        "instance_matrix": ("glpgInstanceMatrix", 9, 4),
+        "instance_color": ("glpgInstanceColor", 13, 1),
+    }
+
     # TODO: not working with a combination of GL_QUADS and GL_TRIANGLES
-    def __init__(self, indices: np.array, object_id: int = GL_TRIANGLES):
+    def __init__(self, indices: np.array, object_id: int = GL_TRIANGLES, usage: int = GL_STATIC_DRAW):
         """
         Initialize VAO
         (l=3: GL_TRIANGLES, l=4: GL_QUADS)
         :param object_id: can be GL_TRIANGLES or GL_QUADS
         :param indices: indices array of the model [m, l]
+        :param usage: default usage hint of the vertex attribute buffers (GL_STATIC_DRAW, GL_DYNAMIC_DRAW or
+        GL_STREAM_DRAW)
         """
         self.object_id = object_id  # GL_TRIANGLES or GL_QUADS
+        self.usage = usage
         self.vertices_per_face = indices.shape[1]
 
-        data_type = np.uint32  # index data type
-        self.index_size = data_type().itemsize  # bytes per index (default: 32 bit)
+        # index data type; 16 bit indices are sufficient for less than 65536 vertices
+        if indices.size == 0 or np.max(indices) <= np.iinfo(np.uint16).max:
+            data_type, self.index_type = np.uint16, GL_UNSIGNED_SHORT
+        else:
+            data_type, self.index_type = np.uint32, GL_UNSIGNED_INT
+        self.index_size = data_type().itemsize  # bytes per index
 
-        # transform array and get data length
-        indices = np.array(indices, dtype=data_type).flatten()  # flatten 2D array
+        # transform array and get data length (no copy, if already contiguous and of the right type)
+        indices = np.ascontiguousarray(indices, dtype=data_type).reshape(-1)  # flatten 2D array
         self.index_count = indices.shape[0]  # number of indices
 
         # generate VAO
         self.vao = GLuint()
         glGenVertexArrays(1, self.vao)
-        glBindVertexArray(self.vao)
+        GLState.bind_vertex_array(self.vao)
 
         # generate VBOs
         self.ibo = GLuint()
@@ -54,54 +91,239 @@ class VAO:
         glGenBuffers(1, self.cbo)  # color
         glGenBuffers(1, self.nbo)  # normals
         glGenBuffers(1, self.tbo)  # texture coordinates
+        self.ivbo = None  # interleaved vertex data; generated on demand (see 'set_interleaved')
+        self.instance_count = None  # number of instances; None, if no per-instance attribute is assigned
+
+        # buffer object, usage hint, format and allocated size in bytes for each vertex attribute
+        self.buffers = {"position": self.vbo, "color": self.cbo, "normal": self.nbo, "texture_coords": self.tbo}
+        self.buffer_usages = {}
+        self.buffer_formats = {}
+        self.buffer_sizes = {}
 
         # bind index data
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
-        byte_length = self.index_count * self.index_size
-        c_data = (ct.c_uint * self.index_count)(*indices)
-        glBufferData(GL_ELEMENT_ARRAY_BUFFER, byte_length, c_data, GL_STATIC_DRAW)
-        glBindVertexArray(0)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, self.data_pointer(indices), GL_STATIC_DRAW)
+        GLState.bind_vertex_array(0)
 
-    def set_vbo(self, attr_name: str, data: np.array) -> None:
+    def set_vbo(self, attr_name: str, data: np.array, usage: Optional[int] = None, fmt: str = "float32") -> None:
         """
         Assign vertex attributes to VAO
         (k=2: textures, k=3: vertices, k=4: colors)
-        :param attr_name: name of the vertex attribute ('position', 'color', 'normal')
+        :param attr_name: name of the vertex attribute ('position', 'color', 'normal', 'texture_coords')
         :param data: array containing the vertex attribute data [n, k]
+        :param usage: usage hint of the buffer; by default the one of the VAO
+        :param fmt: storage format of the attribute (see 'attribute_formats')
         """
-        glBindVertexArray(self.vao)
+        if attr_name not in self.attributes:
+            raise NotImplementedError("Unknown ID")
+        usage = self.usage if usage is None else usage
+        data = self.pack_attribute(attr_name, data, fmt)
+        self.buffer_usages[attr_name] = usage
+        self.buffer_formats[attr_name] = fmt
+        self.buffer_sizes[attr_name] = data.nbytes
+
+        GLState.bind_vertex_array(self.vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffers[attr_name])
+        self.assign_vbo_data(data, usage, data_type=data.dtype)
+        size = data.shape[1] if data.ndim > 1 else 4
+        self._set_pointer(attr_name, self._gl_type(data.dtype), size, data[:1].nbytes, 0)
+        GLState.bind_vertex_array(0)
+
+    def set_interleaved(self, data: np.ndarray, usage: Optional[int] = None) -> None:
+        """
+        Assign all vertex attributes at once from a single buffer. Each vertex is stored as one record holding
+        its attributes side by side, which improves vertex fetch locality and allows refreshing the whole mesh with
+        one upload. Afterwards, the buffer can be updated with 'update_vbo("interleaved", ...)'.
+        :param data: structured array [n,] with fields named like the vertex attributes (see 'interleave')
+        :param usage: usage hint of the buffer; by default the one of the VAO
+        """
+        if data.dtype.names is None or not set(data.dtype.names).issubset(self.attributes):
+            raise ValueError(f"Data has to be a structured array with fields of {list(self.attributes.keys())}")
+        usage = self.usage if usage is None else usage
+        data = np.ascontiguousarray(data)
+        self.buffer_usages["interleaved"] = usage
+        self.buffer_sizes["interleaved"] = data.nbytes
+
+        GLState.bind_vertex_array(self.vao)
+        if self.ivbo is None:
+            self.ivbo = GLuint()
+            glGenBuffers(1, self.ivbo)
+        self.buffers["interleaved"] = self.ivbo
+        glBindBuffer(GL_ARRAY_BUFFER, self.ivbo)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, self.data_pointer(data), usage)
+
+        # define stride and byte offset of each attribute within a vertex record
+        stride = data.dtype.itemsize
+        for attr_name, (field_type, offset) in data.dtype.fields.items():
+            size = field_type.shape[0] if field_type.shape else 4
+            self._set_pointer(attr_name, self._gl_type(field_type.base), size, stride, offset)
+        GLState.bind_vertex_array(0)
+
+    def set_instance_vbo(self, attr_name: str, data: np.ndarray, usage: Optional[int] = None) -> None:
+        """
+        Assign a per-instance attribute. It advances once per instance instead of once per vertex (attribute
+        divisor 1) and is read by shaders compiled with GLPG_INSTANCED (see 'glpg_instancing.glsl').
+        Afterwards, the buffer can be updated with 'update_vbo(attr_name, ...)'.
+        :param attr_name: 'instance_matrix' or 'instance_color'
+        :param data: transformation matrices [N, 4, 4] or colors [N, 4]
+        :param usage: usage hint of the buffer; by default the one of the VAO
+        """
+        if attr_name not in self.instance_attributes:
+            raise NotImplementedError(f"Unknown per-instance attribute '{attr_name}'")
+        _, location, columns = self.instance_attributes[attr_name]
+        usage = self.usage if usage is None else usage
+        data = self.pack_instance_attribute(attr_name, data)
+        if self.instance_count is not None and data.shape[0] != self.instance_count:
+            raise ValueError(f"Expected data for {self.instance_count} instances, got {data.shape[0]}")
+        self.instance_count = data.shape[0]
+        self.buffer_usages[attr_name] = usage
+        self.buffer_sizes[attr_name] = data.nbytes
+
+        GLState.bind_vertex_array(self.vao)
+        if attr_name not in self.buffers:
+            self.buffers[attr_name] = GLuint()
+            glGenBuffers(1, self.buffers[attr_name])
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffers[attr_name])
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, self.data_pointer(data), usage)
+
+        # a mat4 attribute occupies one location per column
+        for column in range(columns):
+            glEnableVertexAttribArray(location + column)
+            glVertexAttribPointer(location + column, 4, GL_FLOAT, GL_FALSE, data[:1].nbytes, ct.c_void_p(16 * column))
+            glVertexAttribDivisor(location + column, 1)
+        GLState.bind_vertex_array(0)
+
+    @classmethod
+    def pack_instance_attribute(cls, attr_name: str, data: np.ndarray) -> np.ndarray:
+        """
+        Converts per-instance attribute data to the buffer layout
+        :param attr_name: 'instance_matrix' or 'instance_color'
+        :param data: transformation matrices [N, 4, 4] or colors [N, 3] / [N, 4]
+        :return: contiguous float32 array [N, 16] (matrix columns one after another) or [N, 4]
+        """
+        data = np.asarray(data, dtype=np.float32)
+        if attr_name == "instance_matrix":
+            return np.ascontiguousarray(data.reshape(-1, 4, 4).transpose(0, 2, 1)).reshape(-1, 16)
+        if data.shape[1] == 3:
+            data = np.concatenate([data, np.ones((data.shape[0], 1), dtype=np.float32)], axis=1)
+        return np.ascontiguousarray(data)
+
+    def _set_pointer(self, attr_name: str, gl_type: int, size: int, stride: int, offset: int) -> None:
+        """
+        Enables a vertex attribute and defines its location within the currently bound array buffer
+        :param attr_name: name of the vertex attribute ('position', 'color', 'normal', 'texture_coords')
+        :param gl_type: OpenGL data type of the attribute components (e.g. GL_FLOAT)
+        :param size: number of components per vertex
+        :param stride: number of bytes between two consecutive vertices
+        :param offset: byte offset of the first component in the buffer
+        """
+        _, client_state, _ = self.attributes[attr_name]
+        glEnableClientState(client_state)
         # assign per vertex position information
         if attr_name == "position":
-            glEnableClientState(GL_VERTEX_ARRAY)
-            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-            self.assign_vbo_data(data)
-            glVertexPointer(3, GL_FLOAT, 0, None)
+            glVertexPointer(size, gl_type, stride, ct.c_void_p(offset))
         # assign per vertex color information
         elif attr_name == "color":
-            glEnableClientState(GL_COLOR_ARRAY)
-            glBindBuffer(GL_ARRAY_BUFFER, self.cbo)
-            self.assign_vbo_data(data)
-            glColorPointer(3, GL_FLOAT, 0, None)
+            glColorPointer(size, gl_type, stride, ct.c_void_p(offset))
         # assign per vertex normal information
         elif attr_name == "normal":
-            glEnableClientState(GL_NORMAL_ARRAY)
-            glBindBuffer(GL_ARRAY_BUFFER, self.nbo)
-            self.assign_vbo_data(data)
-            glNormalPointer(GL_FLOAT, 0, None)
+            glNormalPointer(gl_type, stride, ct.c_void_p(offset))
+        # assign per vertex texture coordinates
         elif attr_name == "texture_coords":
-            glEnableClientState(GL_TEXTURE_COORD_ARRAY)
-            glBindBuffer(GL_ARRAY_BUFFER, self.tbo)
-            self.assign_vbo_data(data)
-            glTexCoordPointer(2, GL_FLOAT, 0, None)
+            glTexCoordPointer(size, gl_type, stride, ct.c_void_p(offset))
+
+    @classmethod
+    def pack_attribute(cls, attr_name: str, data: np.ndarray, fmt: str = "float32") -> np.ndarray:
+        """
+        Converts vertex attribute data to the given storage format. Normalized integer formats are padded to four
+        components to keep each vertex aligned to 4 bytes.
+        :param attr_name: name of the vertex attribute ('position', 'color', 'normal', 'texture_coords')
+        :param data: vertex attribute data [n, k]
+        :param fmt: storage format (see 'attribute_formats')
+        :return: contiguous array [n, k'] or, for 'int_2_10_10_10_rev', [n,]
+        """
+        num_components, _, formats = cls.attributes[attr_name]
+        if fmt not in formats:
+            raise ValueError(f"Format '{fmt}' is not supported for vertex attribute '{attr_name}' (use {formats})")
+        data_type, _ = cls.attribute_formats[fmt]
+        data = np.asarray(data)[:, :num_components]
+
+        if fmt in ["float32", "float16"]:
+            return np.ascontiguousarray(data, dtype=data_type)
+        elif fmt == "unorm8":
+            packed = np.full((data.shape[0], 4), 255, dtype=data_type)  # opaque alpha channel
+            packed[:, : data.shape[1]] = np.round(np.clip(data, 0.0, 1.0) * 255)
+            return packed
+        elif fmt == "snorm16":
+            packed = np.zeros((data.shape[0], 4), dtype=data_type)
+            packed[:, : data.shape[1]] = np.round(np.clip(data, -1.0, 1.0) * 32767)
+            return packed
         else:
-            raise NotImplementedError("Unknown ID")
-        glBindVertexArray(0)
+            # three signed 10 bit components (x: bits 0-9, y: bits 10-19, z: bits 20-29) in one 32 bit word
+            components = np.round(np.clip(data, -1.0, 1.0) * 511).astype(np.int32) & 0x3FF
+            return (components[:, 0] | (components[:, 1] << 10) | (components[:, 2] << 20)).astype(data_type)
 
-    def draw(self, num_indices: Optional[int] = None, offset: int = 0) -> None:
+    @classmethod
+    def interleave(cls, formats: Optional[Dict[str, str]] = None, **attributes: Optional[np.ndarray]) -> np.ndarray:
+        """
+        Packs vertex attribute arrays into one structured array for 'set_interleaved'
+        :param formats: storage format by attribute name; by default 'float32'
+        :param attributes: vertex attribute arrays [n, k] by attribute name ('position', 'color', 'normal',
+        'texture_coords'); None values are skipped
+        :return: structured array [n,]
+        """
+        formats = {} if formats is None else formats
+        packed = {
+            key: cls.pack_attribute(key, attributes[key], formats.get(key, "float32"))
+            for key in cls.attributes
+            if attributes.get(key) is not None
+        }
+        dtype = np.dtype([(key, val.dtype, val.shape[1:]) for key, val in packed.items()])
+        data = np.empty(len(next(iter(packed.values()))), dtype=dtype)
+        for key, val in packed.items():
+            data[key] = val
+        return data
+
+    def update_vbo(self, attr_name: str, data: np.array, first_vertex: int = 0, orphan: bool = False) -> None:
+        """
+        Rewrite (a part of) an already assigned vertex attribute buffer without reallocating its storage
+        :param attr_name: name of the vertex attribute ('position', 'color', 'normal', 'texture_coords'),
+        'interleaved' or the name of a per-instance attribute ('instance_matrix', 'instance_color')
+        :param data: array containing the new vertex attribute data [k, l] (or records [k,]) for k consecutive
+        vertices, or the per-instance data for k consecutive instances
+        :param first_vertex: index of the first vertex (or instance) to overwrite
+        :param orphan: if True, the old storage is orphaned before the upload, so the driver does not have to wait
+        until it is no longer in use. Only possible if the whole buffer is rewritten
+        """
+        if attr_name not in self.buffer_sizes:
+            raise ValueError(f"Vertex attribute '{attr_name}' has to be assigned with 'set_vbo' first")
+
+        if attr_name == "interleaved":
+            data = np.ascontiguousarray(data)
+        elif attr_name in self.instance_attributes:
+            data = self.pack_instance_attribute(attr_name, data)
+        else:
+            data = self.pack_attribute(attr_name, data, self.buffer_formats[attr_name])
+        offset = first_vertex * data.itemsize * int(np.prod(data.shape[1:]))  # bytes per vertex times vertex index
+        size = self.buffer_sizes[attr_name]
+        if offset < 0 or offset + data.nbytes > size:
+            raise ValueError(f"Update of {data.nbytes} bytes at offset {offset} exceeds buffer size of {size} bytes")
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffers[attr_name])
+        if orphan:
+            if offset != 0 or data.nbytes != size:
+                raise ValueError("Orphaning requires an update of the whole buffer")
+            glBufferData(GL_ARRAY_BUFFER, size, None, self.buffer_usages[attr_name])
+        glBufferSubData(GL_ARRAY_BUFFER, offset, data.nbytes, self.data_pointer(data))
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def draw(self, num_indices: Optional[int] = None, offset: int = 0, num_instances: Optional[int] = None) -> None:
         """
         Draw the VAO
         :param num_indices: number of indices that are drawn
         :param offset: defines the first index to draw
+        :param num_instances: if given, the first 'num_instances' instances are drawn with one instanced draw call
+        (see 'set_instance_vbo')
         """
         if num_indices is None:  # if nothing given, draw everything
             num_indices = self.index_count
@@ -109,23 +331,74 @@ class VAO:
         num_indices = int(num_indices * self.vertices_per_face)
 
         # bind VAO and draw elements
-        glBindVertexArray(self.vao)
-        glDrawElements(self.object_id, num_indices, GL_UNSIGNED_INT, ct.c_void_p(offset * self.index_size))
-        glBindVertexArray(0)
+        GLState.bind_vertex_array(self.vao)
+        if num_instances is None:
+            glDrawElements(self.object_id, num_indices, self.index_type, ct.c_void_p(offset * self.index_size))
+        elif num_instances > 0:
+            offset_pointer = ct.c_void_p(offset * self.index_size)
+            glDrawElementsInstanced(self.object_id, num_indices, self.index_type, offset_pointer, num_instances)
+
+    def draw_ranges(self, ranges: np.ndarray) -> None:
+        """
+        Draw several index ranges of the VAO with one glMultiDrawElements call
+        :param ranges: first face and number of faces of each range [k, 2]
+        """
+        ranges = np.asarray(ranges, dtype=np.int64).reshape(-1, 2)
+        if ranges.shape[0] == 0:
+            return
+        counts = np.ascontiguousarray(ranges[:, 1] * self.vertices_per_face, dtype=np.int32)
+        offsets = np.ascontiguousarray(ranges[:, 0] * self.vertices_per_face * self.index_size, dtype=np.uintp)
+
+        GLState.bind_vertex_array(self.vao)
+        glMultiDrawElements(
+            self.object_id,
+            counts.ctypes.data_as(ct.POINTER(GLsizei)),
+            self.index_type,
+            offsets.ctypes.data_as(ct.POINTER(ct.c_void_p)),
+            ranges.shape[0],
+        )
+
+    def memory_report(self) -> Dict[str, int]:
+        """
+        Returns the GPU memory allocated by this VAO
+        :return: number of bytes for the indices and each assigned vertex attribute buffer
+        """
+        report = {"indices": self.index_count * self.index_size}
+        report.update(self.buffer_sizes)
+        return report
+
+    @classmethod
+    def _gl_type(cls, data_type: np.dtype) -> int:
+        """
+        :param data_type: numpy data type of a packed attribute
+        :return: corresponding OpenGL data type
+        """
+        for np_type, gl_type in cls.attribute_formats.values():
+            if np.dtype(np_type) == data_type:
+                return gl_type
+        raise ValueError(f"No OpenGL data type for {data_type}")
 
     @staticmethod
-    def assign_vbo_data(data: np.array) -> None:
+    def assign_vbo_data(data: np.array, usage: int = GL_STATIC_DRAW, data_type: np.dtype = np.float32) -> None:
         """
         Assign vertex attributes to VAO
         (k=2: textures, k=3: vertices, k=4: colors)
         :param data: array containing the vertex attribute data [n, k]
+        :param usage: usage hint of the buffer (GL_STATIC_DRAW, GL_DYNAMIC_DRAW or GL_STREAM_DRAW)
+        :param data_type: data type of the buffer (default: float32)
+        """
+        # transform array (no copy, if already contiguous and of the right type)
+        data = np.ascontiguousarray(data, dtype=data_type)
+        # assign data directly from the array buffer
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, VAO.data_pointer(data), usage)
+
+    @staticmethod
+    def data_pointer(data: np.ndarray) -> ct.c_void_p:
+        """
+        Returns a pointer to the buffer of a contiguous numpy array that can be passed to OpenGL without copying
+        :param data: C-contiguous array
+        :return: void pointer to the first element
         """
-        data_type = np.float32  # default
-        # transform array and get data length
-        data = np.array(data, dtype=data_type).flatten()
-        data_count = data.shape[0]
-        # define number of bytes and transform data
-        byte_length = data_count * data_type().itemsize
-        c_data = (ct.c_float * data_count)(*data)
-        # assign data
-        glBufferData(GL_ARRAY_BUFFER, byte_length, c_data, GL_STATIC_DRAW)
+        if not data.flags["C_CONTIGUOUS"]:
+            raise ValueError("Array has to be C-contiguous")
+        return ct.c_void_p(data.ctypes.data)
@@ -12,6 +12,7 @@ import numpy as np
 import pyglet
 from pyglet.gl import *
 
+from glpg.rendering.gpu.state import GLState
 from glpg.texturing.texture import Texture
 
 
@@ -45,10 +46,12 @@ def draw_text_2D(x: int, y: int, text: str, color=(1.0, 1.0, 1.0, 1.0), **kwargs
     if len(color) == 3:
         color.append(1.0)
 
+    GLState.use_fixed_function()
     label = pyglet.text.Label(
         text, font_name="Consolas", font_size=12, x=x, y=y, anchor_x="left", anchor_y="top", color=color, **kwargs
     )
     label.draw()
+    GLState.invalidate()  # pyglet binds its own textures
 
 
 def draw_coordinates(R=np.eye(3), t=np.zeros(3), scale=1.0):
@@ -58,6 +61,7 @@ def draw_coordinates(R=np.eye(3), t=np.zeros(3), scale=1.0):
     :param t: center array of the coordinate system (3,)
     :param scale: scale factor
     """
+    GLState.use_fixed_function()
     center = np.array([0.0, 0.0, 0.0]) + t
     vertices = np.array(
         [
@@ -89,6 +93,7 @@ def draw_light(light_pos: np.ndarray):
     :param light_pos: center of the light source (3,)
     :return: None
     """
+    GLState.use_fixed_function()
     glColor3f(1.0, 1.0, 0.0)
     glBegin(GL_LINES)
     glVertex3f(light_pos[0] - 0.1, light_pos[1], light_pos[2])
@@ -120,6 +125,7 @@ def draw_cam(
     :param color: color of the cone
     """
     # prepare data
+    GLState.use_fixed_function()
     color = (1.0, 1.0, 1.0) if color is None else color
     glColor3f(*color)
     if edge_only:
@@ -165,6 +171,7 @@ def draw_rectangle(x: int, y: int, w: int, h: int, color: list = None):
     :return:
     """
     # prepare color
+    GLState.use_fixed_function()
     if color is None:
         color = [1.0, 1.0, 1.0, 1.0]
     elif len(color) == 3:
@@ -194,12 +201,13 @@ def draw_texture(x: int, y: int, w: int, h: int, texture: Texture):
     :param texture: texture to project onto the rectangle
     :return:
     """
+    GLState.use_fixed_function()
+    GLState.bind_texture(0, texture.location)
+    GLState.bind_sampler(0, texture.sampler_id)
     glEnable(GL_TEXTURE_2D)
-    glBindTexture(GL_TEXTURE_2D, texture.location)
-    glBindSampler(0, texture.sampler_id)
 
     draw_rectangle(x, y, w, h)
 
-    glBindTexture(GL_TEXTURE_2D, 0)
-    glBindSampler(0, 0)
+    GLState.bind_texture(0, 0)
+    GLState.bind_sampler(0, 0)
     glDisable(GL_TEXTURE_2D)
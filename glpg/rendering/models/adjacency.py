@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Array-based connectivity of triangle meshes (edges, face neighbors, faces around each vertex)
+@File      : adjacency.py
+@Project   : pygletPlayground
+@Time      : 18.10.26 21:50
+@Author    : flowmeadow
+"""
+from functools import cached_property
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class Adjacency:
+    """
+    Connectivity of a triangle mesh. All tables are built with array operations on first access and kept afterwards.
+    Corner c = 3 * f + k is the k-th vertex of face f. Half-edge h = 3 * f + k runs from corner k to corner
+    (k + 1) % 3 of face f.
+    """
+
+    def __init__(self, indices: np.ndarray, num_vertices: Optional[int] = None):
+        """
+        :param indices: face index array [m, 3]
+        :param num_vertices: number of vertices; by default the highest index + 1
+        """
+        self.indices = np.asarray(indices).reshape(-1, 3)
+        self.num_faces = self.indices.shape[0]
+        if num_vertices is None:
+            num_vertices = int(self.indices.max()) + 1 if self.num_faces else 0
+        self.num_vertices = num_vertices
+
+    @cached_property
+    def half_edges(self) -> np.ndarray:
+        """
+        :return: start and end vertex of each half-edge [3 * m, 2]
+        """
+        return self.indices[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2).astype(np.int64)
+
+    @cached_property
+    def _edge_table(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Identify undirected edges by their sorted vertex pair and number them by first occurrence
+        :return: edges [e, 2], edge id of each half-edge [3 * m]
+        """
+        half_edges = self.half_edges
+        sorted_pairs = np.sort(half_edges, axis=1)
+        keys = sorted_pairs[:, 0] * self.num_vertices + sorted_pairs[:, 1]
+        _, first_idcs, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+        order = np.argsort(first_idcs)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(order.shape[0])
+        return half_edges[first_idcs[order]], rank[inverse.reshape(-1)]
+
+    @property
+    def edges(self) -> np.ndarray:
+        """
+        :return: unique undirected edges [e, 2] in the order of their first occurrence (face by face, edges (0, 1),
+        (1, 2), (2, 0)), oriented like that first half-edge
+        """
+        return self._edge_table[0]
+
+    @property
+    def edge_ids(self) -> np.ndarray:
+        """
+        :return: edge id of each half-edge [3 * m]; index into 'edges'
+        """
+        return self._edge_table[1]
+
+    @cached_property
+    def twins(self) -> np.ndarray:
+        """
+        :return: opposite half-edge (b, a) of each half-edge (a, b) [3 * m]; -1 on boundary edges
+        """
+        half_edges = self.half_edges
+        keys = half_edges[:, 0] * self.num_vertices + half_edges[:, 1]
+        twin_keys = half_edges[:, 1] * self.num_vertices + half_edges[:, 0]
+        order = np.argsort(keys)
+        positions = np.minimum(np.searchsorted(keys, twin_keys, sorter=order), keys.shape[0] - 1)
+        twins = order[positions]
+        return np.where(keys[twins] == twin_keys, twins, -1)
+
+    @cached_property
+    def face_neighbors(self) -> np.ndarray:
+        """
+        :return: face across edge (k, (k + 1) % 3) of each face [m, 3]; -1 on boundary edges
+        """
+        twins = self.twins
+        return np.where(twins >= 0, twins // 3, -1).reshape(-1, 3)
+
+    @cached_property
+    def _vertex_table(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compressed sparse rows of the corners around each vertex
+        :return: row offsets [n + 1], corners sorted by vertex and face [3 * m]
+        """
+        corner_vertices = self.indices.reshape(-1)
+        corners = np.argsort(corner_vertices, kind="stable")
+        counts = np.bincount(corner_vertices, minlength=self.num_vertices)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return offsets, corners
+
+    @property
+    def vertex_offsets(self) -> np.ndarray:
+        """
+        :return: row offsets [n + 1]; the corners of vertex v are
+        vertex_corners[vertex_offsets[v]:vertex_offsets[v + 1]]
+        """
+        return self._vertex_table[0]
+
+    @property
+    def vertex_corners(self) -> np.ndarray:
+        """
+        :return: corners sorted by vertex and face [3 * m]; face = corner // 3
+        """
+        return self._vertex_table[1]
+
+    def corners_of_vertices(self, vertex_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Gather the corners around the given vertices
+        :param vertex_ids: vertex indices [k]
+        :return: corners [c], position of the owning vertex in 'vertex_ids' for each corner [c]
+        """
+        vertex_ids = np.asarray(vertex_ids, dtype=np.int64).reshape(-1)
+        offsets, corners = self._vertex_table
+        starts, counts = offsets[vertex_ids], offsets[vertex_ids + 1] - offsets[vertex_ids]
+        owners = np.repeat(np.arange(vertex_ids.shape[0]), counts)
+        row_starts = np.cumsum(counts) - counts
+        positions = np.repeat(starts - row_starts, counts) + np.arange(owners.shape[0])
+        return corners[positions], owners
+
+    def faces_of_vertices(self, vertex_ids: np.ndarray) -> np.ndarray:
+        """
+        :param vertex_ids: vertex indices [k]
+        :return: sorted unique faces that use at least one of the given vertices
+        """
+        return np.unique(self.corners_of_vertices(vertex_ids)[0] // 3)
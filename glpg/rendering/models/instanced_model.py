@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Model that draws many copies of its mesh with one instanced draw call
+@File      : instanced_model.py
+@Project   : pygletPlayground
+@Time      : 18.10.26 23:30
+@Author    : flowmeadow
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from glpg.rendering.gpu.vao import VAO
+from glpg.rendering.models.model import Model
+
+
+class InstancedModel(Model):
+    """
+    Draws many copies (instances) of one mesh with a single glDrawElementsInstanced call. Each instance has its own
+    transformation matrix and optionally its own color, stored in per-instance vertex buffers. The transformations of
+    the model itself ('rotate', 'scale', 'translate') are applied to all instances on top of their own matrices.
+    The shaders are compiled with GLPG_INSTANCED (see 'glpg_instancing.glsl').
+    """
+
+    shader_defines: Tuple[str, ...] = ("GLPG_INSTANCED",)
+
+    def __init__(
+        self,
+        vertices: np.ndarray,
+        indices: np.ndarray,
+        transforms: np.ndarray,
+        instance_colors: Optional[np.ndarray] = None,
+        **kwargs,
+    ) -> None:
+        """
+        :param vertices: vertex coordinates of one instance (m, 3)
+        :param indices: triangle vertex indices of one instance (n, 3)
+        :param transforms: transformation matrix of each instance (N, 4, 4), like 'model_matrix'
+        :param instance_colors: color of each instance (N, 3) or (N, 4); the alpha channel blends between the
+        vertex colors (0.0) and the instance color (1.0). By default, the vertex colors are used
+        :param kwargs: forwarded to Model (e.g. color, textures, shader)
+        """
+        super().__init__(vertices, indices, **kwargs)
+        self.transforms = None
+        self.instance_colors = None
+        self.num_instances = 0  # number of instances drawn by 'draw'; by default all
+        self._draw_instances = 0
+        self.set_instances(transforms, instance_colors)
+
+    def set_instances(
+        self, transforms: np.ndarray, instance_colors: Optional[np.ndarray] = None, usage: Optional[int] = None
+    ):
+        """
+        Replace all instances and reallocate the instance buffers. Use 'update_instances' to change some instances
+        without reallocation
+        :param transforms: transformation matrix of each instance (N, 4, 4)
+        :param instance_colors: color of each instance (N, 3) or (N, 4); by default the vertex colors are used
+        :param usage: usage hint of the instance buffers; by default the one of the model (see 'dynamic')
+        """
+        self.transforms = np.array(transforms, dtype=np.float32).reshape(-1, 4, 4)
+        num_instances = self.transforms.shape[0]
+        if instance_colors is None:
+            self.instance_colors = np.zeros((num_instances, 4), dtype=np.float32)
+        else:
+            self.instance_colors = VAO.pack_instance_attribute("instance_color", instance_colors).copy()
+        if self.instance_colors.shape[0] != num_instances:
+            raise ValueError(f"Expected {num_instances} instance colors, got {self.instance_colors.shape[0]}")
+
+        self.vao.instance_count = None  # the number of instances may change
+        self.vao.set_instance_vbo("instance_matrix", self.transforms, usage)
+        self.vao.set_instance_vbo("instance_color", self.instance_colors, usage)
+        self.num_instances = num_instances
+
+    def update_instances(
+        self,
+        transforms: Optional[np.ndarray] = None,
+        instance_colors: Optional[np.ndarray] = None,
+        first_instance: int = 0,
+    ):
+        """
+        Overwrite the transformations and/or colors of consecutive instances. Only this range of the instance
+        buffers is uploaded
+        :param transforms: transformation matrices (k, 4, 4) of the instances first_instance ... first_instance + k
+        :param instance_colors: colors (k, 3) or (k, 4) of the instances first_instance ... first_instance + k
+        :param first_instance: index of the first instance to overwrite
+        """
+        count = self.transforms.shape[0]
+        for attr_name, data, target in [
+            ("instance_matrix", transforms, self.transforms),
+            ("instance_color", instance_colors, self.instance_colors),
+        ]:
+            if data is None:
+                continue
+            data = np.asarray(data, dtype=np.float32)
+            if attr_name == "instance_matrix":
+                data = data.reshape(-1, 4, 4)
+            else:
+                data = VAO.pack_instance_attribute(attr_name, data)
+            last = first_instance + data.shape[0]
+            if first_instance < 0 or last > count:
+                raise ValueError(f"Invalid instance range ({first_instance}, {last}) for {count} instances")
+            target[first_instance:last] = data
+            orphan = first_instance == 0 and last == count
+            self.vao.update_vbo(attr_name, data, first_vertex=first_instance, orphan=orphan)
+
+    def draw(
+        self,
+        shader_name: str = None,
+        num_indices: int = None,
+        offset=0,
+        triangle_indices: List[int] = None,
+        num_instances: Optional[int] = None,
+    ):
+        """
+        Update shader, perform all transformations and draw all instances
+        :param shader_name: select a shader
+        :param num_indices: number of indices to draw; by default all
+        :param offset: start point of the indices to draw; by default first (0)
+        :param triangle_indices: draw only the given triangles
+        :param num_instances: draw only the first instances; by default 'self.num_instances'
+        """
+        self._draw_instances = self.num_instances if num_instances is None else num_instances
+        super().draw(shader_name, num_indices, offset, triangle_indices)
+
+    def _draw_vao(self, vao: VAO, num_indices: Optional[int], offset: int):
+        """
+        Issue one instanced draw call
+        :param vao: VAO of the model
+        :param num_indices: number of faces to draw; None for all
+        :param offset: first face to draw
+        """
+        vao.draw(num_indices, offset, num_instances=self._draw_instances)
+
+    def add_lod(self, *args, **kwargs) -> int:
+        """
+        Levels of detail are selected for the whole model, which does not fit instances spread over the scene;
+        instanced models do not provide this method of Model
+        """
+        raise TypeError("Levels of detail are not supported for instanced models")
+
+    def add_decimated_lod(self, *args, **kwargs) -> int:
+        """
+        Levels of detail are selected for the whole model, which does not fit instances spread over the scene;
+        instanced models do not provide this method of Model
+        """
+        raise TypeError("Levels of detail are not supported for instanced models")
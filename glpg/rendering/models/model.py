@@ -7,11 +7,15 @@
 @Author    : flowmeadow
 """
 import ctypes.wintypes
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 import numpy as np
 from glpg.definitions import *
+from glpg.rendering.models.adjacency import Adjacency
+from glpg.rendering.models.model_generation.decimation import decimate
 from glpg.rendering.gpu.shader import Shader
+from glpg.rendering.gpu.state import GLState
+from glpg.rendering.gpu.uniform_buffer import FrameUniforms
 from glpg.rendering.gpu.vao import VAO
 from glpg.texturing.methods import wrap_texture
 from glpg.texturing.texture import Texture
@@ -20,6 +24,13 @@ from pyglet.gl import *
 
 
 class Model:
+    # preprocessor macros for the model's shaders (see 'Shader')
+    shader_defines: Tuple[str, ...] = ()
+    # partial buffer updates (see 'update_object'): dirty vertices closer than 'dirty_gap' are uploaded as one run;
+    # with more than 'max_dirty_runs' runs, the whole buffer is uploaded instead
+    dirty_gap = 64
+    max_dirty_runs = 16
+
     def __init__(
         self,
         vertices: np.ndarray,
@@ -40,6 +51,9 @@ class Model:
         shader: Union[str, List[str], int, List[int]] = GLPG_SHADER_BLINNPHONG,
         inside_out=False,
         num_lights=1,
+        dynamic=False,
+        interleaved=False,
+        compact: Union[bool, Dict[str, str]] = False,
     ) -> None:
         """
         :param vertices: object vertex coordinates (m, 3) [float]
@@ -54,6 +68,11 @@ class Model:
         :param shader: name of the shader or list of shader names for change during runtime
         :param inside_out: if True, flip face normals
         :param num_lights: number of light sources in scene
+        :param dynamic: if True, vertex buffers are allocated for frequent updates (see 'update_object')
+        :param interleaved: if True, all vertex attributes are stored in one interleaved buffer instead of one
+        buffer per attribute
+        :param compact: if True, colors, normals and texture coordinates are stored in packed formats (see
+        'VAO.compact_formats') to save GPU memory and upload bandwidth. A dictionary selects the format per attribute
         """
         # Type conversions and input processing
         if textures is None:
@@ -62,40 +81,37 @@ class Model:
         if isinstance(textures, str):
             textures = [textures]
 
-        if texture_coords is None and textures:
-            texture_coords = wrap_texture(vertices)
-
-        # set default color
-        if textures:
-            color = 0.0
-        elif color is None:
-            v_min, v_max = np.min(vertices), np.max(vertices)
-            color = (vertices - v_min) / (v_max - v_min)
-
-        colors = self.format_color_array(color, vertices.shape[0])
-        if inside_out:
-            indices = flip_inside_out(indices)
-
-        # set initial vertex positions
-        vertices = rotate_vec(vertices, rotation[:3], rotation[3])  # rotate
-        vertices *= np.array(scale)  # scale
-        vertices += np.array(translation)  # translate
+        # settings that are applied to the mesh of each level of detail (see 'add_lod')
+        self._mesh_settings = dict(
+            color=color,
+            textured=bool(textures),
+            rotation=rotation,
+            scale=scale,
+            translation=translation,
+            inside_out=inside_out,
+            usage=GL_DYNAMIC_DRAW if dynamic else GL_STATIC_DRAW,
+            interleaved=interleaved,
+        )
+        self._formats = (VAO.compact_formats if compact else {}) if isinstance(compact, bool) else compact
 
-        # compute normals from vertices
-        normals = compute_normals(indices, vertices)
-        indices, vertices = np.array(indices, dtype=np.uint32), np.array(vertices, dtype=np.float32)
+        indices, vertices, normals, colors, texture_coords = self._prepare_mesh(
+            vertices, indices, color, texture_coords
+        )
         self._indices = indices
         self._vertices = vertices
         self._normals = normals
         self._colors = colors
+        self._texture_coords = texture_coords
+        self._adjacency = None  # built on first use (see 'adjacency')
 
         # define VAO
-        self.vao = VAO(indices, object_id=GL_TRIANGLES)
-        self.vao.set_vbo("position", vertices)
-        self.vao.set_vbo("color", colors[:, :3])
-        self.vao.set_vbo("normal", normals)
-        if texture_coords is not None:
-            self.vao.set_vbo("texture_coords", texture_coords)
+        self.vao, self._vertex_data = self._create_vao(indices, vertices, normals, colors, texture_coords)
+
+        # levels of detail; level 0 is the mesh above
+        self.lods = []
+        self.lod_level = 0  # level of the last draw call
+        self._bounding_sphere = None
+        self._camera_pos = None
 
         self.textures = []
         for texture in textures:
@@ -113,11 +129,225 @@ class Model:
         self.operations = []
 
         # initialize shader
+        self.num_lights = num_lights
         if isinstance(shader, (str, int)):
             shader = [shader]
-        self.shaders = {s: Shader(s, num_lights=num_lights, num_textures=len(self.textures)) for s in shader}
+        self.shaders = {
+            s: Shader(s, num_lights=num_lights, num_textures=len(self.textures), defines=self.shader_defines)
+            for s in shader
+        }
         self.first_shader = shader[0]
 
+    def _prepare_mesh(
+        self,
+        vertices: np.ndarray,
+        indices: np.ndarray,
+        color: Optional[Union[np.ndarray, List[float]]],
+        texture_coords: Optional[np.ndarray],
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """
+        Apply the model's settings (default colors, texture coordinates and initial transformation) to a mesh and
+        compute its normals
+        :param vertices: vertex coordinates (m, 3)
+        :param indices: triangle vertex indices (n, 3)
+        :param color: color of the mesh (3,) or each individual vertex (m, 3); by default based on the vertices
+        :param texture_coords: texture coordinates for each vertex (m, 2)
+        :return: indices (n, 3) uint32, vertices (m, 3) float32, normals (m, 3), colors (m, 3) float32 and
+        texture coordinates (m, 2) or None
+        """
+        settings = self._mesh_settings
+        if texture_coords is None and settings["textured"]:
+            texture_coords = wrap_texture(vertices)
+
+        # set default color
+        if settings["textured"]:
+            color = 0.0
+        elif color is None:
+            v_min, v_max = np.min(vertices), np.max(vertices)
+            color = (vertices - v_min) / (v_max - v_min)
+
+        colors = self.format_color_array(color, vertices.shape[0])
+        if settings["inside_out"]:
+            indices = flip_inside_out(indices)
+
+        # set initial vertex positions (float32 input is transformed in float32 to avoid a float64 copy)
+        rotation, scale, translation = settings["rotation"], settings["scale"], settings["translation"]
+        dtype = np.float32 if vertices.dtype == np.float32 else np.float64
+        if rotation[3] != 0.0:
+            vertices = rotate_vec(vertices, rotation[:3], rotation[3]).astype(dtype, copy=False)  # rotate
+        else:
+            vertices = np.array(vertices, dtype=dtype)
+        vertices *= np.array(scale, dtype=dtype)  # scale
+        vertices += np.array(translation, dtype=dtype)  # translate
+
+        # compute normals from vertices
+        normals = compute_normals(indices, vertices)
+        indices, vertices = np.asarray(indices, dtype=np.uint32), np.asarray(vertices, dtype=np.float32)
+        return indices, vertices, normals, np.array(colors, dtype=np.float32), texture_coords
+
+    def _create_vao(
+        self,
+        indices: np.ndarray,
+        vertices: np.ndarray,
+        normals: np.ndarray,
+        colors: np.ndarray,
+        texture_coords: Optional[np.ndarray],
+    ) -> Tuple[VAO, Optional[np.ndarray]]:
+        """
+        Create a VAO with the model's buffer layout
+        :param indices: triangle vertex indices (n, 3)
+        :param vertices: vertex coordinates (m, 3)
+        :param normals: vertex normals (m, 3)
+        :param colors: vertex colors (m, 3)
+        :param texture_coords: texture coordinates (m, 2) or None
+        :return: VAO and interleaved vertex records (None, if the attributes are stored in separate buffers)
+        """
+        vao = VAO(indices, object_id=GL_TRIANGLES, usage=self._mesh_settings["usage"])
+        vertex_data = None
+        if self._mesh_settings["interleaved"]:
+            vertex_data = VAO.interleave(
+                formats=self._formats,
+                position=vertices,
+                color=colors,
+                normal=normals,
+                texture_coords=texture_coords,
+            )
+            vao.set_interleaved(vertex_data)
+        else:
+            vao.set_vbo("position", vertices, fmt=self._formats.get("position", "float32"))
+            vao.set_vbo("color", colors[:, :3], fmt=self._formats.get("color", "float32"))
+            vao.set_vbo("normal", normals, fmt=self._formats.get("normal", "float32"))
+            if texture_coords is not None:
+                vao.set_vbo("texture_coords", texture_coords, fmt=self._formats.get("texture_coords", "float32"))
+        return vao, vertex_data
+
+    def add_lod(
+        self,
+        vertices: np.ndarray,
+        indices: np.ndarray,
+        distance: Optional[float] = None,
+        screen_size: Optional[float] = None,
+        color: Optional[Union[np.ndarray, List[float]]] = None,
+        texture_coords: Optional[np.ndarray] = None,
+    ) -> int:
+        """
+        Add a coarser level of detail. Levels have to be added from fine to coarse. 'draw' uses the coarsest level
+        whose condition is met: the camera is at least 'distance' away from the model's bounding sphere center, or
+        the bounding sphere covers at most 'screen_size' of the viewport height (0.0 - 1.0)
+        :param vertices: vertex coordinates of the level (k, 3), in the same space as the model's vertices
+        :param indices: triangle vertex indices of the level (l, 3)
+        :param distance: minimum camera distance for this level
+        :param screen_size: maximum projected size for this level (fraction of the viewport height)
+        :param color: color of the level (3,) or each individual vertex (k, 3); by default the model's color, if it
+        was given as a single color
+        :param texture_coords: texture coordinates for each vertex (k, 2)
+        :return: level index
+        """
+        self._check_lod_condition(distance, screen_size)
+        if color is None and np.ndim(self._mesh_settings["color"]) == 1:
+            color = self._mesh_settings["color"]
+
+        indices, vertices, normals, colors, texture_coords = self._prepare_mesh(
+            vertices, indices, color, texture_coords
+        )
+        return self._append_lod(indices, vertices, normals, colors, texture_coords, distance, screen_size)
+
+    def add_decimated_lod(
+        self,
+        target_faces: Optional[int] = None,
+        max_error: Optional[float] = None,
+        distance: Optional[float] = None,
+        screen_size: Optional[float] = None,
+    ) -> int:
+        """
+        Add a coarser level of detail by decimating the full resolution mesh (see 'decimate'). Colors and texture
+        coordinates are carried over. Levels have to be added from fine to coarse (see 'add_lod')
+        :param target_faces: number of faces of the level; by default half of the model's faces
+        :param max_error: highest quadric error of a single edge collapse
+        :param distance: minimum camera distance for this level
+        :param screen_size: maximum projected size for this level (fraction of the viewport height)
+        :return: level index
+        """
+        self._check_lod_condition(distance, screen_size)
+        vertices, indices, colors, texture_coords = decimate(
+            self._vertices,
+            self._indices,
+            target_faces=target_faces,
+            max_error=max_error,
+            colors=self._colors,
+            texture_coords=self._texture_coords,
+        )
+        indices, vertices = indices.astype(np.uint32), vertices.astype(np.float32)
+        normals = compute_normals(indices, vertices)
+        if texture_coords is not None:
+            texture_coords = texture_coords.astype(np.float32)
+        return self._append_lod(
+            indices, vertices, normals, colors.astype(np.float32), texture_coords, distance, screen_size
+        )
+
+    @staticmethod
+    def _check_lod_condition(distance: Optional[float], screen_size: Optional[float]):
+        """
+        :param distance: minimum camera distance of a level
+        :param screen_size: maximum projected size of a level
+        """
+        if (distance is None) == (screen_size is None):
+            raise ValueError("Exactly one of 'distance' and 'screen_size' has to be given")
+
+    def _append_lod(
+        self,
+        indices: np.ndarray,
+        vertices: np.ndarray,
+        normals: np.ndarray,
+        colors: np.ndarray,
+        texture_coords: Optional[np.ndarray],
+        distance: Optional[float],
+        screen_size: Optional[float],
+    ) -> int:
+        """
+        Upload a prepared mesh as the next level of detail
+        :return: level index
+        """
+        vao, _ = self._create_vao(indices, vertices, normals, colors, texture_coords)
+        self.lods.append(dict(vao=vao, num_triangles=indices.shape[0], distance=distance, screen_size=screen_size))
+        return len(self.lods)
+
+    @property
+    def bounding_sphere(self) -> Tuple[np.ndarray, float]:
+        """
+        :return: center (3,) and radius of a sphere enclosing the model's vertices (model space)
+        """
+        if self._bounding_sphere is None:
+            center = (np.min(self._vertices, axis=0) + np.max(self._vertices, axis=0)) / 2
+            radius = float(np.max(np.linalg.norm(self._vertices - center, axis=1))) if self._vertices.size else 0.0
+            self._bounding_sphere = (center, radius)
+        return self._bounding_sphere
+
+    def select_lod(self) -> int:
+        """
+        Select the level of detail for the current camera position and model transformation
+        :return: level index (0: full resolution)
+        """
+        if not self.lods:
+            return 0
+
+        # bounding sphere in world space
+        center, radius = self.bounding_sphere
+        center = (self.model_matrix @ np.append(center, 1.0))[:3]
+        radius *= np.max(np.linalg.norm(self.model_matrix[:3, :3], axis=0))
+
+        camera_pos = self._camera_pos if self._camera_pos is not None else FrameUniforms.camera_position()
+        distance = max(float(np.linalg.norm(center - camera_pos)), 1e-6)
+        screen_size = radius * FrameUniforms.projection_scale() / distance  # projected diameter / viewport height
+
+        level = 0
+        for idx, lod in enumerate(self.lods):
+            if lod["distance"] is not None and distance >= lod["distance"]:
+                level = idx + 1
+            elif lod["screen_size"] is not None and screen_size <= lod["screen_size"]:
+                level = idx + 1
+        return level
+
     def rotate(self, angle: float, x: float, y: float, z: float):
         """
         rotate model around an axis defined by x, y and z.
@@ -195,7 +425,7 @@ class Model:
         """
         Update shader, perform all transformations and draw model
         :param shader_name: select a shader
-        :param num_indices: number of indices to draw; by default all
+        :param num_indices: number of indices to draw; by default all (and the level of detail is selected)
         :param offset: start point of the indices to draw; by default first (0)
         """
 
@@ -210,13 +440,10 @@ class Model:
         for operation, args in self.operations:
             operation(*args)
 
-        # bind texture
+        # bind texture (skipped, if already bound from the last draw call)
         for idx, texture in enumerate(self.textures):
-            glActiveTexture(GL_TEXTURE0 + idx)
-            glBindTexture(GL_TEXTURE_2D, texture.location)
-            glBindSampler(idx, texture.sampler_id)
-
-        glActiveTexture(GL_TEXTURE0)  # reset
+            GLState.bind_texture(idx, texture.location)
+            GLState.bind_sampler(idx, texture.sampler_id)
 
         def find_consecutive_sets(lst):
             """
@@ -234,29 +461,51 @@ class Model:
 
             return result
 
-        # draw model
+        # draw model; a level of detail is only selected, if the whole model is drawn
         if triangle_indices is None:
-            self.vao.draw(num_indices, offset)
+            vao = self.vao
+            if num_indices is None and offset == 0:
+                self.lod_level = self.select_lod()
+                vao = self.lods[self.lod_level - 1]["vao"] if self.lod_level else self.vao
+            self._draw_vao(vao, num_indices, offset)
         else:
             for offset, num_indices in find_consecutive_sets(triangle_indices):
-                self.vao.draw(num_indices, offset)  # TODO: Testing
+                self._draw_vao(self.vao, num_indices, offset)  # TODO: Testing
 
         glPopMatrix()
-        glFlush()
 
-        # reset
-        glBindTexture(GL_TEXTURE_2D, 0)
-        glBindSampler(0, 0)
-        self.shaders[shader_name].un_use()
+        # program, vertex array and textures stay bound for the next draw call (see 'GLState.use_fixed_function')
         self.reset()
 
+    def _draw_vao(self, vao: VAO, num_indices: Optional[int], offset: int):
+        """
+        Issue the draw call of a level of detail
+        :param vao: VAO of the level
+        :param num_indices: number of faces to draw; None for all
+        :param offset: first face to draw
+        """
+        vao.draw(num_indices, offset)
+
+    def delete(self):
+        """
+        Release the shader programs of the model. Programs shared with other models stay alive until their last
+        user is deleted
+        """
+        for shader in self.shaders.values():
+            shader.delete()
+        self.shaders = {}
+
     def update_shader(self, shader_name: str):
         """
-        Updates shader attributes
+        Updates the per-model shader attributes. Camera, lights and runtime are shared with all shaders once per
+        frame (see FrameUniforms), so only the model matrix is set here
         :param shader_name: shader to update
         """
-        self.shaders[shader_name].update_model_matrix(self.model_matrix)
-        self.shaders[shader_name].update_time()
+        shader = self.shaders[shader_name]
+        shader.update_model_matrix(self.model_matrix)
+        # only programs that still declare a separate time uniform instead of reading 'glpgFrame.x' need the runtime
+        if shader.time_loc != -1:
+            shader.update_time()
 
     @staticmethod
     def format_color_array(color: np.ndarray, num_vertices: int) -> np.ndarray:
@@ -282,27 +531,129 @@ class Model:
             raise ValueError("Wrong type for color")
         return color
 
-    def update_camera(self, *args, **kwargs):
+    def update_camera(self, camera_pos: np.ndarray, camera_view: Optional[np.ndarray] = None):
+        """
+        Store a camera position for the level of detail selection of this model. Not needed for rendering, as the
+        camera is shared with all shaders once per frame (see FrameUniforms); without it, the frame's camera is used
+        :param camera_pos: camera position array (3,)
+        :param camera_view: camera view direction array (3,); unused, kept for compatibility
+        """
+        self._camera_pos = np.array(camera_pos, dtype=float)
+
+    @property
+    def adjacency(self) -> Adjacency:
         """
-        update camera parameters for every shader
-        :param args: forwarded arguments
-        :param kwargs: forwarded keyword arguments
+        :return: connectivity of the model's mesh; built on first access and shared by all methods that need it
         """
-        for key in self.shaders.keys():
-            self.shaders[key].update_camera(*args, **kwargs)
+        if self._adjacency is None:
+            self._adjacency = Adjacency(self._indices, self._vertices.shape[0])
+        return self._adjacency
 
-    def update_object(self, vertices: np.ndarray = None, colors: np.ndarray = None):
+    def update_object(
+        self,
+        vertices: np.ndarray = None,
+        colors: np.ndarray = None,
+        vertex_range: Optional[Tuple[int, int]] = None,
+    ):
         """
-        Update vertices and/or colors of the model
-        :param vertices: vertices array (m, 3)
-        :param colors: color array (m, 3) pr (3,)
+        Update vertices and/or colors of the model (full resolution mesh; levels of detail are not changed)
+        :param vertices: vertices array (m, 3); if 'vertex_range' is given, (k, 3) for the vertices in that range
+        :param colors: color array (m, 3) or (3,); if 'vertex_range' is given, (k, 3) for the vertices in that range
+        :param vertex_range: dirty vertex range (start, stop); only this part of the buffers is uploaded
         """
+        num_vertices = self._vertices.shape[0]
+        start, stop = (0, num_vertices) if vertex_range is None else vertex_range
+        if not 0 <= start <= stop <= num_vertices:
+            raise ValueError(f"Invalid vertex range ({start}, {stop}) for {num_vertices} vertices")
+        if start == stop:
+            return
+        full_update = start == 0 and stop == num_vertices
+
+        # dirty range of each vertex attribute
+        dirty = {}
         if vertices is not None:
-            self._vertices = np.array(vertices, dtype=np.float32)
-            self._normals = compute_normals(self._indices, self._vertices)
-            self.vao.set_vbo("normal", self._normals)
-            self.vao.set_vbo("position", self._vertices)
+            vertices = np.array(vertices, dtype=np.float32)
+            if vertices.shape[0] == num_vertices:
+                vertices = vertices[start:stop]
+            if full_update:
+                self._vertices = vertices
+                self._normals = compute_normals(self._indices, self._vertices)
+                dirty["normal"] = [(start, stop)]
+            else:
+                self._vertices[start:stop] = vertices
+                # normals also change for all vertices sharing a face with a moved vertex
+                faces = self.adjacency.faces_of_vertices(np.arange(start, stop))
+                if faces.shape[0] > 0:
+                    vertex_ids = np.unique(self._indices[faces])
+                    self._normals[vertex_ids] = compute_normals(
+                        self._indices, self._vertices, vertex_ids=vertex_ids, adjacency=self.adjacency
+                    )
+                    # neighbors of subdivided meshes are spread over the index space; upload them in runs
+                    breaks = np.flatnonzero(np.diff(vertex_ids) > self.dirty_gap)
+                    firsts = np.concatenate([vertex_ids[:1], vertex_ids[breaks + 1]])
+                    lasts = np.concatenate([vertex_ids[breaks], vertex_ids[-1:]]) + 1
+                    dirty["normal"] = [(int(first), int(last)) for first, last in zip(firsts, lasts)]
+            dirty["position"] = [(start, stop)]
+            self._bounding_sphere = None
 
         if colors is not None:
-            self._colors = self.format_color_array(colors, self._vertices.shape[0])
-            self.vao.set_vbo("color", colors[:, :3])
+            colors = self.format_color_array(colors, num_vertices if full_update else stop - start)
+            if colors.shape[0] == num_vertices and not full_update:
+                colors = colors[start:stop]
+            self._colors[start:stop] = colors
+            dirty["color"] = [(start, stop)]
+
+        # upload dirty ranges
+        arrays = {"position": self._vertices, "normal": self._normals, "color": self._colors}
+        if self._vertex_data is not None:
+            if not dirty:
+                return
+            # one upload per run covering all dirty attributes
+            for first, last in self._merge_runs([run for runs in dirty.values() for run in runs], num_vertices):
+                for attr_name in dirty:
+                    fmt = self._formats.get(attr_name, "float32")
+                    self._vertex_data[attr_name][first:last] = VAO.pack_attribute(
+                        attr_name, arrays[attr_name][first:last], fmt
+                    )
+                orphan = first == 0 and last == num_vertices
+                self.vao.update_vbo("interleaved", self._vertex_data[first:last], first_vertex=first, orphan=orphan)
+        else:
+            for attr_name, runs in dirty.items():
+                for first, last in self._merge_runs(runs, num_vertices):
+                    orphan = first == 0 and last == num_vertices
+                    data = arrays[attr_name][first:last, :3]
+                    self.vao.update_vbo(attr_name, data, first_vertex=first, orphan=orphan)
+
+    def _merge_runs(self, runs: List[Tuple[int, int]], num_vertices: int) -> List[Tuple[int, int]]:
+        """
+        Merge overlapping or close dirty vertex runs
+        :param runs: dirty vertex ranges (first, last)
+        :param num_vertices: number of vertices of the buffer
+        :return: sorted, merged runs; the whole buffer, if there are more than 'max_dirty_runs' runs
+        """
+        merged = []
+        for first, last in sorted(runs):
+            if merged and first - merged[-1][1] <= self.dirty_gap:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+            else:
+                merged.append((first, last))
+        if len(merged) > self.max_dirty_runs:
+            return [(0, num_vertices)]
+        return merged
+
+    def memory_report(self) -> Dict[str, int]:
+        """
+        Compares the GPU memory of the model's buffers with an uncompressed layout (32 bit indices and float32
+        attributes)
+        :return: dictionary with the allocated bytes ('bytes'), the bytes of the uncompressed layout
+        ('float32_bytes') and the difference ('saved')
+        """
+        num_vertices = self._vertices.shape[0]
+        report = self.vao.memory_report()
+        allocated = sum(report.values())
+        uncompressed = self._indices.size * np.dtype(np.uint32).itemsize
+        for attr_name, (num_components, _, _) in VAO.attributes.items():
+            if attr_name in report or (self._vertex_data is not None and attr_name in self._vertex_data.dtype.names):
+                uncompressed += num_vertices * num_components * np.dtype(np.float32).itemsize
+        uncompressed += sum(report.get(attr_name, 0) for attr_name in VAO.instance_attributes)  # always float32
+        return dict(bytes=allocated, float32_bytes=uncompressed, saved=uncompressed - allocated)
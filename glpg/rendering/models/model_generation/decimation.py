@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Mesh decimation by quadric error metric (QEM) edge collapses
+@File      : decimation.py
+@Project   : pygletPlayground
+@Time      : 18.10.26 22:30
+@Author    : flowmeadow
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+from glpg.rendering.models.adjacency import Adjacency
+
+
+def decimate(
+    vertices: np.ndarray,
+    indices: np.ndarray,
+    target_faces: Optional[int] = None,
+    max_error: Optional[float] = None,
+    colors: Optional[np.ndarray] = None,
+    texture_coords: Optional[np.ndarray] = None,
+    boundary_weight: float = 1000.0,
+    batch_fraction: float = 0.25,
+    max_passes: int = 100,
+    selection_rounds: int = 4,
+) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]:
+    """
+    Reduce a triangle mesh by collapsing edges with a low quadric error (Garland and Heckbert). Instead of one
+    collapse at a time, each pass collapses a batch of edges from the cheapest 'batch_fraction' of all edges whose
+    surrounding faces do not overlap, so all costs and updates are computed with array operations. Collapses that
+    would change the topology or fold faces over are skipped. Mesh boundaries (including texture seams, where
+    vertices are duplicated) are kept in place by additional boundary quadrics. Colors and texture coordinates are
+    interpolated along the collapsed edge.
+    :param vertices: vertex array [n, 3]
+    :param indices: face index array [m, 3]
+    :param target_faces: number of faces to reduce to; by default half of the faces, if 'max_error' is not given
+    :param max_error: highest quadric error (area weighted squared distance) of a collapse
+    :param colors: vertex colors [n, k]
+    :param texture_coords: vertex texture coordinates [n, 2]
+    :param boundary_weight: weight of the boundary quadrics relative to the face quadrics
+    :param batch_fraction: fraction of the cheapest edges considered for collapses in each pass; lower values are
+    closer to collapsing one edge after another, higher values need fewer passes
+    :param max_passes: maximum number of collapse passes
+    :param selection_rounds: rounds per pass to fill up the batch after invalid collapses were rejected
+    :return: vertices [n', 3], indices [m', 3], colors [n', k] and texture coordinates [n', 2] (None, if not given)
+    """
+    vertices = np.array(vertices, dtype=np.float64)
+    indices = np.array(indices, dtype=np.int64).reshape(-1, 3)
+    attributes = [None if a is None else np.array(a, dtype=np.float64) for a in (colors, texture_coords)]
+    if target_faces is None:
+        target_faces = indices.shape[0] // 2 if max_error is None else 0
+    max_error = np.inf if max_error is None else max_error
+    num_vertices = vertices.shape[0]
+    random = np.random.default_rng(0)
+
+    quadrics = _vertex_quadrics(vertices, indices, boundary_weight)
+    for _ in range(max_passes):
+        if indices.shape[0] <= target_faces:
+            break
+        adjacency = Adjacency(indices, num_vertices)
+        edges = adjacency.edges
+        edge_faces = np.bincount(adjacency.edge_ids, minlength=edges.shape[0])
+        boundary_vertices = np.zeros(num_vertices, dtype=bool)
+        boundary_vertices[edges[edge_faces == 1].reshape(-1)] = True
+        positions, errors, t = _collapse_costs(vertices, quadrics, edges)
+        # batch of cheap collapses that do not share any face, chosen in random order to spread it over the mesh
+        candidates = errors <= min(max_error, np.quantile(errors, batch_fraction))
+        rank = random.permutation(edges.shape[0])
+        accepted = [np.zeros(0, dtype=np.int64)]
+        for _ in range(selection_rounds):
+            selected = _independent_edges(edges, rank, candidates, indices, num_vertices)
+            if selected.shape[0] == 0:
+                break
+            valid, ring_vertices, ring_owners = _valid_collapses(
+                vertices,
+                indices,
+                edges[selected],
+                positions[selected],
+                edge_faces[selected],
+                boundary_vertices,
+                adjacency,
+            )
+            accepted.append(selected[valid])
+            candidates[selected] = False
+            # edges touching the faces around accepted collapses have to wait for the next pass
+            locked = np.zeros(num_vertices, dtype=bool)
+            locked[ring_vertices[valid[ring_owners]]] = True
+            candidates &= ~(locked[edges[:, 0]] | locked[edges[:, 1]])
+        selected = np.concatenate(accepted)
+        if selected.shape[0] == 0:
+            break
+
+        # do not remove more faces than requested; each collapse removes the faces at its edge
+        selected = selected[np.argsort(errors[selected], kind="stable")]
+        num_collapses = np.searchsorted(np.cumsum(edge_faces[selected]), indices.shape[0] - target_faces) + 1
+        selected = selected[:num_collapses]
+
+        # move the kept vertex, merge quadrics and attributes, remap the removed vertex
+        keep, remove = edges[selected, 0], edges[selected, 1]
+        vertices[keep] = positions[selected]
+        quadrics[keep] += quadrics[remove]
+        w = t[selected][:, np.newaxis]
+        for attribute in attributes:
+            if attribute is not None:
+                attribute[keep] = (1.0 - w) * attribute[keep] + w * attribute[remove]
+        remap = np.arange(num_vertices)
+        remap[remove] = keep
+        indices = remap[indices]
+        indices = indices[(indices != np.roll(indices, 1, axis=1)).all(axis=1)]
+
+    # drop unused vertices
+    used, indices = np.unique(indices, return_inverse=True)
+    indices = indices.reshape(-1, 3)
+    colors, texture_coords = [None if a is None else a[used] for a in attributes]
+    return vertices[used], indices, colors, texture_coords
+
+
+def _vertex_quadrics(vertices: np.ndarray, indices: np.ndarray, boundary_weight: float) -> np.ndarray:
+    """
+    Sum up the area weighted plane quadrics of the faces around each vertex. Each boundary edge adds the quadric of
+    a plane through the edge, perpendicular to its face
+    :param vertices: vertex array [n, 3]
+    :param indices: face index array [m, 3]
+    :param boundary_weight: weight of the boundary quadrics
+    :return: quadrics [n, 4, 4]
+    """
+    corners = vertices[indices]
+    cross_products = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    double_areas = np.linalg.norm(cross_products, axis=1)
+    normals = cross_products / np.maximum(double_areas, 1e-300)[:, np.newaxis]
+    face_quadrics = _plane_quadrics(normals, corners[:, 0], double_areas / 2)
+
+    adjacency = Adjacency(indices, vertices.shape[0])
+    boundary = np.nonzero(adjacency.twins < 0)[0]
+    start, end = adjacency.half_edges[boundary].T
+    edge_vectors = vertices[end] - vertices[start]
+    boundary_normals = np.cross(edge_vectors, normals[boundary // 3])
+    boundary_normals /= np.maximum(np.linalg.norm(boundary_normals, axis=1), 1e-300)[:, np.newaxis]
+    boundary_quadrics = _plane_quadrics(
+        boundary_normals, vertices[start], boundary_weight * np.sum(edge_vectors**2, axis=1)
+    )
+
+    # scatter-add to the vertices
+    quadrics = np.zeros((vertices.shape[0], 16))
+    scatter = [(indices[:, k], face_quadrics) for k in range(3)]
+    scatter += [(start, boundary_quadrics), (end, boundary_quadrics)]
+    for targets, sources in scatter:
+        for entry in range(16):
+            quadrics[:, entry] += np.bincount(targets, weights=sources[:, entry], minlength=vertices.shape[0])
+    return quadrics.reshape(-1, 4, 4)
+
+
+def _plane_quadrics(normals: np.ndarray, points: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    :param normals: unit plane normals [k, 3]
+    :param points: a point on each plane [k, 3]
+    :param weights: weight of each plane [k]
+    :return: flattened quadrics p * p^T * weight with p = (n, -n * point) [k, 16]
+    """
+    planes = np.concatenate([normals, -np.sum(normals * points, axis=1)[:, np.newaxis]], axis=1)
+    return (planes[:, :, np.newaxis] * planes[:, np.newaxis, :] * weights[:, None, None]).reshape(-1, 16)
+
+
+def _quadric_errors(quadrics: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """
+    :param quadrics: quadrics [k, 4, 4]
+    :param positions: positions [k, 3]
+    :return: quadric errors x^T * Q * x with x = (position, 1) [k]
+    """
+    x = np.concatenate([positions, np.ones((positions.shape[0], 1))], axis=1)
+    return np.einsum("ki,kij,kj->k", x, quadrics, x)
+
+
+def _collapse_costs(
+    vertices: np.ndarray, quadrics: np.ndarray, edges: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Find the position with the lowest quadric error for each edge collapse. Where the quadric can not be minimized
+    reliably or the minimum lies far from the edge, the best of both end points and the midpoint is used
+    :param vertices: vertex array [n, 3]
+    :param quadrics: vertex quadrics [n, 4, 4]
+    :param edges: edges [e, 2]
+    :return: positions [e, 3], errors [e], interpolation parameter of the position along the edge [e]
+    """
+    a, b = vertices[edges[:, 0]], vertices[edges[:, 1]]
+    q = quadrics[edges[:, 0]] + quadrics[edges[:, 1]]
+
+    options = np.stack([a, (a + b) / 2, b], axis=1)
+    option_errors = np.stack([_quadric_errors(q, options[:, idx]) for idx in range(3)], axis=1)
+    best = np.argmin(option_errors, axis=1)
+    rows = np.arange(edges.shape[0])
+    positions, errors = options[rows, best], option_errors[rows, best]
+
+    # minimize the quadric where the symmetric 3x3 system is well-conditioned (solved by its adjugate)
+    q_00, q_01, q_02, q_11, q_12, q_22 = (q[:, i, j] for i, j in [(0, 0), (0, 1), (0, 2), (1, 1), (1, 2), (2, 2)])
+    adjugate = np.stack(
+        [
+            q_11 * q_22 - q_12 * q_12, q_02 * q_12 - q_01 * q_22, q_01 * q_12 - q_02 * q_11,
+            q_02 * q_12 - q_01 * q_22, q_00 * q_22 - q_02 * q_02, q_01 * q_02 - q_00 * q_12,
+            q_01 * q_12 - q_02 * q_11, q_01 * q_02 - q_00 * q_12, q_00 * q_11 - q_01 * q_01,
+        ],
+        axis=1,
+    ).reshape(-1, 3, 3)
+    determinant = q_00 * adjugate[:, 0, 0] + q_01 * adjugate[:, 1, 0] + q_02 * adjugate[:, 2, 0]
+    scale = np.maximum(np.abs(q[:, :3, :3]).max(axis=(1, 2)), 1e-300)
+    solvable = np.nonzero(np.abs(determinant) > 1e-6 * scale**3)[0]
+    if solvable.shape[0]:
+        optimum = -np.einsum("kij,kj->ki", adjugate[solvable], q[solvable, :3, 3]) / determinant[solvable, None]
+        optimum_errors = _quadric_errors(q[solvable], optimum)
+        near = np.linalg.norm(optimum - options[solvable, 1], axis=1) <= np.linalg.norm(b - a, axis=1)[solvable]
+        better = near & (optimum_errors < errors[solvable])
+        positions[solvable[better]] = optimum[better]
+        errors[solvable[better]] = optimum_errors[better]
+
+    edge_vectors = b - a
+    t = np.sum((positions - a) * edge_vectors, axis=1) / np.maximum(np.sum(edge_vectors**2, axis=1), 1e-300)
+    return positions, np.maximum(errors, 0.0), np.clip(t, 0.0, 1.0)
+
+
+def _independent_edges(
+    edges: np.ndarray, rank: np.ndarray, candidates: np.ndarray, indices: np.ndarray, num_vertices: int
+) -> np.ndarray:
+    """
+    Select the candidate edges that rank before all other candidates touching the faces around their end points.
+    No face contains end points of two selected edges, so all of them can be collapsed at once
+    :param edges: edges [e, 2]
+    :param rank: unique rank of each edge [e]; lower ranks are preferred
+    :param candidates: mask of the edges that may be selected [e]
+    :param indices: face index array [m, 3]
+    :param num_vertices: number of vertices
+    :return: selected edges
+    """
+    none = edges.shape[0]
+    rank = np.where(candidates, rank, none)
+    vertex_rank = np.full(num_vertices, none)
+    np.minimum.at(vertex_rank, edges[:, 0], rank)
+    np.minimum.at(vertex_rank, edges[:, 1], rank)
+    face_rank = vertex_rank[indices].min(axis=1)
+    ring_rank = np.full(num_vertices, none)
+    np.minimum.at(ring_rank, indices.reshape(-1), np.repeat(face_rank, 3))
+    return np.nonzero(candidates & (ring_rank[edges[:, 0]] == rank) & (ring_rank[edges[:, 1]] == rank))[0]
+
+
+def _valid_collapses(
+    vertices: np.ndarray,
+    indices: np.ndarray,
+    edges: np.ndarray,
+    positions: np.ndarray,
+    edge_faces: np.ndarray,
+    boundary_vertices: np.ndarray,
+    adjacency: Adjacency,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Check the collapses for topology changes (link condition, joined boundaries) and faces that would fold over
+    :param vertices: vertex array [n, 3]
+    :param indices: face index array [m, 3]
+    :param edges: edges to collapse [k, 2]
+    :param positions: new vertex position of each collapse [k, 3]
+    :param edge_faces: number of faces at each edge [k]
+    :param boundary_vertices: mask of the vertices on a boundary [n]
+    :param adjacency: adjacency of the current mesh
+    :return: mask of the valid collapses [k], vertices of the faces around the end points [r] and the position of
+    their edge in 'edges' [r]
+    """
+    num_edges = edges.shape[0]
+    corners, owners = adjacency.corners_of_vertices(edges.reshape(-1))
+    edge_idcs, sides = owners // 2, owners % 2
+    face_vertices = indices[corners // 3]
+    a, b = edges[edge_idcs, 0], edges[edge_idcs, 1]
+
+    # link condition: the end points share exactly the neighbors opposite of the edge
+    neighbors = face_vertices.reshape(-1)
+    neighbor_edges = np.repeat(edge_idcs, 3)
+    outside = (neighbors != np.repeat(a, 3)) & (neighbors != np.repeat(b, 3))
+    keys = np.unique((neighbor_edges * vertices.shape[0] + neighbors)[outside] * 2 + np.repeat(sides, 3)[outside])
+    pair_keys, pair_counts = np.unique(keys // 2, return_counts=True)
+    common = np.bincount(pair_keys[pair_counts == 2] // vertices.shape[0], minlength=num_edges)
+    valid = common == edge_faces
+    # an inner edge between two boundary vertices would join two boundaries
+    valid &= ~(boundary_vertices[edges[:, 0]] & boundary_vertices[edges[:, 1]] & (edge_faces > 1))
+
+    # remaining faces must not flip
+    remaining = ~(np.any(face_vertices == a[:, None], axis=1) & np.any(face_vertices == b[:, None], axis=1))
+    old = vertices[face_vertices[remaining]]
+    moved = (face_vertices[remaining] == a[remaining, None]) | (face_vertices[remaining] == b[remaining, None])
+    new = np.where(moved[:, :, np.newaxis], positions[edge_idcs[remaining]][:, np.newaxis], old)
+    old_normals = np.cross(old[:, 1] - old[:, 0], old[:, 2] - old[:, 0])
+    new_normals = np.cross(new[:, 1] - new[:, 0], new[:, 2] - new[:, 0])
+    folded = (np.sum(old_normals * new_normals, axis=1) <= 0) & np.any(old_normals != 0, axis=1)
+    valid &= np.bincount(edge_idcs[remaining][folded], minlength=num_edges) == 0
+    return valid, face_vertices.reshape(-1), np.repeat(edge_idcs, 3)
@@ -11,6 +11,8 @@ from typing import Tuple
 import numpy as np
 import warnings
 
+from glpg.rendering.models.adjacency import Adjacency
+
 
 def cube(
     size: float = 1.0,
@@ -25,7 +27,7 @@ def cube(
     :return: vertices [n, 3], indices [m, 3]
     """
     refinement_steps = max(0, refinement_steps)
-    max_step = 9
+    max_step = 16
     if refinement_steps > max_step and not experimental_mode:
         refinement_steps = max_step
         warnings.warn(
@@ -79,36 +81,85 @@ def cube(
         [13, 6, 7],
         [13, 4, 6],
     ]
-    vertices_per_face = 3
+    vertices, indices = np.array(vertices), np.array(indices)
     for step in range(refinement_steps):
-        new_vertices, new_indices = vertices, []
-        vertices = np.array(vertices)
-        for triangle in indices:
-            edges = []
-            for i in range(vertices_per_face):
-                edges.append(vertices[triangle[(i + 1) % vertices_per_face]] - vertices[triangle[i]])
-            edges = np.array(edges)
-            largest_edge = np.argmax(np.linalg.norm(edges, axis=1))
-            new_vertex = vertices[triangle[largest_edge]] + edges[largest_edge] * 0.5
-
-            if new_vertex.tolist() not in new_vertices:
-                vertex_idx = len(new_vertices)
-                new_vertices.append(new_vertex.tolist())
-            else:
-                vertex_idx = new_vertices.index(new_vertex.tolist())
-
-            triangle_1 = [triangle[0], triangle[1], triangle[2]]
-            triangle_2 = [triangle[0], triangle[1], triangle[2]]
-
-            triangle_1[largest_edge] = vertex_idx
-            triangle_2[(largest_edge + 1) % vertices_per_face] = vertex_idx
+        vertices, indices = _bisect_longest_edges(vertices, indices)
 
-            new_indices.append(triangle_1)
-            new_indices.append(triangle_2)
+    return vertices * size, indices
 
-        vertices, indices = new_vertices, new_indices
 
-    return np.array(vertices) * size, np.array(indices)
+def _bisect_longest_edges(vertices: np.ndarray, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Split each triangle into two at the midpoint of its longest edge (first edge on ties). Midpoints that coincide
+    with an existing vertex or with an earlier midpoint reuse that vertex; new vertices are appended in the order of
+    their first occurrence. A face with longest edge i is replaced by two faces, where the midpoint substitutes
+    vertex i and vertex (i + 1) % 3 respectively
+    :param vertices: vertex array [n, 3]
+    :param indices: face index array [m, 3]
+    :return: vertices [n + k, 3] (k: number of new vertices), indices [2 * m, 3]
+    """
+    num_vertices, rows = vertices.shape[0], np.arange(indices.shape[0])
+
+    # find the longest edge (i, i + 1) of each face and compute its midpoint
+    corners = vertices[indices]
+    edges = corners[:, [1, 2, 0]] - corners
+    largest_edge = np.argmax(np.linalg.norm(edges, axis=2), axis=1)
+    midpoints = corners[rows, largest_edge] + edges[rows, largest_edge] * 0.5
+
+    # identify equal points by their bytes; adding 0.0 turns -0.0 into 0.0, so both compare equal
+    points = np.concatenate([vertices, midpoints]) + 0.0
+    keys = np.ascontiguousarray(points).view(np.dtype((np.void, points.dtype.itemsize * 3))).reshape(-1)
+    _, first_idcs, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    first_idcs = first_idcs[inverse.reshape(-1)][num_vertices:]  # first equal point of each midpoint
+
+    # reuse existing vertices, number new ones by first occurrence
+    is_new = first_idcs >= num_vertices
+    new_idcs = np.unique(first_idcs[is_new])
+    midpoint_idcs = np.where(is_new, num_vertices + np.searchsorted(new_idcs, first_idcs), first_idcs)
+    vertices = np.concatenate([vertices, midpoints[new_idcs - num_vertices]])
+
+    # create new faces
+    triangles_1, triangles_2 = indices.copy(), indices.copy()
+    triangles_1[rows, largest_edge] = midpoint_idcs
+    triangles_2[rows, (largest_edge + 1) % 3] = midpoint_idcs
+    return vertices, np.stack([triangles_1, triangles_2], axis=1).reshape(-1, 3)
+
+
+def _split_and_flip(vertices: np.ndarray, indices: np.ndarray, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Split each triangle [a, b, c] into [m, a, b], [m, b, c], [m, c, a] at its center m (projected onto the sphere)
+    and flip the former triangle edges, if they are longer than the connection of the two adjacent centers.
+    The neighbor across a former edge is found by its twin half-edge (see Adjacency). A pair [m, a, b], [m', b, a]
+    is decided once (at the lower face index) and becomes [a, m', m], [b, m, m']
+    :param vertices: vertex array [n, 3]
+    :param indices: face index array [f, 3]
+    :param radius: sphere radius
+    :return: vertices [n + f, 3], indices [3 * f, 3]
+    """
+    num_vertices, num_faces = vertices.shape[0], indices.shape[0]
+
+    # add the face centers
+    centers = np.mean(vertices[indices], axis=1)
+    centers = centers / np.linalg.norm(centers, axis=1)[:, np.newaxis] * radius
+    vertices = np.concatenate([vertices, centers])
+
+    # split faces; the former edge of each new face is (b, a) -> (face[1], face[2])
+    m = np.repeat(num_vertices + np.arange(num_faces), 3)
+    a = indices.reshape(-1)
+    b = indices[:, [1, 2, 0]].reshape(-1)
+    indices = np.stack([m, a, b], axis=1)
+
+    # the neighbor across the former edge (a, b) holds the twin half-edge (b, a)
+    twin = Adjacency(indices, vertices.shape[0]).face_neighbors[:, 1]
+
+    # flip the pairs, where the former edge is longer than the connection of the centers
+    dist_1 = np.linalg.norm(vertices[a] - vertices[b], axis=1)
+    dist_2 = np.linalg.norm(vertices[m] - vertices[m[twin]], axis=1)
+    flip = np.nonzero((np.arange(indices.shape[0]) < twin) & (dist_1 > dist_2))[0]
+    m_twin = m[twin[flip]]
+    indices[twin[flip]] = np.stack([b[flip], m[flip], m_twin], axis=1)
+    indices[flip] = np.stack([a[flip], m_twin, m[flip]], axis=1)
+    return vertices, indices
 
 
 def sphere(
@@ -123,9 +174,8 @@ def sphere(
     :param experimental_mode: if True, the number of refinement steps is infinite
     :return: vertices [n, 3], indices [m, 3]
     """
-    warnings.warn("\n'sphere' method is inefficient for sphere mesh generation. Use 'icosphere' instead.")
     refinement_steps = max(0, refinement_steps)
-    max_step = 4
+    max_step = 10
     if refinement_steps > max_step and not experimental_mode:
         refinement_steps = max_step
         warnings.warn(
@@ -157,39 +207,46 @@ def sphere(
 
     # refinement
     for r_idx in range(refinement_steps):
-        new_indices, edges = [], []
-        for triangle in indices:
-            vert_index = len(vertices)
-            new_vert = np.mean(vertices[triangle], axis=0)
-            new_vert = (new_vert / np.linalg.norm(new_vert)) * radius
-            vertices = np.append(vertices, [new_vert], axis=0)
-            new_indices.append([vert_index, triangle[0], triangle[1]])
-            new_indices.append([vert_index, triangle[1], triangle[2]])
-            new_indices.append([vert_index, triangle[2], triangle[0]])
-        indices = np.array(new_indices)
-        # edge flipping
-        for idx in range(len(indices)):
-            triangle = indices[idx]
-            c_triangle, c_idx = 0, 0
-            for c_idx in range(len(indices)):
-                c_triangle = indices[c_idx]
-                if triangle[1] in c_triangle and triangle[2] in c_triangle and triangle[0] not in c_triangle:
-                    break
-            c_vert = c_triangle[np.where((c_triangle != triangle[1]) & (c_triangle != triangle[2]))[0]]
-
-            edge_1 = [triangle[1], triangle[2]]
-            edge_2 = [triangle[0], c_vert[0]]
-
-            dist_1 = np.linalg.norm(vertices[edge_1[0]] - vertices[edge_1[1]])
-            dist_2 = np.linalg.norm(vertices[edge_2[0]] - vertices[edge_2[1]])
-
-            if dist_1 > dist_2:
-                # perform edge flip
-                indices[idx] = [edge_1[0], edge_2[1], edge_2[0]]
-                indices[c_idx] = [edge_1[1], edge_2[0], edge_2[1]]
+        vertices, indices = _split_and_flip(vertices, indices, radius)
     return vertices, indices
 
 
+def _subdivide(vertices: np.ndarray, faces: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Split each triangle into four by inserting a vertex at each edge midpoint. Edges shared by two faces get one
+    midpoint. New vertices are ordered by the first occurrence of their edge (face by face, edges (0, 1), (1, 2),
+    (2, 0)) and each face [a, b, c] with midpoints ab, bc, ca is replaced by [a, ab, ca], [b, bc, ab], [c, ca, bc]
+    and [ab, bc, ca]
+    :param vertices: vertex array [n, 3]
+    :param faces: face index array [m, 3]
+    :return: vertices [n + e, 3] (e: number of unique edges), faces [4 * m, 3]
+    """
+    num_vertices = vertices.shape[0]
+    faces = faces.astype(np.int64)
+
+    # unique edges in the order of first occurrence; midpoints ab, bc, ca of each face
+    adjacency = Adjacency(faces, num_vertices)
+    midpoint_idcs = (num_vertices + adjacency.edge_ids).reshape(-1, 3)
+
+    # create all midpoints at once
+    edges = adjacency.edges
+    midpoints = (vertices[edges[:, 0]] + vertices[edges[:, 1]]) / 2
+    vertices = np.concatenate([vertices, midpoints])
+
+    # create new faces
+    ab, bc, ca = midpoint_idcs.T
+    new_faces = np.stack(
+        [
+            np.stack([faces[:, 0], ab, ca], axis=1),
+            np.stack([faces[:, 1], bc, ab], axis=1),
+            np.stack([faces[:, 2], ca, bc], axis=1),
+            np.stack([ab, bc, ca], axis=1),
+        ],
+        axis=1,
+    ).reshape(-1, 3)
+    return vertices, new_faces
+
+
 def icosphere(
     radius: float = 0.1,
     refinement_steps: int = 0,
@@ -203,7 +260,7 @@ def icosphere(
     :return: vertices [n, 3], indices [m, 3]
     """
     refinement_steps = max(0, refinement_steps)
-    max_step = 6
+    max_step = 10
     if refinement_steps > max_step and not experimental_mode:
         refinement_steps = max_step
         warnings.warn(
@@ -235,44 +292,10 @@ def icosphere(
     )
     # refinement
     for r_idx in range(refinement_steps):
-        # update each face
-        edges = {}
-        new_faces = np.zeros((faces.shape[0] * 4, 3)).astype(np.uint)
-        for f_idx, face in enumerate(faces):
-            # define face edges
-            e_1 = [face[0], face[1]]
-            e_2 = [face[1], face[2]]
-            e_3 = [face[2], face[0]]
-
-            # TODO: more efficient
-            new_v_idcs = np.zeros((3,))
-            for e_idx, edge in enumerate([e_1, e_2, e_3]):
-                sorted_edge = tuple(np.sort(edge))
-                if sorted_edge not in edges.keys():
-                    # create new vertex
-                    new_vert = np.array([np.mean(vertices[edge], axis=0)])
-                    # append new vertex and store vertex id
-                    v_idx = vertices.shape[0]
-                    vertices = np.concatenate([vertices, new_vert])
-                    # mark current edge as processed and store the vertex id
-                    edges[sorted_edge] = v_idx
-                else:
-                    v_idx = edges[sorted_edge]
-                # store vertex index of current edge
-                new_v_idcs[e_idx] = v_idx
-
-            # create new faces
-            new_faces[f_idx * 4 + 0] = np.array([face[0], new_v_idcs[0], new_v_idcs[2]])
-            new_faces[f_idx * 4 + 1] = np.array([face[1], new_v_idcs[1], new_v_idcs[0]])
-            new_faces[f_idx * 4 + 2] = np.array([face[2], new_v_idcs[2], new_v_idcs[1]])
-            new_faces[f_idx * 4 + 3] = np.array([new_v_idcs[0], new_v_idcs[1], new_v_idcs[2]])
-
-        faces = new_faces
+        vertices, faces = _subdivide(vertices, faces)
 
     # move all vertices to the sphere surface
-    lengths = np.linalg.norm(vertices, axis=1)
-    for idx in range(3):
-        vertices[:, idx] /= lengths
+    vertices /= np.linalg.norm(vertices, axis=1)[:, np.newaxis]
 
     # apply radius
     vertices = vertices * radius
@@ -284,6 +307,8 @@ def cylinder(
     height: float = 0.2,
     angle_steps: int = 32,
     height_steps: int = 8,
+    dtype: np.dtype = np.float64,
+    index_dtype: np.dtype = np.int64,
 ) -> Tuple[np.ndarray, np.ndarray]:
     """
     Creates vertices and indices of a cylinder
@@ -292,67 +317,88 @@ def cylinder(
     :param height: cylinder height
     :param angle_steps: angular resolution
     :param height_steps: vertical resolution
+    :param dtype: data type of the vertices
+    :param index_dtype: data type of the indices
     :return: vertices [n, 3], indices [m, 3]
     """
     angles = np.linspace(0, 2 * np.pi, angle_steps, endpoint=False)  # get values of all angles
+    ring_size = angle_steps + 1  # center and circle vertices of each height step
+
+    # create the vertices; each ring starts with its center
+    rings = np.zeros((height_steps, ring_size, 3), dtype=dtype)
+    rings[:, 1:, 0] = np.sin(angles) * radius
+    rings[:, 1:, 1] = np.cos(angles) * radius
+    rings[:, :, 2] = np.linspace(0, height, height_steps)[:, np.newaxis]
+    vertices = rings.reshape(-1, 3)
+
+    # create the indices; for each angle step: bottom, top and side triangles of all height steps
+    i = np.arange(1, angle_steps + 1)[:, np.newaxis]
+    j = i % angle_steps + 1  # next angle step
+    offset_1 = ring_size * np.arange(height_steps - 1)  # lower ring of each side segment
+    offset_2 = offset_1 + ring_size  # upper ring
+    offset = ring_size * (height_steps - 1)  # top ring
+    zeros = np.zeros_like(i)
+    sides = np.stack(
+        [
+            np.stack([offset_1 + i, offset_2 + j, offset_1 + j], axis=2),
+            np.stack([offset_1 + i, offset_2 + i, offset_2 + j], axis=2),
+        ],
+        axis=2,
+    ).reshape(angle_steps, -1, 3)
+    caps = np.stack(
+        [
+            np.stack([zeros, i, j], axis=2),
+            np.stack([zeros + offset, offset + i, offset + j], axis=2),
+        ],
+        axis=1,
+    ).reshape(angle_steps, 2, 3)
+    indices = np.concatenate([caps, sides], axis=1).reshape(-1, 3).astype(index_dtype)
+    return vertices, indices
 
-    vertices, indices = [], []
-    # create the vertices
-    for h in np.linspace(0, height, height_steps):
-        vertices.append([0, 0, h])
-        for a in angles:
-            vertices.append([np.sin(a) * radius, np.cos(a) * radius, h])
-
-    # create the indices
-    for i in range(1, angle_steps + 1):
-        # top and bottom triangles
-        indices.append([0, i, i % angle_steps + 1])
-        offset = (angle_steps + 1) * (height_steps - 1)
-        indices.append([offset, offset + i, offset + i % angle_steps + 1])
-        # side triangles
-        for h in range(height_steps - 1):
-            offset_1 = (angle_steps + 1) * h
-            offset_2 = (angle_steps + 1) * (h + 1)
-            indices.append([offset_1 + i, offset_2 + i % angle_steps + 1, offset_1 + i % angle_steps + 1])
-            indices.append([offset_1 + i, offset_2 + i, offset_2 + i % angle_steps + 1])
-    return np.array(vertices), np.array(indices)
-
-
-def grid(width: int = 2, length: int = 3, size: float = None):
+
+def grid(
+    width: int = 2,
+    length: int = 3,
+    size: float = None,
+    dtype: np.dtype = np.float64,
+    index_dtype: np.dtype = np.int64,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Creates vertices and indices of a flat grid in the xy-plane. Each quad is split into four triangles at its center
+    :param width: number of quads in x-direction
+    :param length: number of quads in y-direction
+    :param size: edge length of a quad; by default the grid fits into the unit square
+    :param dtype: data type of the vertices
+    :param index_dtype: data type of the indices
+    :return: vertices [(width + 1) * (length + 1) + width * length, 3], indices [4 * width * length, 3]
+    """
     if not size:
         size = 1 / max(width, length)
 
-    # compute quad vertices
-    x = np.arange((width + 1) * (length + 1)) % (width + 1)
-    y = np.arange((width + 1) * (length + 1)) // (width + 1)
-    z = np.zeros((width + 1) * (length + 1))
-    vertices = np.concatenate([[x], [y], [z]], axis=0).T
-
-    # compute quad indices
-    x_steps = np.arange(width)
-    y_steps = np.arange(0, (width + 1) * length, (width + 1))
-    steps = np.array(np.meshgrid(x_steps, y_steps)).T.reshape(-1, 2)
-    steps = np.sort(np.sum(steps, axis=1))
-    start_idcs = np.array([0, 1, width + 1, width + 2])  # quad indices of first quad
-    quad_idcs = np.full((len(steps), 4), start_idcs)
-    quad_idcs += np.full((len(steps), 4), np.array([steps]).T)
-
-    # compute triangle idcs and missing vertices
-    triangles = []
-    vert_offs = len(vertices)
-    for idx, quad in enumerate(quad_idcs):
-        # compute new vertex in quad center
-        new_vertex = np.mean(vertices[quad, :], axis=0)
-        vertices = np.concatenate([vertices, np.array([new_vertex])])
-
-        # compute triangle idcs
-        triangles.append([quad[0], quad[1], idx + vert_offs])
-        triangles.append([quad[1], quad[3], idx + vert_offs])
-        triangles.append([quad[3], quad[2], idx + vert_offs])
-        triangles.append([quad[2], quad[0], idx + vert_offs])
-
-    triangles = np.array(triangles)
-    return vertices * size, triangles
+    # compute quad corner vertices, followed by the quad centers
+    num_corners, num_quads = (width + 1) * (length + 1), width * length
+    vertices = np.zeros((num_corners + num_quads, 3), dtype=dtype)
+    corner_idcs, quad_idcs = np.arange(num_corners), np.arange(num_quads)
+    vertices[:num_corners, 0] = corner_idcs % (width + 1)
+    vertices[:num_corners, 1] = corner_idcs // (width + 1)
+    vertices[num_corners:, 0] = quad_idcs % width + 0.5
+    vertices[num_corners:, 1] = quad_idcs // width + 0.5
+    vertices *= size
+
+    # compute quad corner indices (row by row) and triangle indices
+    starts = quad_idcs // width * (width + 1) + quad_idcs % width
+    q_0, q_1, q_2, q_3 = starts, starts + 1, starts + width + 1, starts + width + 2
+    center = num_corners + quad_idcs
+    triangles = np.stack(
+        [
+            np.stack([q_0, q_1, center], axis=1),
+            np.stack([q_1, q_3, center], axis=1),
+            np.stack([q_3, q_2, center], axis=1),
+            np.stack([q_2, q_0, center], axis=1),
+        ],
+        axis=1,
+    )
+    return vertices, triangles.reshape(-1, 3).astype(index_dtype)
 
 
 def bars(width: int = 16, length: int = 16, gap=0.2, size: float = None, bottom=True, sides=True):
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Disk and memory cache for refined basic geometries
+@File      : mesh_cache.py
+@Project   : pygletPlayground
+@Time      : 18.10.26 19:10
+@Author    : flowmeadow
+"""
+import functools
+import hashlib
+import inspect
+import os
+from typing import Tuple
+
+import numpy as np
+
+from glpg.rendering.models import adjacency
+from glpg.rendering.models.model_generation import geometry
+
+# directory of the mesh files; can be changed before the first mesh is loaded
+cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "glpg", "meshes")
+
+# file layout: header, vertices [n, 3] float32, indices [m, 3] uint32; MESH_VERSION only covers this layout
+MESH_MAGIC = b"GLPGMESH"
+MESH_VERSION = 1
+header_dtype = np.dtype([("magic", "S8"), ("version", "<u4"), ("num_vertices", "<u8"), ("num_faces", "<u8")])
+vertex_dtype = np.dtype("<f4")
+index_dtype = np.dtype("<u4")
+
+# generators of unit-size meshes
+generators = {
+    "icosphere": lambda steps: geometry.icosphere(radius=1.0, refinement_steps=steps, experimental_mode=True),
+    "cube": lambda steps: geometry.cube(size=1.0, refinement_steps=steps, experimental_mode=True),
+}
+
+
+def icosphere(radius: float = 0.1, refinement_steps: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cached version of 'geometry.icosphere'
+    :param radius: radius of the icosphere
+    :param refinement_steps: number of triangle refinements
+    :return: vertices [n, 3] float32, indices [m, 3] uint32 (read-only)
+    """
+    return load_mesh("icosphere", refinement_steps, radius)
+
+
+def cube(size: float = 1.0, refinement_steps: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cached version of 'geometry.cube'
+    :param size: edge length of the cube
+    :param refinement_steps: number of triangle refinements
+    :return: vertices [n, 3] float32, indices [m, 3] uint32 (read-only)
+    """
+    return load_mesh("cube", refinement_steps, size)
+
+
+@functools.lru_cache(maxsize=1)
+def generator_digest() -> str:
+    """
+    Digest of the source code the generated meshes depend on. It is part of the mesh file names, so changing a
+    generator never loads meshes stored by an older version
+    :return: hex digest (12 characters)
+    """
+    digest = hashlib.sha256()
+    for module in (geometry, adjacency):
+        try:
+            digest.update(inspect.getsource(module).encode("utf-8"))
+        except (OSError, TypeError):  # no source available (e.g. frozen application)
+            digest.update(module.__name__.encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def load_mesh(name: str, refinement_steps: int, scale: float = 1.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Load a unit-size mesh from the cache and scale it. Missing meshes are generated and stored first
+    :param name: geometry name (key of 'generators')
+    :param refinement_steps: number of triangle refinements
+    :param scale: scale factor applied to the vertices
+    :return: vertices [n, 3] float32, indices [m, 3] uint32 (read-only)
+    """
+    if name not in generators:
+        raise ValueError(f"No generator for mesh '{name}'. Available: {list(generators.keys())}")
+    vertices, indices = _load_unit_mesh(cache_dir, name, max(0, refinement_steps))
+    return vertices * np.float32(scale), indices
+
+
+def clear_memory_cache() -> None:
+    """
+    Drop all meshes from the in-process cache (mesh files are kept)
+    """
+    _load_unit_mesh.cache_clear()
+
+
+@functools.lru_cache(maxsize=16)
+def _load_unit_mesh(directory: str, name: str, refinement_steps: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Map the mesh file into memory. Missing or invalid files are (re)generated
+    :param directory: mesh file directory
+    :param name: geometry name
+    :param refinement_steps: number of triangle refinements
+    :return: vertices [n, 3], indices [m, 3] memory maps (read-only)
+    """
+    file_path = os.path.join(directory, f"{name}_{refinement_steps}_{generator_digest()}.mesh")
+    meshes = _map_mesh(file_path) if os.path.exists(file_path) else None
+    if meshes is None:
+        vertices, indices = generators[name](refinement_steps)
+        _write_mesh(file_path, vertices, indices)
+        meshes = _map_mesh(file_path)
+    return meshes
+
+
+def _map_mesh(file_path: str):
+    """
+    :param file_path: path of the mesh file
+    :return: vertices [n, 3], indices [m, 3] memory maps; None, if the file is invalid or from an older version
+    """
+    header = np.fromfile(file_path, dtype=header_dtype, count=1)
+    if header.shape[0] == 0 or header["magic"][0] != MESH_MAGIC or header["version"][0] != MESH_VERSION:
+        return None
+    num_vertices, num_faces = int(header["num_vertices"][0]), int(header["num_faces"][0])
+    index_offset = header_dtype.itemsize + num_vertices * 3 * vertex_dtype.itemsize
+    if os.path.getsize(file_path) != index_offset + num_faces * 3 * index_dtype.itemsize:
+        return None  # truncated
+
+    vertices = np.memmap(file_path, dtype=vertex_dtype, mode="r", offset=header_dtype.itemsize, shape=(num_vertices, 3))
+    indices = np.memmap(file_path, dtype=index_dtype, mode="r", offset=index_offset, shape=(num_faces, 3))
+    return vertices, indices
+
+
+def _write_mesh(file_path: str, vertices: np.ndarray, indices: np.ndarray) -> None:
+    """
+    Store a mesh file. It is written to a temporary file first, so other processes never map incomplete files
+    :param file_path: path of the mesh file
+    :param vertices: vertex array [n, 3]
+    :param indices: index array [m, 3]
+    """
+    header = np.array([(MESH_MAGIC, MESH_VERSION, vertices.shape[0], indices.shape[0])], dtype=header_dtype)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.tobytes())
+        f.write(np.ascontiguousarray(vertices, dtype=vertex_dtype).tobytes())
+        f.write(np.ascontiguousarray(indices, dtype=index_dtype).tobytes())
+    os.replace(tmp_path, file_path)
@@ -12,6 +12,8 @@ from typing import Optional
 import numpy as np
 from pyglet.gl import *
 
+from glpg.rendering.gpu.state import GLState
+
 
 class PointCloud:
     """
@@ -35,6 +37,7 @@ class PointCloud:
         draw the points into the scene
         :return:
         """
+        GLState.use_fixed_function()
         glEnable(GL_POINT_SMOOTH)
         glPointSize(self.point_size)
         glBegin(GL_POINTS)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Merges many small static models into one buffer that is drawn with one draw call
+@File      : static_batch.py
+@Project   : pygletPlayground
+@Time      : 18.10.26 23:55
+@Author    : flowmeadow
+"""
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from glpg.rendering.gpu.vao import VAO
+from glpg.rendering.models.model import Model
+from glpg.transformations.methods import flip_inside_out
+
+
+class StaticBatch(Model):
+    """
+    Model built from several static models (members) that share the same shaders and textures. The meshes are
+    merged into one vertex and index buffer with the members' transformations baked into the vertices, so the whole
+    batch is drawn with one VAO bind and one draw call. Members can be hidden individually; the visible members are
+    drawn with one glMultiDrawElements call over their index ranges.
+    """
+
+    def __init__(self, models: Sequence[Model], **kwargs) -> None:
+        """
+        :param models: compatible models (see 'batch_key'); their pending transformations ('model_matrix') are
+        baked into the vertices. The models themselves are not changed and can be deleted afterwards
+        :param kwargs: forwarded to Model (e.g. compact); by default the members' shaders, textures and number of
+        light sources are used
+        """
+        if not models:
+            raise ValueError("A batch needs at least one model")
+        keys = {self.batch_key(model) for model in models}
+        if len(keys) > 1:
+            raise ValueError("Models with different shaders, textures or texture coordinates can not be batched")
+
+        vertices, indices, colors, texture_coords, ranges = [], [], [], [], []
+        num_vertices, num_faces = 0, 0
+        for model in models:
+            matrix = np.asarray(model.model_matrix, dtype=np.float64)
+            vertices.append(model._vertices @ matrix[:3, :3].T + matrix[:3, 3])
+            # mirroring transformations reverse the winding order
+            faces = model._indices if np.linalg.det(matrix[:3, :3]) >= 0 else flip_inside_out(model._indices)
+            indices.append(np.asarray(faces, dtype=np.int64) + num_vertices)
+            colors.append(model._colors[:, :3])
+            if model._texture_coords is not None:
+                texture_coords.append(model._texture_coords)
+            ranges.append((num_faces, faces.shape[0]))
+            num_vertices += model._vertices.shape[0]
+            num_faces += faces.shape[0]
+
+        kwargs.setdefault("shader", list(models[0].shaders.keys()))
+        kwargs.setdefault("textures", list(models[0].textures))
+        kwargs.setdefault("num_lights", models[0].num_lights)
+        super().__init__(
+            np.concatenate(vertices),
+            np.concatenate(indices),
+            color=np.concatenate(colors),
+            texture_coords=np.concatenate(texture_coords) if texture_coords else None,
+            **kwargs,
+        )
+
+        # first face and number of faces of each member
+        self.member_ranges = np.array(ranges, dtype=np.int64).reshape(-1, 2)
+        self.visible = np.ones(len(models), dtype=bool)
+        self._visible_ranges = None  # index ranges of consecutive visible members; updated on demand
+
+    @staticmethod
+    def batch_key(model: Model) -> Tuple:
+        """
+        Models with the same key can be merged into one batch
+        :param model: Model object
+        :return: shader programs, textures and whether texture coordinates are used
+        """
+        shaders = tuple((name, shader.program) for name, shader in model.shaders.items())
+        # Texture objects instead of their OpenGL ids, which change when an asynchronous load replaces the placeholder
+        textures = tuple(model.textures)
+        return shaders, textures, model._texture_coords is not None
+
+    @classmethod
+    def from_models(cls, models: Sequence[Model], **kwargs) -> List["StaticBatch"]:
+        """
+        Sort models into groups of compatible models and create one batch per group
+        :param models: Model objects
+        :param kwargs: forwarded to each batch
+        :return: list of StaticBatch objects
+        """
+        groups: Dict[Tuple, List[Model]] = {}
+        for model in models:
+            groups.setdefault(cls.batch_key(model), []).append(model)
+        return [cls(members, **kwargs) for members in groups.values()]
+
+    def set_visible(self, members: Union[int, Sequence[int], np.ndarray], visible: bool = True):
+        """
+        Show or hide members of the batch
+        :param members: member index, list of member indices or boolean mask
+        :param visible: if False, the members are skipped by 'draw'
+        """
+        self.visible[members] = visible
+        self._visible_ranges = None
+
+    @property
+    def visible_ranges(self) -> np.ndarray:
+        """
+        :return: first face and number of faces of each run of consecutive visible members [k, 2]
+        """
+        if self._visible_ranges is None:
+            visible = self.visible
+            starts = np.flatnonzero(visible & ~np.concatenate([[False], visible[:-1]]))
+            stops = np.flatnonzero(visible & ~np.concatenate([visible[1:], [False]]))
+            first = self.member_ranges[starts, 0]
+            last = self.member_ranges[stops, 0] + self.member_ranges[stops, 1]
+            self._visible_ranges = np.stack([first, last - first], axis=1)
+        return self._visible_ranges
+
+    def _draw_vao(self, vao: VAO, num_indices: Optional[int], offset: int):
+        """
+        Draw the visible members with as few draw calls as possible
+        :param vao: VAO of the batch
+        :param num_indices: number of faces to draw; None for all visible members
+        :param offset: first face to draw
+        """
+        if num_indices is not None or offset != 0:
+            vao.draw(num_indices, offset)
+            return
+        ranges = self.visible_ranges
+        if ranges.shape[0] == 1:
+            vao.draw(int(ranges[0, 1]), int(ranges[0, 0]))
+        else:
+            vao.draw_ranges(ranges)
+
+    def add_lod(self, *args, **kwargs) -> int:
+        """
+        Levels of detail are selected for the whole batch, which does not fit members spread over the scene;
+        static batches do not provide this method of Model
+        """
+        raise TypeError("Levels of detail are not supported for static batches")
+
+    def add_decimated_lod(self, *args, **kwargs) -> int:
+        """
+        Levels of detail are selected for the whole batch, which does not fit members spread over the scene;
+        static batches do not provide this method of Model
+        """
+        raise TypeError("Levels of detail are not supported for static batches")
@@ -1,5 +1,7 @@
 #version 130
 
+#include "glpg_instancing.glsl"  // vertex inputs with and without instancing
+
 uniform mat4 modelMatrix;
 
 out vec2 uVec1;  // derivate vector for texturing without vertex seam
@@ -17,8 +19,8 @@ void main ()
     uVec2 = fract(uVecA + 0.5) - 0.5;
 
     // compute position, color and face normal
-    gl_Position = gl_ModelViewProjectionMatrix * gl_Vertex;
-    fPosition = vec3(modelMatrix * gl_Vertex);
-    fColor = vec3(gl_Color);
-    fNormal = normalize(mat3(modelMatrix) * gl_Normal);
+    gl_Position = gl_ModelViewProjectionMatrix * glpgVertex;
+    fPosition = vec3(modelMatrix * glpgVertex);
+    fColor = vec3(glpgColor);
+    fNormal = normalize(mat3(modelMatrix) * glpgNormal);
 }
\ No newline at end of file
@@ -1,8 +1,8 @@
 #version 130
 
 
-uniform vec3 cameraPos;  // camera position
-uniform int iLights;  // number of light sources
+#include "glpg_frame.glsl"  // camera, runtime and light sources shared by all programs
+
 uniform int iTextures;  // number of textures
 uniform sampler2D objTexture0;  // texture
 
@@ -18,9 +18,9 @@ out vec4 FragColor;  // final fragment color
 // computes light attenuation based on the distance to the light source and the source's attenuation parameter
 float attenuation(int light_index, vec3 light_dir){
     float d = abs(length(light_dir));
-    float attenuation = gl_LightSource[light_index].constantAttenuation;
-    attenuation += gl_LightSource[light_index].linearAttenuation * d;
-    attenuation += gl_LightSource[light_index].quadraticAttenuation * pow(d, 2);
+    float attenuation = glpgLightParams[light_index].x;
+    attenuation += glpgLightParams[light_index].y * d;
+    attenuation += glpgLightParams[light_index].z * pow(d, 2);
     attenuation = 1. / attenuation;
     return attenuation;
 }
@@ -47,21 +47,21 @@ void main()
 
     // update the final fragment color for each light source individually
     vec3 final_color = vec3(0., 0., 0.);
-    for (int l_idx = 0; l_idx < int(iLights); l_idx++){
+    for (int l_idx = 0; l_idx < glpgFrame.y; l_idx++){
 
         // compute light and half-way vector
-        vec3 light_dir = vec3(gl_LightSource[l_idx].position) - fPosition;
+        vec3 light_dir = vec3(glpgLightPosition[l_idx]) - fPosition;
         vec3 l = normalize(light_dir);
         vec3 h = (v + l) / length(v + l);
 
         // check if the current fragment is withon the light spot (1: True, 0: False)
-        float spot = (1. - dot(-l, gl_LightSource[l_idx].spotDirection)) * 90.;
-        spot = max(sign(gl_LightSource[l_idx].spotCutoff - spot), 0.);
+        float spot = (1. - dot(-l, glpgLightSpotDirection[l_idx].xyz)) * 90.;
+        spot = max(sign(glpgLightParams[l_idx].w - spot), 0.);
 
         // compute ambient, diffuse and specular color
-        vec3 ambi_light_color = vec3(gl_LightSource[l_idx].ambient);
-        vec3 diff_light_color = vec3(gl_LightSource[l_idx].diffuse);
-        vec3 spec_light_color = vec3(gl_LightSource[l_idx].specular);
+        vec3 ambi_light_color = vec3(glpgLightAmbient[l_idx]);
+        vec3 diff_light_color = vec3(glpgLightDiffuse[l_idx]);
+        vec3 spec_light_color = vec3(glpgLightSpecular[l_idx]);
         vec3 ambient_color  = 0.3  * (ambi_light_color * object_color);
         vec3 diffuse_color = 0.3 * max(0.0, dot(n, l)) * (diff_light_color * object_color);
         vec3 specular_color = 0.5 * pow(max(0.0, dot(n, h)), 256) * (spec_light_color * object_color);
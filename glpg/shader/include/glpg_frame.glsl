@@ -0,0 +1,21 @@
+// per-frame uniforms shared by all programs (see glpg.rendering.gpu.uniform_buffer.FrameUniforms)
+// include it right after the version directive
+#extension GL_ARB_uniform_buffer_object : require
+
+layout(std140) uniform GLPGFrame {
+    mat4 glpgProjection;  // projection matrix
+    mat4 glpgView;  // view matrix
+    vec4 glpgCameraPos;  // camera position
+    vec4 glpgCameraView;  // camera view direction
+    ivec4 glpgFrame;  // x: runtime in milliseconds, y: number of light sources
+    vec4 glpgLightPosition[8];  // light positions
+    vec4 glpgLightAmbient[8];  // ambient light colors
+    vec4 glpgLightDiffuse[8];  // diffuse light colors
+    vec4 glpgLightSpecular[8];  // specular light colors
+    vec4 glpgLightSpotDirection[8];  // spotlight directions
+    vec4 glpgLightParams[8];  // x: constant, y: linear, z: quadratic attenuation, w: spot cutoff
+};
+
+#define cameraPos glpgCameraPos.xyz
+#define cameraView glpgCameraView.xyz
+#define iTime glpgFrame.x
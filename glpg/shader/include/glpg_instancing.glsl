@@ -0,0 +1,14 @@
+// vertex inputs that work with and without instancing (see glpg.rendering.models.instanced_model.InstancedModel)
+// include it in vertex shaders and use glpgVertex, glpgNormal and glpgColor instead of gl_Vertex, gl_Normal and gl_Color
+#ifdef GLPG_INSTANCED
+in mat4 glpgInstanceMatrix;  // per-instance transformation, applied before the model transformation
+in vec4 glpgInstanceColor;  // per-instance color; alpha blends between vertex color (0.0) and instance color (1.0)
+
+#define glpgVertex (glpgInstanceMatrix * gl_Vertex)
+#define glpgNormal (mat3(glpgInstanceMatrix) * gl_Normal)
+#define glpgColor mix(gl_Color, vec4(glpgInstanceColor.rgb, 1.0), glpgInstanceColor.a)
+#else
+#define glpgVertex gl_Vertex
+#define glpgNormal gl_Normal
+#define glpgColor gl_Color
+#endif
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Loads textures in the background and uploads them in time-budgeted slices on the OpenGL thread
+@File      : async_loader.py
+@Project   : pygletPlayground
+@Time      : 19.10.26 02:10
+@Author    : flowmeadow
+"""
+import ctypes as ct
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+from pyglet.gl import *
+
+from glpg.rendering.gpu.state import GLState
+from glpg.texturing.iba import row_stride
+from glpg.texturing.methods import ImageData, load_image_byte_array
+
+
+def _decode(texture: Union[np.ndarray, str]) -> ImageData:
+    """
+    Loads the image data (runs in a worker thread)
+    :param texture: file path to an image or numpy array holding the image information
+    :return: ImageData object
+    """
+    img_data = load_image_byte_array(texture)
+    # IBA files are memory mapped; read one byte per page, so the upload does not wait for the disk
+    for data in [img_data.c_data] + [data for data, _ in img_data.mip_levels or []]:
+        np.bitwise_or.reduce(data[::4096])
+    return img_data
+
+
+class TextureLoader:
+    """
+    Decodes textures in a thread pool and uploads them on the OpenGL thread in slices of rows, so a scene with many
+    large textures loads without freezing the application. Each texture is uploaded into a separate OpenGL texture,
+    which replaces the placeholder of the Texture object when all levels are complete. 'process' has to be called
+    once per frame from the thread that owns the OpenGL context (done by GLScreen.draw_frame).
+    """
+
+    # time per frame that is spent on uploads in seconds
+    time_budget = 0.004
+    # number of bytes uploaded by one glTexSubImage2D call
+    slice_size = 1 << 20
+    # upload through a pixel buffer object, so the driver copies the data asynchronously
+    use_pbo = False
+    # number of decoding threads
+    workers = 2
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _jobs: List[Dict] = []
+    _pbo = None
+    stats = dict(submitted=0, finished=0, failed=0)
+
+    @classmethod
+    def submit(cls, texture: "Texture", source: Union[np.ndarray, str]) -> None:
+        """
+        Start loading the image data of a texture in the background
+        :param texture: Texture object that shows its placeholder until the upload is finished
+        :param source: file path to an image or numpy array holding the image information
+        """
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(max_workers=cls.workers, thread_name_prefix="glpg-texture")
+        cls.cancel(texture)
+        future = cls._executor.submit(_decode, source)
+        # 'levels', 'level' and 'row' track the upload progress
+        job = dict(texture=texture, source=source, future=future, img_data=None, location=None)
+        job.update(levels=None, level=0, row=0)
+        cls._jobs.append(job)
+        cls.stats["submitted"] += 1
+
+    @classmethod
+    def cancel(cls, texture: "Texture") -> Optional[Union[np.ndarray, str]]:
+        """
+        Stop loading a texture (e.g. because it is loaded synchronously instead)
+        :param texture: Texture object
+        :return: image source of the cancelled job; None, if no job was pending
+        """
+        source = None
+        for job in [job for job in cls._jobs if job["texture"] is texture]:
+            job["future"].cancel()
+            if job["location"] is not None:
+                glDeleteTextures(1, job["location"])
+            cls._jobs.remove(job)
+            source = job["source"]
+        return source
+
+    @classmethod
+    def pending(cls) -> int:
+        """
+        :return: number of textures that are not uploaded yet
+        """
+        return len(cls._jobs)
+
+    @classmethod
+    def process(cls, time_budget: Optional[float] = None) -> None:
+        """
+        Upload decoded textures until the time budget is spent. Has to be called from the OpenGL thread
+        :param time_budget: time in seconds; by default 'time_budget'
+        """
+        if not cls._jobs:
+            return
+        deadline = time.perf_counter() + (cls.time_budget if time_budget is None else time_budget)
+        for job in list(cls._jobs):
+            if not job["future"].done():
+                continue
+            if not cls._upload(job, deadline):
+                break
+
+    @classmethod
+    def finish(cls) -> None:
+        """
+        Wait for all submitted textures and upload them completely (e.g. behind a loading screen)
+        """
+        while cls._jobs:
+            wait([job["future"] for job in cls._jobs])
+            cls.process(time_budget=float("inf"))
+
+    @classmethod
+    def _upload(cls, job: Dict, deadline: float) -> bool:
+        """
+        Continue the upload of a decoded texture
+        :param job: job dictionary
+        :param deadline: time (time.perf_counter) at which the upload is paused
+        :return: True, if the job finished before the deadline
+        """
+        texture, future = job["texture"], job["future"]
+        if job["levels"] is None:
+            error = future.exception()
+            if error is not None:
+                warnings.warn(f"Texture {job['source']} could not be loaded: {error}")
+                cls._jobs.remove(job)
+                cls.stats["failed"] += 1
+                return True
+            img_data: ImageData = future.result()
+            job["img_data"] = img_data
+            job["levels"] = [(img_data.c_data, img_data.img_size)] + list(img_data.mip_levels or [])
+            job["location"] = GLuint()
+            glGenTextures(1, job["location"])
+
+        img_data = job["img_data"]
+        img_format = texture.texture_formats[img_data.img_mode]
+        GLState.bind_texture(0, job["location"])
+        glPixelStorei(GL_UNPACK_ALIGNMENT, img_data.row_alignment)
+
+        while job["level"] < len(job["levels"]):
+            data, (width, height) = job["levels"][job["level"]]
+            if job["row"] == 0:
+                # allocate the level; the rows are filled by the slices below. No pixel buffer object may be bound
+                # here, otherwise the NULL pointer is read as an offset into that buffer
+                level = job["level"]
+                glTexImage2D(GL_TEXTURE_2D, level, img_format, width, height, 0, img_format, GL_UNSIGNED_BYTE, None)
+            stride = row_stride(width, img_data.img_mode, img_data.row_alignment)
+            while job["row"] < height:
+                if time.perf_counter() >= deadline:
+                    return False
+                row = job["row"]
+                rows = min(height - row, max(1, cls.slice_size // stride))
+                cls._bind_pbo()
+                pointer = cls._slice_pointer(data, row * stride, rows * stride)
+                glTexSubImage2D(GL_TEXTURE_2D, job["level"], 0, row, width, rows, img_format, GL_UNSIGNED_BYTE, pointer)
+                cls._unbind_pbo()
+                job["row"] += rows
+            job["level"], job["row"] = job["level"] + 1, 0
+
+        if img_data.mip_levels:
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(img_data.mip_levels))
+        else:
+            glGenerateMipmap(GL_TEXTURE_2D)
+        GLState.bind_texture(0, 0)
+
+        # replace the placeholder
+        placeholder = GLuint(texture.location.value)
+        texture.location.value = job["location"].value
+        texture.img_data = img_data
+        texture.ready = True
+        glDeleteTextures(1, placeholder)
+        GLState.invalidate()  # the deleted id may be reused by OpenGL
+        cls._jobs.remove(job)
+        cls.stats["finished"] += 1
+        return True
+
+    @classmethod
+    def _bind_pbo(cls) -> None:
+        if not cls.use_pbo:
+            return
+        if cls._pbo is None:
+            cls._pbo = GLuint()
+            glGenBuffers(1, cls._pbo)
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, cls._pbo)
+
+    @classmethod
+    def _unbind_pbo(cls) -> None:
+        if cls.use_pbo:
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+
+    @classmethod
+    def _slice_pointer(cls, data: np.ndarray, offset: int, nbytes: int) -> ct.c_void_p:
+        """
+        :param data: pixel data of the level (flat uint8 array)
+        :param offset: first byte of the slice
+        :param nbytes: number of bytes of the slice
+        :return: pointer to the slice, or the offset into the pixel buffer object that holds the slice
+        """
+        if not cls.use_pbo:
+            return ct.c_void_p(data.ctypes.data + offset)
+        # orphan the buffer, so the driver does not wait for the transfer of the previous slice
+        glBufferData(GL_PIXEL_UNPACK_BUFFER, nbytes, None, GL_STREAM_DRAW)
+        glBufferSubData(GL_PIXEL_UNPACK_BUFFER, 0, nbytes, ct.c_void_p(data.ctypes.data + offset))
+        return ct.c_void_p(0)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Reading and writing of image byte array (IBA) files, a raw pixel format that is uploaded without decoding
+@File      : iba.py
+@Project   : pygletPlayground
+@Time      : 19.10.26 00:45
+@Author    : flowmeadow
+"""
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# IBA v2 layout (little endian):
+#   header:      magic, version, header size, width, height, mode, number of levels, row alignment, payload checksum
+#   level table: width, height, offset and number of bytes of each level (level 0 is the full image)
+#   payload:     pixel rows of each level, each row padded to the row alignment, each level aligned to DATA_ALIGNMENT
+# Version 1 files are raw pixel data with width, height and mode stored in extended file attributes (xattr).
+MAGIC = b"\x89IBA"
+VERSION = 2
+DATA_ALIGNMENT = 64
+CHANNELS = {"L": 1, "RGB": 3, "RGBA": 4}
+
+_HEADER = struct.Struct("<4sHHII8sHHI")
+_LEVEL = struct.Struct("<IIQQ")
+
+
+def row_stride(width: int, img_mode: str, row_alignment: int) -> int:
+    """
+    :param width: image width in pixels
+    :param img_mode: Pillow image mode
+    :param row_alignment: alignment of each row in bytes (1, 2, 4 or 8, see GL_UNPACK_ALIGNMENT)
+    :return: number of bytes of a padded row
+    """
+    row_bytes = width * CHANNELS[img_mode]
+    return -(-row_bytes // row_alignment) * row_alignment
+
+
+def pad_rows(data: np.ndarray, size: Tuple[int, int], img_mode: str, row_alignment: int) -> np.ndarray:
+    """
+    Pads each row of tightly packed pixel data to the row alignment
+    :param data: tightly packed pixel data (flat uint8 array)
+    :param size: width and height in pixels
+    :param img_mode: Pillow image mode
+    :param row_alignment: alignment of each row in bytes
+    :return: flat uint8 array with padded rows (the input array, if no padding is needed)
+    """
+    width, height = size
+    row_bytes, stride = width * CHANNELS[img_mode], row_stride(width, img_mode, row_alignment)
+    data = np.ascontiguousarray(data, dtype=np.uint8).reshape(-1)
+    if stride == row_bytes:
+        return data
+    padded = np.zeros((height, stride), dtype=np.uint8)
+    padded[:, :row_bytes] = data.reshape(height, row_bytes)
+    return padded.reshape(-1)
+
+
+def _align(offset: int) -> int:
+    return -(-offset // DATA_ALIGNMENT) * DATA_ALIGNMENT
+
+
+def _map_file(path: str) -> mmap.mmap:
+    """
+    Maps a file read-only into memory; pages are only read from disk when accessed (e.g. by the texture upload)
+    :param path: file path
+    :return: mmap object
+    """
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def is_legacy(path: str) -> bool:
+    """
+    :param path: path to an IBA file
+    :return: True for version 1 files (metadata in extended file attributes)
+    """
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) != MAGIC
+
+
+def write_iba(
+    path: str,
+    levels: Sequence[Tuple[np.ndarray, Tuple[int, int]]],
+    img_mode: str,
+    row_alignment: int = 4,
+) -> None:
+    """
+    Writes pixel data to an IBA v2 file. The data is written to a temporary file in the same directory, which then
+    replaces the output file, so readers never see a partially written file
+    :param path: output file path
+    :param levels: tightly packed pixel data (flat uint8 array) and size (width, height) of each level, starting with
+    the full image
+    :param img_mode: Pillow image mode ('L', 'RGB' or 'RGBA')
+    :param row_alignment: alignment of each row in bytes; 4 matches the OpenGL default (GL_UNPACK_ALIGNMENT)
+    """
+    if img_mode not in CHANNELS:
+        raise ValueError(f"Image mode {img_mode} is not supported by the IBA format")
+    if row_alignment not in (1, 2, 4, 8):
+        raise ValueError(f"Invalid row alignment {row_alignment}")
+
+    padded = [pad_rows(data, size, img_mode, row_alignment) for data, size in levels]
+    table, offset = [], _align(_HEADER.size + _LEVEL.size * len(levels))
+    for (_, size), data in zip(levels, padded):
+        table.append((size[0], size[1], offset, data.nbytes))
+        offset = _align(offset + data.nbytes)
+
+    checksum = 0
+    for data in padded:
+        checksum = zlib.crc32(data, checksum)
+
+    width, height = levels[0][1]
+    header = _HEADER.pack(
+        MAGIC, VERSION, _HEADER.size, width, height, img_mode.encode(), len(levels), row_alignment, checksum
+    )
+    directory, base = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{base}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            for entry in table:
+                f.write(_LEVEL.pack(*entry))
+            for (_, _, level_offset, _), data in zip(table, padded):
+                f.write(b"\0" * (level_offset - f.tell()))
+                f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def read_header(path: str) -> Dict:
+    """
+    Reads the header and level table of an IBA v2 file
+    :param path: path to the IBA file
+    :return: dictionary with the keys 'version', 'size', 'img_mode', 'row_alignment', 'checksum' and 'levels' (list of
+    dictionaries with 'size', 'offset' and 'nbytes')
+    """
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size or header[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an IBA v2 file")
+        _, version, header_size, width, height, img_mode, num_levels, row_alignment, checksum = _HEADER.unpack(header)
+        if version > VERSION:
+            raise ValueError(f"IBA version {version} of {path} is not supported (up to {VERSION})")
+        f.seek(header_size)
+        levels = []
+        for _ in range(num_levels):
+            level_width, level_height, offset, nbytes = _LEVEL.unpack(f.read(_LEVEL.size))
+            levels.append(dict(size=(level_width, level_height), offset=offset, nbytes=nbytes))
+    return dict(
+        version=version,
+        size=(width, height),
+        img_mode=img_mode.rstrip(b"\0").decode(),
+        row_alignment=row_alignment,
+        checksum=checksum,
+        levels=levels,
+    )
+
+
+def read_iba(path: str, verify: bool = False) -> Dict:
+    """
+    Maps an IBA file (v1 or v2) into memory. The pixel arrays are read-only views of the mapped file, so no data is
+    copied before the texture upload
+    :param path: path to the IBA file
+    :param verify: if True, the payload checksum of v2 files is compared (reads the whole file)
+    :return: dictionary with the keys 'size', 'img_mode', 'row_alignment' and 'levels' (list of (pixel array, size))
+    """
+    if is_legacy(path):
+        return _read_legacy(path)
+
+    header = read_header(path)
+    buffer = _map_file(path)
+    levels: List[Tuple[np.ndarray, Tuple[int, int]]] = []
+    for level in header["levels"]:
+        data = np.frombuffer(buffer, dtype=np.uint8, count=level["nbytes"], offset=level["offset"])
+        levels.append((data, level["size"]))
+
+    if verify:
+        checksum = 0
+        for data, _ in levels:
+            checksum = zlib.crc32(data, checksum)
+        if checksum != header["checksum"]:
+            raise ValueError(f"Checksum mismatch in {path}; the file is corrupted")
+
+    return dict(size=header["size"], img_mode=header["img_mode"], row_alignment=header["row_alignment"], levels=levels)
+
+
+def _read_legacy(path: str) -> Dict:
+    """
+    Maps an IBA v1 file, which stores its metadata in extended file attributes
+    :param path: path to the IBA file
+    :return: see 'read_iba'
+    """
+    try:
+        width = int(os.getxattr(path, "user.img_width"))
+        height = int(os.getxattr(path, "user.img_height"))
+        img_mode = os.getxattr(path, "user.img_mode").decode("utf-8")
+    except (OSError, AttributeError) as e:
+        raise ValueError(f"{path} has no IBA v2 header and no IBA v1 metadata (extended file attributes)") from e
+    data = np.frombuffer(_map_file(path), dtype=np.uint8)
+    return dict(size=(width, height), img_mode=img_mode, row_alignment=1, levels=[(data, (width, height))])
+
+
+def migrate(path: str, row_alignment: int = 4) -> bool:
+    """
+    Converts an IBA v1 file into an IBA v2 file in place (see 'write_iba', the file is never left half written)
+    :param path: path to the IBA file
+    :param row_alignment: row alignment of the new file
+    :return: True, if the file was converted; False, if it already is a v2 file
+    """
+    if not is_legacy(path):
+        return False
+    iba = _read_legacy(path)
+    write_iba(path, iba["levels"], iba["img_mode"], row_alignment)
+    return True
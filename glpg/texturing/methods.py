@@ -19,57 +19,60 @@ import PIL.Image
 from pyglet.gl import *
 from sys import platform
 
-TEXTURE_FORMATS = {"RGB": GL_RGB, "L": GL_DEPTH_COMPONENT}
+from glpg.texturing.iba import read_iba, write_iba
+from glpg.texturing.mipmaps import generate_mipmaps
+
+TEXTURE_FORMATS = {"RGB": GL_RGB, "RGBA": GL_RGBA, "L": GL_DEPTH_COMPONENT}
 
 
 @dataclass
 class ImageData:
     """
-    Dataclass for images that contains a ctypes byte array, the size of the image in pixels and the Pillow image format.
+    Dataclass for images that contains the pixel data as a flat, C-contiguous uint8 array (row by row), the size of
+    the image in pixels, the Pillow image format, the alignment of each row in bytes and optionally precomputed
+    mipmap levels 1 ... n (pixel data and size of each level, see glpg.texturing.mipmaps).
     """
 
-    c_data: ctypes.Array
+    c_data: np.ndarray
     img_size: Tuple[int, int]
     img_mode: str
+    row_alignment: int = 1
+    mip_levels: Optional[List[Tuple[np.ndarray, Tuple[int, int]]]] = None
+
+    @property
+    def pointer(self) -> ct.c_void_p:
+        """
+        :return: void pointer to the pixel data, that can be passed to OpenGL without copying
+        """
+        return ct.c_void_p(self.c_data.ctypes.data)
 
 
-def img_file_to_byte_array(path: str, save: bool = False) -> ImageData:
+def img_file_to_byte_array(path: str, save: bool = False, mipmaps: bool = False) -> ImageData:
     """
-    Converts an image file to a ctypes array and returns it as an ImageData object.
+    Converts an image file to a uint8 array and returns it as an ImageData object.
     :param path: path to the image file (supported file types: PNG, JPEG, PPM, GIF, TIFF, and BMP)
-    :param save: If True, the ctypes array is saved in a custom format (IBA) in the same directory. This format can be
-    loaded much faster which is useful for a high amount of textures or high resolution images. Be sure to have enough
-    disk space, as those files can get quite big.
+    :param save: If True, the byte array is saved in a custom format (IBA, see glpg.texturing.iba) in the same
+    directory. This format can be loaded much faster which is useful for a high amount of textures or high resolution
+    images. Be sure to have enough disk space, as those files can get quite big.
+    :param mipmaps: If True, the full mipmap chain is computed (and saved), so it does not have to be generated at
+    every upload. This adds a third to the file size
     :return: ImageData object
     """
-    # open image and convert it to a numpy array
-    img = PIL.Image.open(path)  # .jpg, .bmp, etc. also work
-    img_data = np.array(list(img.getdata()), np.uint8)
-
-    img_size, img_mode = img.size, img.mode
-    data_type = np.ubyte  # default
+    # open and decode the image; numpy wraps the decoded bytes through the buffer protocol (no per-pixel objects)
+    with PIL.Image.open(path) as img:  # .jpg, .bmp, etc. also work
+        img_size, img_mode = img.size, img.mode
+        data = np.asarray(img, dtype=np.uint8).reshape(-1)
 
-    # transform array and get data length
-    data = np.array(img_data, dtype=data_type).flatten()
-    data_count = data.shape[0]
-
-    # convert to ctypes array
-    c_data = (ct.c_ubyte * data_count)()
-    c_data[:] = data
+    mip_levels = generate_mipmaps(data, img_size, img_mode) if mipmaps else None
 
     if save:
-        # save ctypes array as a binary file
+        # save byte array as a binary file with a header holding image size and mode
         directory, base = os.path.split(path)
         file_name, _ = os.path.splitext(base)
         out_path = os.path.join(directory, f"{file_name}.iba")
-        with open(out_path, "wb") as f:
-            f.write(data)
-        # save image size and mode as metadata
-        os.setxattr(out_path, "user.img_width", bytearray(str(img_size[0]), "utf-8"))
-        os.setxattr(out_path, "user.img_height", bytearray(str(img_size[1]), "utf-8"))
-        os.setxattr(out_path, "user.img_mode", bytearray(str(img_mode), "utf-8"))
+        write_iba(out_path, [(data, img_size)] + (mip_levels or []), img_mode)
 
-    return ImageData(c_data, img_size, img_mode)
+    return ImageData(data, img_size, img_mode, mip_levels=mip_levels)
 
 
 def load_image_byte_array(texture: Union[np.ndarray, str]) -> ImageData:
@@ -80,8 +83,8 @@ def load_image_byte_array(texture: Union[np.ndarray, str]) -> ImageData:
     """
     if isinstance(texture, np.ndarray):
         # transform array and get data length
-        arr = np.uint8(texture * 255)
-        img_size = arr.shape[:2]
+        arr = np.ascontiguousarray(texture * 255, dtype=np.uint8)
+        img_size = (arr.shape[1], arr.shape[0])  # width, height
         if len(arr.shape) == 2:
             img_mode = "L"
         elif len(arr.shape) == 3:
@@ -89,28 +92,19 @@ def load_image_byte_array(texture: Union[np.ndarray, str]) -> ImageData:
         else:
             raise NotImplementedError()
 
-        # convert to ctypes array
-        arr = arr.flatten()
-        data_count = arr.shape[0]
-        c_data = (ct.c_ubyte * data_count)()
-        c_data[:] = arr
-
-        img_data = ImageData(c_data, img_size, img_mode)
+        img_data = ImageData(arr.reshape(-1), img_size, img_mode)
 
     elif isinstance(texture, str):
         _, extension = os.path.splitext(texture)
         # load from image file
         if extension in [".jpg", ".jpeg", ".png", ".bmp"]:
             img_data = img_file_to_byte_array(texture)
-        # load from image byte array file (custom)
+        # load from image byte array file (custom); the pixel data is memory mapped, not read
         elif extension in [".iba"]:
-            with open(texture, "rb") as f:
-                c_data = f.read()
-            w = os.getxattr(texture, "user.img_width")
-            h = os.getxattr(texture, "user.img_height")
-            img_mode = os.getxattr(texture, "user.img_mode").decode("utf-8")
-            img_size = (int(w), int(h))
-            img_data = ImageData(c_data, img_size, img_mode)
+            iba = read_iba(texture)
+            c_data, img_size = iba["levels"][0]
+            mip_levels = iba["levels"][1:] or None
+            img_data = ImageData(c_data, img_size, iba["img_mode"], iba["row_alignment"], mip_levels)
         else:
             raise NotImplementedError()
     else:
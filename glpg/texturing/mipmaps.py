@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Introduce : Offline generation of mipmap chains, that are stored in IBA files and uploaded instead of glGenerateMipmap
+@File      : mipmaps.py
+@Project   : pygletPlayground
+@Time      : 19.10.26 01:20
+@Author    : flowmeadow
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from glpg.texturing.iba import CHANNELS
+
+# sRGB encoded byte value -> linear intensity
+_SRGB_TO_LINEAR = np.where(
+    np.arange(256) / 255 <= 0.04045, np.arange(256) / 255 / 12.92, ((np.arange(256) / 255 + 0.055) / 1.055) ** 2.4
+).astype(np.float32)
+
+
+def _linear_to_srgb(img: np.ndarray) -> np.ndarray:
+    """
+    :param img: linear intensities in [0, 1]
+    :return: sRGB encoded intensities in [0, 1]
+    """
+    img = np.clip(img, 0.0, 1.0)
+    return np.where(img <= 0.0031308, img * 12.92, 1.055 * np.power(img, 1 / 2.4, dtype=np.float32) - 0.055)
+
+
+def _downsample_axis(img: np.ndarray, smooth: bool) -> np.ndarray:
+    """
+    Halves the first axis of an image (rounded down, at least 1) with an area average. For odd sizes, each output pixel
+    covers a fractional number of input pixels
+    :param img: float32 image [n, ...]
+    :param smooth: if True, a [1, 2, 1] / 4 blur is applied first, which results in a [1, 3, 3, 1] / 8 tent filter
+    for even sizes and reduces aliasing compared to the plain box filter
+    :return: float32 image [max(1, n // 2), ...]
+    """
+    n = img.shape[0]
+    if n == 1:
+        return img
+    if smooth:
+        blurred = img * 0.5
+        blurred[1:] += img[:-1] * 0.25
+        blurred[:-1] += img[1:] * 0.25
+        blurred[0] += img[0] * 0.25  # clamp to edge
+        blurred[-1] += img[-1] * 0.25
+        img = blurred
+    if n % 2 == 0:
+        return (img[0::2] + img[1::2]) * 0.5
+    # odd sizes: integrate the piecewise constant signal between fractional pixel borders
+    m = n // 2
+    prefix = np.concatenate([np.zeros((1,) + img.shape[1:]), np.cumsum(img, axis=0, dtype=np.float64)])
+    borders = np.arange(m + 1) * (n / m)
+    lower = np.minimum(np.floor(borders).astype(np.int64), n - 1)
+    fraction = (borders - lower).reshape((-1,) + (1,) * (img.ndim - 1))
+    integral = prefix[lower] + fraction * (prefix[lower + 1] - prefix[lower])
+    return ((integral[1:] - integral[:-1]) / (n / m)).astype(np.float32)
+
+
+def generate_mipmaps(
+    data: np.ndarray,
+    img_size: Tuple[int, int],
+    img_mode: str,
+    linear_light: Optional[bool] = None,
+    smooth: bool = True,
+) -> List[Tuple[np.ndarray, Tuple[int, int]]]:
+    """
+    Computes the mipmap levels 1 ... n of an image down to 1x1 pixels, with the level sizes OpenGL expects
+    (max(1, size // 2) per level). Each level is filtered from the unquantized previous level
+    :param data: tightly packed pixel data of level 0 (flat uint8 array)
+    :param img_size: width and height in pixels
+    :param img_mode: Pillow image mode ('L', 'RGB' or 'RGBA')
+    :param linear_light: if True, the color channels are averaged in linear light instead of sRGB values, which keeps
+    the brightness of high contrast details. By default, this is done for 'RGB' and 'RGBA' images, but not for 'L'
+    images, which mostly hold data (e.g. bump or specular maps)
+    :param smooth: use a tent instead of a box filter (see '_downsample_axis')
+    :return: tightly packed pixel data (flat uint8 array) and size of each level
+    """
+    width, height = img_size
+    channels = CHANNELS[img_mode]
+    if linear_light is None:
+        linear_light = img_mode in ("RGB", "RGBA")
+    color_channels = slice(0, 3) if linear_light else slice(0, 0)  # the alpha channel is always linear
+
+    pixels = np.asarray(data, dtype=np.uint8).reshape(height, width, channels)
+    img = pixels.astype(np.float32) / 255
+    img[..., color_channels] = _SRGB_TO_LINEAR[pixels[..., color_channels]]
+
+    levels = []
+    while img.shape[0] > 1 or img.shape[1] > 1:
+        img = _downsample_axis(img, smooth)
+        img = _downsample_axis(img.swapaxes(0, 1), smooth).swapaxes(0, 1)
+        encoded = img.copy()
+        encoded[..., color_channels] = _linear_to_srgb(img[..., color_channels])
+        level = np.rint(np.clip(encoded, 0.0, 1.0) * 255).astype(np.uint8)
+        levels.append((level.reshape(-1), (img.shape[1], img.shape[0])))
+    return levels
@@ -7,6 +7,8 @@
 @Time      : 28.03.23 22:15
 @Author    : flowmeadow
 """
+from glpg.rendering.gpu.state import GLState
+from glpg.texturing.async_loader import TextureLoader
 from glpg.texturing.methods import *
 
 
@@ -16,7 +18,12 @@ class Texture:
     """
 
     # transition dictionary from Pillow to OpenGL notation
-    texture_formats = {"RGB": GL_RGB, "L": GL_DEPTH_COMPONENT}
+    texture_formats = {"RGB": GL_RGB, "RGBA": GL_RGBA, "L": GL_DEPTH_COMPONENT}
+
+    # load textures in the background by default (see glpg.texturing.async_loader.TextureLoader)
+    async_load = False
+    # color of the 1x1 texture that is shown until an asynchronously loaded texture is uploaded
+    placeholder_color = (128, 128, 128)
 
     # default texture parameters
     _defaults = {
@@ -26,13 +33,18 @@ class Texture:
         GL_TEXTURE_MAG_FILTER: GL_LINEAR,
     }
 
-    def __init__(self, texture: Union[np.ndarray, str], texture_params: dict = None):
+    def __init__(
+        self, texture: Union[np.ndarray, str], texture_params: dict = None, async_load: Optional[bool] = None
+    ):
         """
         :param texture: file path to an image or numpy array holding the image information
         :param texture_params: dictionary of texture parameters
+        :param async_load: if True, the image is decoded in the background and uploaded over the next frames, while
+        a placeholder is shown (see 'ready'); by default 'Texture.async_load'
         """
-        # get the image data
-        self.img_data = load_image_byte_array(texture)
+        async_load = self.async_load if async_load is None else async_load
+        self.img_data = None
+        self.ready = False  # True, as soon as the image is uploaded
 
         # define locations for texture and sampler
         self.location = GLuint()
@@ -43,7 +55,11 @@ class Texture:
         glDisable(GL_TEXTURE_2D)
 
         # load texture to GPU
-        self.load()
+        if async_load:
+            self._load_placeholder()
+            TextureLoader.submit(self, texture)
+        else:
+            self.load(texture)
 
         # update sampler parameter
         tex_params = self._defaults.copy()
@@ -56,24 +72,55 @@ class Texture:
     def load(self, texture: Optional[Union[np.ndarray, str]] = None):
         """
         Upload or update texture data
-        :param texture: file path to an image or numpy array holding the image information
+        :param texture: file path to an image or numpy array holding the image information; by default the current
+        image is uploaded again. If it is still loaded in the background, it is loaded synchronously instead
         """
+        if texture is None and self.img_data is None:
+            texture = TextureLoader.cancel(self)
+            if texture is None:
+                raise ValueError("The texture has no image data yet; pass an image to 'load'")
         if texture is not None:
+            TextureLoader.cancel(self)
             self.img_data = load_image_byte_array(texture)
 
-        c_data, img_size, img_mode = self.img_data.c_data, self.img_data.img_size, self.img_data.img_mode
+        img_size, img_mode = self.img_data.img_size, self.img_data.img_mode
         img_format = self.texture_formats[img_mode]
 
+        GLState.bind_texture(0, self.location)
         glEnable(GL_TEXTURE_2D)
-        glBindTexture(GL_TEXTURE_2D, self.location)
-        glTexImage2D(GL_TEXTURE_2D, 0, img_format, img_size[0], img_size[1], 0, img_format, GL_UNSIGNED_BYTE, c_data)
-        glGenerateMipmap(GL_TEXTURE_2D)
-        glBindTexture(GL_TEXTURE_2D, 0)
-        glBindSampler(0, 0)
+        # rows are tightly packed or padded (IBA files), e.g. for RGB images with a width that is not a multiple of 4
+        glPixelStorei(GL_UNPACK_ALIGNMENT, self.img_data.row_alignment)
+        width, height = img_size
+        pointer = self.img_data.pointer
+        glTexImage2D(GL_TEXTURE_2D, 0, img_format, width, height, 0, img_format, GL_UNSIGNED_BYTE, pointer)
+        mip_levels = self.img_data.mip_levels
+        if mip_levels:
+            # upload the precomputed mipmap chain instead of generating it
+            for level, (data, (width, height)) in enumerate(mip_levels, start=1):
+                pointer = ct.c_void_p(data.ctypes.data)
+                glTexImage2D(GL_TEXTURE_2D, level, img_format, width, height, 0, img_format, GL_UNSIGNED_BYTE, pointer)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(mip_levels))
+        else:
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, 1000)  # OpenGL default
+            glGenerateMipmap(GL_TEXTURE_2D)
+        GLState.bind_texture(0, 0)
+        GLState.bind_sampler(0, 0)
         glDisable(GL_TEXTURE_2D)
+        self.ready = True
 
         return self
 
+    def _load_placeholder(self):
+        """
+        Upload a 1x1 texture with the placeholder color
+        """
+        pixel = (GLubyte * 3)(*self.placeholder_color)
+        GLState.bind_texture(0, self.location)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, 1, 1, 0, GL_RGB, GL_UNSIGNED_BYTE, pixel)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, 0)  # complete without mipmaps
+        GLState.bind_texture(0, 0)
+
     def update_param(self, param_type: int, param_value: int):
         """
         Updates sampler parameter
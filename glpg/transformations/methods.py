@@ -7,11 +7,13 @@
 @Author    : flowmeadow
 """
 import ctypes
-from typing import Tuple
+from typing import Optional, Tuple
 
 import numpy as np
 from pyglet.gl import *
 
+from glpg.rendering.models.adjacency import Adjacency
+
 
 def rot_mat(axis: np.ndarray, angle: float) -> np.ndarray:
     """
@@ -87,31 +89,71 @@ def euler_angles_from_rotation_matrix(R: np.ndarray) -> np.ndarray:
     return angles
 
 
-def compute_normals(indices: np.ndarray, vertices: np.ndarray) -> np.ndarray:
+def compute_normals(
+    indices: np.ndarray,
+    vertices: np.ndarray,
+    weighting: str = "uniform",
+    vertex_ids: Optional[np.ndarray] = None,
+    adjacency: Optional[Adjacency] = None,
+) -> np.ndarray:
     """
     Given a vertex and index array, the normals for each vertex are computed.
     First the face normals will be calculated. For each vertex the normal results from
-    the face normals of its surrounding faces.
+    the (weighted) face normals of its surrounding faces.
     :param indices: indices array [m, 3]
     :param vertices: vertex array [n, 3]
-    :return: normal array [n, 3]
-    """
+    :param weighting: face normal weighting; 'uniform' (each face counts equally), 'area' (weighted by face area)
+    or 'angle' (weighted by the interior angle at the vertex)
+    :param vertex_ids: if given, only the normals of these vertices are computed, using their surrounding faces only
+    :param adjacency: connectivity of the mesh; used to find the faces around 'vertex_ids' (built, if not given)
+    :return: normal array [n, 3] or [len(vertex_ids), 3]
+    """
+    indices = np.asarray(indices)
+    if vertex_ids is None:
+        faces, corners, owners, num_owners = slice(None), None, indices.reshape(-1), len(vertices)
+    else:
+        adjacency = adjacency if adjacency is not None else Adjacency(indices, len(vertices))
+        corners, owners = adjacency.corners_of_vertices(vertex_ids)
+        faces, num_owners = corners // 3, len(vertex_ids)
+
     # compute triangle normals by building the cross product of two edges
-    triangle_vertices = vertices[indices]
+    triangle_vertices = vertices[indices[faces]]
     edge_1 = triangle_vertices[:, 0, :] - triangle_vertices[:, 1, :]
     edge_2 = triangle_vertices[:, 0, :] - triangle_vertices[:, 2, :]
     cross_products = np.cross(edge_1, edge_2)
-    # normalize the normal vectors
-    triangle_normals = cross_products / np.linalg.norm(cross_products, axis=1)[:, np.newaxis]
-
-    # compute vertex normals
-    # TODO: There has to be a more efficient way ...
-    vertex_normals = np.zeros(vertices.shape)
-    # add up all the surrounding face normals for each vertex
-    for idx in range(len(indices)):
-        n = triangle_normals[idx]
-        f = indices[idx, :]
-        vertex_normals[f] += n
+
+    corner_weights = None
+    if weighting == "uniform":
+        # normalize the normal vectors
+        face_normals = cross_products / np.linalg.norm(cross_products, axis=1)[:, np.newaxis]
+    elif weighting == "area":
+        # the length of the cross product is proportional to the face area
+        face_normals = cross_products
+    elif weighting == "angle":
+        face_normals = cross_products / np.linalg.norm(cross_products, axis=1)[:, np.newaxis]
+        # interior angle at each corner, spanned by the two edges leaving it
+        e_a = np.roll(triangle_vertices, -1, axis=1) - triangle_vertices
+        e_b = np.roll(triangle_vertices, 1, axis=1) - triangle_vertices
+        cos_angles = np.sum(e_a * e_b, axis=2) / (np.linalg.norm(e_a, axis=2) * np.linalg.norm(e_b, axis=2))
+        corner_weights = np.arccos(np.clip(cos_angles, -1.0, 1.0))
+    else:
+        raise ValueError(f"Unknown weighting '{weighting}'; expected 'uniform', 'area' or 'angle'")
+
+    if corners is None:
+        # one entry for each corner of each face
+        corner_normals = np.repeat(face_normals, 3, axis=0)
+        if corner_weights is not None:
+            corner_normals *= corner_weights.reshape(-1, 1)
+    else:
+        # 'faces' already holds one entry per gathered corner
+        corner_normals = face_normals
+        if corner_weights is not None:
+            corner_normals = corner_normals * corner_weights[np.arange(corners.shape[0]), corners % 3][:, np.newaxis]
+
+    # add up all the surrounding face normals for each vertex (scatter-add over all face corners)
+    vertex_normals = np.zeros((num_owners, 3))
+    for axis in range(3):
+        vertex_normals[:, axis] = np.bincount(owners, weights=corner_normals[:, axis], minlength=num_owners)
     # normalize the normal vectors
     vertex_normals = vertex_normals / np.linalg.norm(vertex_normals, axis=1)[:, np.newaxis]
     return vertex_normals
@@ -1,26 +1,182 @@
 #!/usr/bin/env python
 # -*- encoding: utf-8 -*-
 """
-@Introduce : Converts each file in the given directory to an IBA file
+@Introduce : Converts each file in the given directory to an IBA file and migrates old IBA files
 @File      : update_textures.py
 @Project   : pygletPlayground
 @Time      : 08.12.22 22:26
 @Author    : flowmeadow
 """
+import argparse
+import hashlib
+import json
 import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Optional
+
+from glpg.texturing import iba
 from glpg.texturing.methods import img_file_to_byte_array
 
+# records source file state and conversion options of each IBA file, relative to the base path
+MANIFEST_NAME = ".iba_manifest.json"
+SOURCE_EXTENSIONS = [".jpeg", ".jpg"]
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    :param path: file path
+    :param chunk_size: number of bytes read at once
+    :return: SHA-256 hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(base_path: str) -> Dict[str, Dict]:
+    """
+    :param base_path: texture directory
+    :return: manifest entries by source path relative to the base path (empty, if there is no valid manifest)
+    """
+    try:
+        with open(os.path.join(base_path, MANIFEST_NAME), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(base_path: str, manifest: Dict[str, Dict]):
+    """
+    Writes the manifest atomically (temporary file and rename)
+    :param base_path: texture directory
+    :param manifest: manifest entries by source path relative to the base path
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{MANIFEST_NAME}.", suffix=".tmp", dir=base_path)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, os.path.join(base_path, MANIFEST_NAME))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
 
-def update_textures(base_path: str):
+def needs_update(path: str, iba_path: str, entry: Optional[Dict], mipmaps: bool) -> Optional[Dict]:
+    """
+    Decides whether an image has to be converted. A changed modification time or size alone does not trigger a
+    conversion, if the content hash is still the same
+    :param path: source image path
+    :param iba_path: IBA file path
+    :param entry: manifest entry of the source image
+    :param mipmaps: whether the IBA file has to contain the mipmap chain
+    :return: updated manifest entry with 'convert' set to True or False; None, if nothing changed
+    """
+    stat = os.stat(path)
+    state = dict(mtime_ns=stat.st_mtime_ns, size=stat.st_size, mipmaps=mipmaps, version=iba.VERSION)
+    if not os.path.exists(iba_path):
+        return dict(state, hash=file_hash(path), convert=True)
+    if entry is None:
+        # IBA files from before the manifest are adopted, if they are newer than the source and fit the options
+        if iba.is_legacy(iba_path) or os.stat(iba_path).st_mtime_ns < stat.st_mtime_ns:
+            return dict(state, hash=file_hash(path), convert=True)
+        has_mipmaps = len(iba.read_header(iba_path)["levels"]) > 1
+        return dict(state, hash=file_hash(path), convert=has_mipmaps != mipmaps)
+    if entry.get("mipmaps") != mipmaps or entry.get("version") != iba.VERSION:
+        return dict(state, hash=file_hash(path), convert=True)
+    if entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("size") == stat.st_size:
+        return None
+    content_hash = file_hash(path)
+    return dict(state, hash=content_hash, convert=content_hash != entry.get("hash"))
+
+
+def convert(path: str, mipmaps: bool) -> Dict:
+    """
+    Converts one image to an IBA file (runs in a worker process)
+    :param path: source image path
+    :param mipmaps: store the precomputed mipmap chain
+    :return: dictionary with the conversion time in seconds and the source and output size in bytes
+    """
+    start = time.perf_counter()
+    img_file_to_byte_array(path, save=True, mipmaps=mipmaps)
+    iba_path = f"{os.path.splitext(path)[0]}.iba"
+    return dict(seconds=time.perf_counter() - start, source=os.path.getsize(path), output=os.path.getsize(iba_path))
+
+
+def update_textures(base_path: str, mipmaps: bool = False, workers: Optional[int] = None, force: bool = False):
+    """
+    Converts JPEG files to IBA files in parallel and migrates IBA v1 files (metadata in extended file attributes) to
+    v2. Images are only converted again, if their content or the options changed (see 'needs_update')
+    :param base_path: directory that is searched recursively
+    :param mipmaps: if True, the IBA files contain the precomputed mipmap chain
+    :param workers: number of worker processes; by default the number of CPUs
+    :param force: convert all images
+    """
+    manifest = load_manifest(base_path)
     path_list = [os.path.join(dir_path, f) for dir_path, _, file_names in os.walk(base_path) for f in file_names]
+
+    jobs = {}
     for path in path_list:
-        directory, base = os.path.split(path)
-        file_name, extension = os.path.splitext(base)
-        if extension in [".jpeg", ".jpg"] and f"{file_name}.iba" not in os.listdir(directory):
-            print(f"Loading, converting and saving image {path} ...")
-            img_file_to_byte_array(path, save=True)
+        file_name, extension = os.path.splitext(path)
+        iba_path = f"{file_name}.iba"
+        key = os.path.relpath(path, base_path)
+        if extension in SOURCE_EXTENSIONS:
+            state = needs_update(path, iba_path, None if force else manifest.get(key), mipmaps)
+            if state is None:
+                continue
+            if state.pop("convert") or force:
+                jobs[path] = (key, state)
+            else:
+                manifest[key] = state
+        elif extension == ".iba" and iba.is_legacy(path) and not any(
+            os.path.exists(f"{file_name}{ext}") for ext in SOURCE_EXTENSIONS
+        ):
+            # IBA files without a source image can only be migrated
+            print(f"Migrating {path} to IBA version {iba.VERSION} ...")
+            iba.migrate(path)
+
+    if not jobs:
+        save_manifest(base_path, manifest)
+        print("All textures are up to date")
+        return
+
+    total_source, total_output, done, converted = 0, 0, 0, 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(convert, path, mipmaps): path for path in jobs}
+        for future in as_completed(futures):
+            path = futures[future]
+            done += 1
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"[{done}/{len(jobs)}] Failed to convert {path}: {e}")
+                continue
+            key, state = jobs[path]
+            manifest[key] = state
+            save_manifest(base_path, manifest)  # keep finished conversions, even if the run is interrupted
+            converted += 1
+            total_source += result["source"]
+            total_output += result["output"]
+            print(f"[{done}/{len(jobs)}] {path} ({result['seconds']:.2f} s)")
+
+    duration = time.perf_counter() - start
+    failed = f", {len(jobs) - converted} failed" if converted < len(jobs) else ""
+    print(
+        f"Converted {converted} of {len(jobs)} images{failed} in {duration:.1f} s "
+        f"({converted / duration:.2f} images/s, {total_source / duration / 1e6:.1f} MB/s read, "
+        f"{total_output / duration / 1e6:.1f} MB/s written)"
+    )
 
 
 if __name__ == "__main__":
-    base_path = "demo_textures/"
-    update_textures(base_path)
+    parser = argparse.ArgumentParser(description="Converts JPEG textures to IBA files")
+    parser.add_argument("base_path", nargs="?", default="demo_textures/")
+    parser.add_argument("--mipmaps", action="store_true", help="store precomputed mipmap chains")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="convert all images, even if they did not change")
+    args = parser.parse_args()
+    update_textures(args.base_path, mipmaps=args.mipmaps, workers=args.workers, force=args.force)